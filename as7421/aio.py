@@ -0,0 +1,171 @@
+"""Asyncio interface to the AS7421."""
+
+import asyncio
+import functools
+import time
+import typing as t
+from concurrent.futures import Executor, ThreadPoolExecutor
+
+from as7421.as7421 import (
+    AS7421,
+    RESET_DELAY,
+    RESET_POLL,
+    ChannelEnable,
+)
+
+
+def _step(steps: t.Generator[float, None, t.Optional[int]]):
+    # StopIteration cannot be raised into a Future, so unwrap it here
+    try:
+        return False, next(steps)
+    except StopIteration as done:
+        return True, done.value
+
+
+class AsyncAS7421:
+    """Awaitable wrapper around :class:`AS7421`.
+
+    All bus access runs on ``executor``, by default a private single worker
+    thread so calls to one sensor are serialised. Sensors sharing a physical
+    bus should be given the same single worker executor. Waits between polls
+    use ``asyncio.sleep`` so several sensors and other I/O can share a loop.
+    """
+
+    def __init__(self, sensor: AS7421, executor: t.Optional[Executor] = None):
+        self.sensor = sensor
+        self._own_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="as7421"
+        )
+
+    @classmethod
+    async def open(
+        cls,
+        bus: t.Union[int, t.Any, None] = 1,
+        reset: bool = True,
+        executor: t.Optional[Executor] = None,
+    ) -> "AsyncAS7421":
+        """Create the sensor on ``bus`` without blocking the event loop."""
+        own_executor = executor is None
+        if own_executor:
+            executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="as7421")
+        loop = asyncio.get_running_loop()
+        sensor = await loop.run_in_executor(
+            executor, functools.partial(AS7421, bus, reset=False)
+        )
+        self = cls(sensor, executor)
+        self._own_executor = own_executor
+        if reset:
+            await self.reset()
+        return self
+
+    async def _run(self, fn: t.Callable, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, functools.partial(fn, *args, **kwargs)
+        )
+
+    async def close(self):
+        if self._own_executor:
+            # Shutting down waits for pending bus calls, keep that off the loop
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(
+                None, functools.partial(self.executor.shutdown, wait=True)
+            )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def reset(self):
+        await self._run(self.sensor.reset)
+        await asyncio.sleep(RESET_DELAY)
+        while await self._run(self.sensor.is_resetting):
+            await asyncio.sleep(RESET_POLL)
+
+    async def setup_regs(self):
+        await self._run(self.sensor.setup_regs)
+
+    async def powerup(self):
+        await self._run(self.sensor.powerup)
+
+    async def sleep(self):
+        await self._run(self.sensor.sleep)
+
+    async def configure_smux(self, smux_data=None):
+        await self._run(self.sensor.configure_smux, smux_data)
+
+    async def configure_gain(self, value: int = 6):
+        await self._run(self.sensor.configure_gain, value)
+
+    async def configure_led(
+        self,
+        current: t.Optional[t.Literal["50mA", "75mA"]] = "50mA",
+        leds: t.Optional[int] = 0x1F,
+    ):
+        await self._run(self.sensor.configure_led, current, leds)
+
+    async def enable_channels(
+        self, channels: t.Optional[ChannelEnable] = ChannelEnable.ABCD
+    ):
+        await self._run(self.sensor.enable_channels, channels)
+
+    async def enable_autozero(
+        self,
+        enable: bool,
+        cycle: t.Optional[int] = 0,
+        iteration: t.Optional[int] = 0,
+        wtime: t.Optional[str] = 0,
+    ):
+        await self._run(self.sensor.enable_autozero, enable, cycle, iteration, wtime)
+
+    async def get_integration_time(self):
+        return await self._run(getattr, self.sensor, "integration_time")
+
+    async def set_integration_time(self, value):
+        await self._run(setattr, self.sensor, "integration_time", value)
+
+    async def get_wait_time(self):
+        return await self._run(getattr, self.sensor, "wait_time")
+
+    async def set_wait_time(self, value):
+        await self._run(setattr, self.sensor, "wait_time", value)
+
+    async def get_num_measurements(self) -> int:
+        return await self._run(getattr, self.sensor, "num_measurements")
+
+    async def set_num_measurements(self, value: int):
+        await self._run(setattr, self.sensor, "num_measurements", value)
+
+    async def read_frame(self):
+        return await self._run(self.sensor.read_frame)
+
+    async def wait_for_data(self, timeout: t.Optional[float] = None) -> t.Optional[int]:
+        """Awaitable counterpart of :meth:`AS7421.wait_for_data`."""
+        steps = self.sensor._wait_steps(timeout)
+        while True:
+            done, value = await self._run(_step, steps)
+            if done:
+                return value
+            await asyncio.sleep(value)
+
+    async def frames(
+        self, with_led: t.Optional[bool] = True
+    ) -> t.AsyncGenerator[t.Tuple[float, t.List[int], t.List[int]], None]:
+        """Async counterpart of :meth:`AS7421.do_measurement`."""
+        sensor = self.sensor
+        remaining = await self.get_num_measurements() or None
+        await self._run(sensor.start_measurement, with_led=with_led)
+        try:
+            while remaining != 0:
+                if await self.wait_for_data() is None:
+                    break
+                end = time.perf_counter()
+                channel_data, temperature_data = await self.read_frame()
+                yield end, channel_data.tolist(), temperature_data.tolist()
+                if remaining is not None:
+                    remaining -= 1
+        finally:
+            await self._run(sensor.stop_measurement)
@@ -1,11 +1,19 @@
 from i2cdevice import BitField, Device, Register
 from i2cdevice.adapter import Adapter, LookupAdapter, U16ByteSwapAdapter
-import smbus2
+import logging
+import numpy as np
+import time
 import typing as t
-from astropy import units as u
+from contextlib import contextmanager
 from dataclasses import dataclass
 from enum import IntEnum, Enum
 
+from as7421.metrics import InstrumentedSMBus, Metrics
+from as7421.transport import SMBusTransport
+
+if t.TYPE_CHECKING:
+    from astropy import units as u
+
 
 class LED(IntEnum):
     LED_1 = 0x01
@@ -22,7 +30,51 @@ class ChannelEnable(str, Enum):
     ABCD = "ABCD"
 
 
-CLOCK = 1 << u.MHz
+_log = logging.getLogger(__name__)
+
+CLOCK_HZ = 1_000_000
+# ITIME and WTIME are 20 bit tick counts
+MAX_TICKS = 0xFFFFF
+
+I2C_ADDRESS = 0x64
+
+RAM_ADDRESS = 0x40
+RAM_SIZE = 32
+# Writing a few unchanged bytes is cheaper than starting a new transaction
+RAM_MERGE_GAP = 2
+
+SMUX_BANKS = ("SMUX_A", "SMUX_B", "SMUX_C", "SMUX_D")
+
+TEMP_ADDRESS = 0x78
+CHANNEL_ADDRESS = 0x80
+NUM_CHANNELS = 64
+# TEMP (0x78-0x7F) runs straight into the channel banks (0x80-0xFF)
+FRAME_SIZE = CHANNEL_ADDRESS - TEMP_ADDRESS + 2 * NUM_CHANNELS
+STATUS_7_ADDRESS = 0x77
+
+AZ_WAIT_TIMES = {"32us": 32e-6, "64us": 64e-6, "128us": 128e-6, "256us": 256e-6}
+# Polling starts this far ahead of the predicted frame and backs off up to
+# POLL_MAX between STATUS_7 reads
+POLL_MARGIN = 0.5e-3
+POLL_MIN = 0.1e-3
+POLL_MAX = 2e-3
+
+STATUS_ID_ADDRESS = 0x70
+# DEV_ID read from an empty bus (all low) or a floating one (all high)
+INVALID_DEV_IDS = (0x00, 0x3F)
+# Configuration registers live in 0x38-0x3D and 0x60-0x6D
+CONFIG_BLOCKS = ((0x38, 6), (0x60, 14))
+
+STATUS_ADATA = 0x01
+STATUS_ASAT = 0x08
+STATUS_DSAT = 0x10
+STATUS_DLOST = 0x20
+
+# Restarts of a differential sequence without completing a pair
+MAX_STALLED_RESTARTS = 8
+
+RESET_DELAY = 0.1
+RESET_POLL = 0.01
 
 ESTIMATED_WAVELENGTHS = [
     930,
@@ -121,20 +173,92 @@ class MeasumentStatus:
         )
 
 
-class TimeAdapter(Adapter):
+@dataclass
+class DifferentialFrames:
+    """Ambient subtracted frames from :meth:`AS7421.differential_measurement`.
+
+    Each row comes from one LED off/on pair. ``difference`` is the LED on
+    frame minus the LED off frame, ``timestamps`` and ``temperatures`` are
+    those of the LED on frame and ``status`` combines both frames.
+    ``restarts`` counts sequences restarted after lost data.
+    """
+
+    timestamps: np.ndarray
+    difference: np.ndarray
+    temperatures: np.ndarray
+    status: np.ndarray
+    restarts: int = 0
+
+    def __len__(self):
+        return len(self.timestamps)
+
+
+@dataclass
+class ContinuousStats:
+    """Dead time accounting for :meth:`AS7421.continuous_measurement`.
+
+    A gap is the time between the last frame of one sequence and the first
+    frame of the next, less the frame period, as seen by the host. ``rearm``
+    times are spent on the bus restarting the sequence.
+    """
+
+    frames: int = 0
+    lost_frames: int = 0
+    rearms: int = 0
+    elapsed: float = 0.0
+    dead_time: float = 0.0
+    max_gap: float = 0.0
+    last_gap: float = 0.0
+    rearm_time: float = 0.0
+    max_rearm: float = 0.0
+
+    def add_gap(self, gap: float):
+        gap = max(gap, 0.0)
+        self.dead_time += gap
+        self.last_gap = gap
+        self.max_gap = max(self.max_gap, gap)
+
+    @property
+    def mean_gap(self) -> float:
+        return self.dead_time / self.rearms if self.rearms else 0.0
+
+    @property
+    def duty_cycle(self) -> float:
+        """Fraction of the run spent acquiring frames."""
+        return 1.0 - self.dead_time / self.elapsed if self.elapsed else 1.0
+
+
+def __getattr__(name: str):
+    # Importing astropy is slow, only do it when the Quantity clock is used
+    if name == "CLOCK":
+        from astropy import units as u
+
+        return 1 << u.MHz
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _to_seconds(value) -> float:
+    """Seconds from a time Quantity or a plain number of seconds."""
+    if hasattr(value, "unit"):
+        from astropy import units as u
+
+        return value.to_value(u.s)
+    return float(value)
+
 
-    def _decode(self, value: int) -> u.Quantity:
+class TickAdapter(Adapter):
+    """Timing register value to integer clock ticks."""
+
+    def _decode(self, value: int) -> int:
         # Goes low, mid, high bytes
         low = (value >> 16) & 0xFF
         mid = (value >> 8) & 0xFF
         high = (value) & 0xFF
 
-        value = (high << 16) | (mid << 8) | low
-
-        return ((value + 1) / CLOCK).to(u.s)
+        return (high << 16) | (mid << 8) | low
 
-    def _encode(self, value: u.Quantity) -> int:
-        res = max(int((value * CLOCK).decompose()) - 1, 0)
+    def _encode(self, value: int) -> int:
+        res = min(max(int(value), 0), MAX_TICKS)
         # Goes low, mid, high bytes
         low = res & 0xFF
         mid = (res >> 8) & 0xFF
@@ -143,266 +267,507 @@ class TimeAdapter(Adapter):
         return res
 
 
-class AS7421:
+class TimeAdapter(TickAdapter):
+    """Timing register value to an astropy Quantity, imported on first use."""
+
+    def _decode(self, value: int) -> "u.Quantity":
+        from astropy import units as u
+
+        return ((super()._decode(value) + 1) / CLOCK_HZ) << u.s
+
+    def _encode(self, value: "u.Quantity") -> int:
+        return super()._encode(round(_to_seconds(value) * CLOCK_HZ) - 1)
+
+
+class ShadowDevice(Device):
+    """Device keeping a write-through shadow of non-volatile registers.
+
+    Non-volatile registers are read from the bus once and afterwards served
+    from the shadow. Writes that would not change the value on the device are
+    skipped, and a ``set`` covering every bit of a register skips the read of
+    the read-modify-write. Volatile registers always go to the bus.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._cached: t.Set[str] = set()
+        self._on_device: t.Dict[str, int] = {}
+        self._pending: t.Optional[t.Dict[str, None]] = None
+        super().__init__(*args, **kwargs)
+
+    def read_register(self, name):
+        register = self.registers[name]
+        if register.volatile or name not in self._cached:
+            value = self._i2c_read(register.address, register.bit_width)
+            self.values[name] = value
+            if not register.volatile:
+                self._cached.add(name)
+                self._on_device[name] = value
+        return self.values[name]
+
+    def write_register(self, name):
+        register = self.registers[name]
+        value = self.values[name]
+        if register.volatile:
+            return self._i2c_write(register.address, value, register.bit_width)
+        self._cached.add(name)
+        if self._pending is not None:
+            self._pending[name] = None
+            return
+        if self._on_device.get(name) == value:
+            return
+        self._i2c_write(register.address, value, register.bit_width)
+        self._on_device[name] = value
+
+    def set(self, register, **kwargs):
+        reg = self.registers[register]
+        covered = 0
+        for field in kwargs:
+            covered |= reg.fields[field].mask
+        full = (1 << reg.bit_width) - 1
+        if covered & full != full:
+            self.read_register(register)
+        self.lock_register(register)
+        try:
+            for field, value in kwargs.items():
+                self.set_field(register, field, value)
+        finally:
+            self.unlock_register(register)
+        self.write_register(register)
+
+    def invalidate(self, *names: str):
+        """Forget the shadow of ``names`` (all registers if none given)."""
+        for name in names or list(self._cached):
+            self._cached.discard(name)
+            self._on_device.pop(name, None)
+
+    def prime(self, address: int, data: bytes):
+        """Adopt ``data`` read from ``address`` onwards as the shadow.
+
+        Every non-volatile register lying entirely within the block is
+        marked as cached, so a single block read can replace many reads.
+        """
+        for name, register in self.registers.items():
+            size = register.bit_width // self._bit_width
+            offset = register.address - address
+            if register.volatile or offset < 0 or offset + size > len(data):
+                continue
+            value = int.from_bytes(bytes(data[offset : offset + size]), "big")
+            self.values[name] = value
+            self._cached.add(name)
+            self._on_device[name] = value
+
+    def mark_unwritten(self, *names: str):
+        """Force the next write of ``names`` while keeping their cached value."""
+        for name in names:
+            self._on_device.pop(name, None)
+
+    @contextmanager
+    def deferred(self):
+        """Collect writes to non-volatile registers and flush each one once.
+
+        Several ``set`` calls on the same register inside the block result in
+        a single bus write on exit. Volatile registers are written immediately.
+        """
+        if self._pending is not None:
+            yield self
+            return
+        self._pending = {}
+        try:
+            yield self
+        except BaseException:
+            pending, self._pending = self._pending, None
+            self.invalidate(*pending)
+            raise
+        pending, self._pending = self._pending, None
+        for name in pending:
+            self.write_register(name)
+
+
+# Built once and shared by all instances, per device state lives in
+# ShadowDevice
+REGISTERS = (
+    *tuple(
+        Register(
+            f"CFG_RAM_{x}",
+            0x40 + x,
+            fields=(BitField(f"VALUE", 0xFF),),
+        )
+        for x in range(32)
+    ),
+    Register(
+        "ENABLE",
+        0x60,
+        fields=(
+            BitField("LTF_MODE", 0b11000000),
+            BitField(
+                "LED_AUTO",
+                0b00110000,
+                adapter=LookupAdapter(
+                    {
+                        "OFF": 0b00,
+                        "OFF1ON2": 0x01,
+                        "ON1OFF2": 0x02,
+                        "ON": 0x03,
+                    }
+                ),
+            ),
+            BitField("SYNC_EN", 0b00001000),
+            BitField("TSD_EN", 0b00000100),
+            BitField("LTF_EN", 0b00000010),
+            BitField("POWERON", 0b00000001),
+        ),
+        volatile=False,
+    ),
+    Register(
+        "LTF_ITIME",
+        0x61,
+        fields=(BitField("ITIME", 0xFFFFFF, adapter=TickAdapter()),),
+        bit_width=24,
+        volatile=False,
+    ),
+    Register(
+        "LTF_WTIME",
+        0x64,
+        fields=(BitField("WTIME", 0xFFFFFF, adapter=TickAdapter()),),
+        bit_width=24,
+        volatile=False,
+    ),
+    Register(
+        "CFG_LTF",
+        0x67,
+        fields=(
+            BitField(
+                "LTF_CYCLE",
+                0b00011000,
+                adapter=LookupAdapter(
+                    {
+                        "A": 0b00,
+                        "AB": 0b01,
+                        "ABC": 0b10,
+                        "ABCD": 0b11,
+                    }
+                ),
+            ),
+            BitField("CLKMOD", 0b00000111),
+        ),
+        volatile=False,
+    ),
+    Register(
+        "CFG_LED",
+        0x68,
+        fields=(
+            BitField("SET_LED_ON", 0b10000000),
+            BitField("LED_OFF_EN", 0b01000000),
+            BitField("LED_OFFSET", 0b00110000),
+            BitField(
+                "LED_CURRENT",
+                0b00000111,
+                adapter=LookupAdapter({"50mA": 0, "75mA": 1}),
+            ),
+        ),
+        volatile=False,
+    ),
+    Register(
+        "CFG_RAM",
+        0x6A,
+        fields=(
+            BitField("REG_BANK", 0b10000000),
+            BitField(
+                "RAM_OFFSET",
+                0b00011111,
+                LookupAdapter(
+                    {
+                        "UNSET": 0x00,
+                        "SMUX_A": 0x0C,
+                        "SMUX_B": 0x0D,
+                        "SMUX_C": 0x0E,
+                        "SMUX_D": 0x0F,
+                        "ASETUP_AB": 0x10,
+                        "ASETUP_CD": 0x11,
+                        "COMPDAC": 0x12,
+                    }
+                ),
+            ),
+        ),
+        volatile=False,
+    ),
+    Register(
+        "CFG_AZ",
+        0x6D,
+        fields=(
+            BitField("AZ_ON", 0b10000000),
+            BitField(
+                "AZ_WTIME",
+                0b01100000,
+                adapter=LookupAdapter(
+                    {
+                        "32us": 0x00,
+                        "64us": 0x01,
+                        "128us": 0x02,
+                        "256us": 0x03,
+                    }
+                ),
+            ),
+            BitField("AZ_EN", 0b00010000),
+            BitField("AZ_CYCLE", 0b00001000),
+            BitField("AZ_ITERATION", 0b00000111),
+        ),
+        volatile=False,
+    ),
+    Register(
+        "CFG_LED_MULT",
+        0x39,
+        fields=(BitField("LED_MULT", 0xFF),),
+    ),
+    Register(
+        "LTF_ICOUNT",
+        0x69,
+        fields=(BitField("ICOUNT", 0xFF, bit_width=8),),
+        volatile=False,
+    ),
+    Register(
+        "CFG_MISC",
+        0x38,
+        fields=(
+            BitField("LED_WAIT_OFF", 0b00000100),
+            BitField("WAIT_CYCLE_ON", 0b00000010),
+            BitField("SW_RESET", 0b00000001),
+        ),
+        volatile=False,
+    ),
+    Register(
+        "LED_WAIT",
+        0x3D,
+        fields=(BitField("LED_WAIT", 0xFF),),
+        volatile=False,
+    ),
+    Register(
+        "LTF_CCOUNT",
+        0x3A,
+        fields=(BitField("CCOUNT", 0xFFFF, adapter=U16ByteSwapAdapter()),),
+        bit_width=16,
+        volatile=False,
+    ),
+    Register(
+        "STATUS_0",
+        0x70,
+        fields=(BitField("DEV_ID", 0b00111111),),
+        read_only=True,
+        volatile=False,
+    ),
+    Register(
+        "STATUS_1",
+        0x71,
+        fields=(BitField("REV_ID", 0b00111111),),
+        read_only=True,
+        volatile=False,
+    ),
+    Register(
+        "STATUS_ASAT",
+        0x72,
+        # ADCs 0-7 are in 0x72 and 8-15 in 0x73, the register
+        # value is read big-endian
+        fields=tuple(
+            BitField(f"ASAT_{x}", 0b0000000000000001 << (x + 8) % 16)
+            for x in range(16)
+        ),
+        bit_width=16,
+        read_only=True,
+    ),
+    Register(
+        "STATUS_6",
+        0x76,
+        fields=(
+            BitField("LTF_READY", 0b00100000),
+            BitField("LTF_BUSY", 0b00010000),
+        ),
+        read_only=True,
+    ),
+    Register(
+        "STATUS_7",
+        0x77,
+        fields=(
+            BitField("I2C_DATA_POINTER", 0b11000000),
+            BitField("DLOST", 0b00100000),
+            BitField("DSAT", 0b00010000),
+            BitField("ASAT", 0b00001000),
+            BitField("TSD", 0b00000100),
+            BitField("AZ", 0b00000010),
+            BitField("ADATA", 0b00000001),
+        ),
+        read_only=True,
+        volatile=True,
+    ),
+    Register(
+        "INT_EN",
+        0x67,
+        fields=(
+            BitField("EN_ADATA", 0b00000001),
+            BitField("EN_AZ", 0b00000010),
+            BitField("EN_TSD", 0b00000100),
+            BitField("EN_ASAT", 0b00001000),
+            BitField("EN_DSAT", 0b00010000),
+            BitField("EN_DLOST", 0b00100000),
+        ),
+    ),
+    *tuple(
+        Register(
+            f"CHANNEL_{ch}",
+            0x80 + 32 * idx,
+            fields=tuple(
+                BitField(
+                    f"CH{x}",
+                    0xFFFF << 240 - 16 * x,
+                    bit_width=16,
+                    adapter=U16ByteSwapAdapter(),
+                )
+                for x in range(16)
+            ),
+            read_only=True,
+            bit_width=32 * 8,
+        )
+        for idx, ch in enumerate(["A", "B", "C", "D"])
+    ),
+    Register(
+        "TEMP",
+        0x78,
+        fields=[
+            BitField(f"TEMP_{x}", 0xFFFF << 48 - 16 * idx, bit_width=16)
+            for idx, x in enumerate(["A", "B", "C", "D"])
+        ],
+        read_only=True,
+        bit_width=64,
+    ),
+)
+
 
-    def __init__(self, bus: t.Optional[int] = 1):
-        import time
+class AS7421:
 
+    def __init__(self, bus: t.Union[int, t.Any, None] = 1, reset: bool = True):
+        self._ram_bank: t.Optional[str] = None
+        self._ram_cache: t.Dict[str, t.List[t.Optional[int]]] = {}
+        # CFG_LED_MULT of each LED_OFFSET, None until written
+        self._led_mult: t.List[t.Optional[int]] = [None] * 4
+        self._frame_period = 0.0
+        self._next_frame_due = 0.0
+        self.last_status = 0
+        # STATUS_7 read along with the last frame, see read_frame
+        self._trailing_status = bytearray(1)
+        self.metrics: t.Optional[Metrics] = None
+        # Object, attribute and value replaced by the metrics wrapper
+        self._unwrap_metrics: t.Optional[t.Tuple[t.Any, str, t.Any]] = None
+        self._frame_buffer = bytearray(FRAME_SIZE)
+        self._frame_temperatures = np.frombuffer(self._frame_buffer, ">u2", 4, 0)
+        self._frame_channels = np.frombuffer(
+            self._frame_buffer, "<u2", NUM_CHANNELS, CHANNEL_ADDRESS - TEMP_ADDRESS
+        )
         self.create_device(bus)
-        self.reset()
-        time.sleep(0.1)
-        print("Waiting for reset to complete")
-        while self.is_resetting():
-            time.sleep(0.01)
-        print("Reset complete")
+        if reset:
+            self.reset()
+            time.sleep(RESET_DELAY)
+            _log.debug("Waiting for reset to complete")
+            while self.is_resetting():
+                time.sleep(RESET_POLL)
+            _log.debug("Reset complete")
+
+    @classmethod
+    def attach(
+        cls, bus: t.Union[int, t.Any, None] = 1, dev_id: t.Optional[int] = None
+    ) -> "AS7421":
+        """Attach to an already configured sensor without resetting it.
+
+        The device is identified from STATUS_0/STATUS_1 and its current
+        configuration registers are loaded into the register shadow with two
+        block reads. Raises ``RuntimeError`` if the DEV_ID read back is one
+        of :data:`INVALID_DEV_IDS`, meaning no device answered, or if
+        ``dev_id`` is given and does not match.
+        """
+        sensor = cls(bus, reset=False)
+        found = sensor.identify()
+        if found[0] in INVALID_DEV_IDS:
+            raise RuntimeError(f"No AS7421 found, DEV_ID reads {found[0]:#04x}")
+        if dev_id is not None and found[0] != dev_id:
+            raise RuntimeError(
+                f"Expected device id {dev_id:#04x}, found {found[0]:#04x}"
+            )
+        sensor.load_configuration()
+        return sensor
+
+    def identify(self) -> t.Tuple[int, int]:
+        """Read ``(DEV_ID, REV_ID)`` from STATUS_0 and STATUS_1."""
+        data = bytearray(2)
+        self._read_block(STATUS_ID_ADDRESS, memoryview(data))
+        self.device.prime(STATUS_ID_ADDRESS, data)
+        return data[0] & 0x3F, data[1] & 0x3F
+
+    def load_configuration(self):
+        """Load the device's configuration registers into the shadow."""
+        blocks = [(address, bytearray(length)) for address, length in CONFIG_BLOCKS]
+        self.device._i2c.read_blocks(
+            self.device._i2c_address,
+            [(address, memoryview(data)) for address, data in blocks],
+        )
+        for address, data in blocks:
+            self.device.prime(address, data)
+        try:
+            self._ram_bank = self.device.get("CFG_RAM").RAM_OFFSET
+        except ValueError:
+            # Bank not in the lookup table
+            self._ram_bank = None
+        self._ram_cache.clear()
+        self._led_mult = [None] * 4
 
     def is_resetting(self) -> bool:
+        # SW_RESET clears itself, so bypass the shadow
+        self.device.invalidate("CFG_MISC")
         return bool(self.device.get("CFG_MISC").SW_RESET)
 
     def create_device(self, bus):
-        self.device = Device(
-            0x64,
-            i2c_dev=smbus2.SMBus(bus),
+        # Bus numbers and SMBus-like objects get the plain SMBus transport,
+        # anything with read_into is already a transport
+        i2c_dev = bus if hasattr(bus, "read_into") else SMBusTransport(bus)
+        self.device = ShadowDevice(
+            I2C_ADDRESS,
+            i2c_dev=i2c_dev,
             bit_width=8,
-            registers=(
-                *tuple(
-                    Register(
-                        f"CFG_RAM_{x}",
-                        0x40 + x,
-                        fields=(BitField(f"VALUE", 0xFF),),
-                    )
-                    for x in range(32)
-                ),
-                Register(
-                    "ENABLE",
-                    0x60,
-                    fields=(
-                        BitField("LTF_MODE", 0b11000000),
-                        BitField(
-                            "LED_AUTO",
-                            0b00110000,
-                            adapter=LookupAdapter(
-                                {
-                                    "OFF": 0b00,
-                                    "OFF1ON2": 0x01,
-                                    "ON1OFF2": 0x02,
-                                    "ON": 0x03,
-                                }
-                            ),
-                        ),
-                        BitField("SYNC_EN", 0b00001000),
-                        BitField("TSD_EN", 0b00000100),
-                        BitField("LTF_EN", 0b00000010),
-                        BitField("POWERON", 0b00000001),
-                    ),
-                ),
-                Register(
-                    "LTF_ITIME",
-                    0x61,
-                    fields=(BitField("ITIME", 0xFFFFF, adapter=TimeAdapter()),),
-                    bit_width=24,
-                ),
-                Register(
-                    "LTF_WTIME",
-                    0x64,
-                    fields=(BitField("WTIME", 0xFFFFF, adapter=TimeAdapter()),),
-                    bit_width=24,
-                ),
-                Register(
-                    "CFG_LTF",
-                    0x67,
-                    fields=(
-                        BitField(
-                            "LTF_CYCLE",
-                            0b00011000,
-                            adapter=LookupAdapter(
-                                {
-                                    "A": 0b00,
-                                    "AB": 0b01,
-                                    "ABC": 0b10,
-                                    "ABCD": 0b11,
-                                }
-                            ),
-                        ),
-                        BitField("CLKMOD", 0b00000111),
-                    ),
-                ),
-                Register(
-                    "CFG_LED",
-                    0x68,
-                    fields=(
-                        BitField("SET_LED_ON", 0b10000000),
-                        BitField("LED_OFF_EN", 0b01000000),
-                        BitField("LED_OFFSET", 0b00110000),
-                        BitField(
-                            "LED_CURRENT",
-                            0b00000111,
-                            adapter=LookupAdapter({"50mA": 0, "75mA": 1}),
-                        ),
-                    ),
-                ),
-                Register(
-                    "CFG_RAM",
-                    0x6A,
-                    fields=(
-                        BitField("REG_BANK", 0b10000000),
-                        BitField(
-                            "RAM_OFFSET",
-                            0b00011111,
-                            LookupAdapter(
-                                {
-                                    "UNSET": 0x00,
-                                    "SMUX_A": 0x0C,
-                                    "SMUX_B": 0x0D,
-                                    "SMUX_C": 0x0E,
-                                    "SMUX_D": 0x0F,
-                                    "ASETUP_AB": 0x10,
-                                    "ASETUP_CD": 0x11,
-                                    "COMPDAC": 0x12,
-                                }
-                            ),
-                        ),
-                    ),
-                ),
-                Register(
-                    "CFG_AZ",
-                    0x6D,
-                    fields=(
-                        BitField("AZ_ON", 0b10000000),
-                        BitField(
-                            "AZ_WTIME",
-                            0b01100000,
-                            adapter=LookupAdapter(
-                                {
-                                    "32us": 0x00,
-                                    "64us": 0x01,
-                                    "128us": 0x02,
-                                    "256us": 0x03,
-                                }
-                            ),
-                        ),
-                        BitField("AZ_EN", 0b00010000),
-                        BitField("AZ_CYCLE", 0b00001000),
-                        BitField("AZ_ITERATION", 0b00000111),
-                    ),
-                ),
-                Register(
-                    "CFG_LED_MULT",
-                    0x39,
-                    fields=(BitField("LED_MULT", 0xFF),),
-                ),
-                Register(
-                    "LTF_ICOUNT",
-                    0x69,
-                    fields=(BitField("ICOUNT", 0xFF, bit_width=8),),
-                ),
-                Register(
-                    "CFG_MISC",
-                    0x38,
-                    fields=(
-                        BitField("LED_WAIT_OFF", 0b00000100),
-                        BitField("WAIT_CYCLE_ON", 0b00000010),
-                        BitField("SW_RESET", 0b00000001),
-                    ),
-                ),
-                Register(
-                    "LED_WAIT",
-                    0x3D,
-                    fields=(BitField("LED_WAIT", 0xFF),),
-                ),
-                Register(
-                    "LTF_CCOUNT",
-                    0x3A,
-                    fields=(BitField("CCOUNT", 0xFFFF, adapter=U16ByteSwapAdapter()),),
-                    bit_width=16,
-                ),
-                Register(
-                    "STATUS_0",
-                    0x70,
-                    fields=(BitField("DEV_ID", 0b00111111),),
-                    read_only=True,
-                ),
-                Register(
-                    "STATUS_1",
-                    0x71,
-                    fields=(BitField("REV_ID", 0b00111111),),
-                    read_only=True,
-                ),
-                Register(
-                    "STATUS_ASAT",
-                    0x72,
-                    fields=tuple(
-                        BitField(f"ASAT_{x}", 0b0000000000000001 << x)
-                        for x in range(16)
-                    ),
-                ),
-                Register(
-                    "STATUS_6",
-                    0x76,
-                    fields=(
-                        BitField("LTF_READY", 0b00100000),
-                        BitField("LTF_BUSY", 0b00010000),
-                    ),
-                    read_only=True,
-                ),
-                Register(
-                    "STATUS_7",
-                    0x77,
-                    fields=(
-                        BitField("I2C_DATA_POINTER", 0b11000000),
-                        BitField("DLOST", 0b00100000),
-                        BitField("DSAT", 0b00010000),
-                        BitField("ASAT", 0b00001000),
-                        BitField("TSD", 0b00000100),
-                        BitField("AZ", 0b00000010),
-                        BitField("ADATA", 0b00000001),
-                    ),
-                    read_only=True,
-                    volatile=True,
-                ),
-                Register(
-                    "INT_EN",
-                    0x67,
-                    fields=(
-                        BitField("EN_ADATA", 0b00000001),
-                        BitField("EN_AZ", 0b00000010),
-                        BitField("EN_TSD", 0b00000100),
-                        BitField("EN_ASAT", 0b00001000),
-                        BitField("EN_DSAT", 0b00010000),
-                        BitField("EN_DLOST", 0b00100000),
-                    ),
-                ),
-                *tuple(
-                    Register(
-                        f"CHANNEL_{ch}",
-                        0x80 + 32 * idx,
-                        fields=tuple(
-                            BitField(
-                                f"CH{x}",
-                                0xFFFF << 240 - 16 * x,
-                                bit_width=16,
-                                adapter=U16ByteSwapAdapter(),
-                            )
-                            for x in range(16)
-                        ),
-                        read_only=True,
-                        bit_width=32 * 8,
-                    )
-                    for idx, ch in enumerate(["A", "B", "C", "D"])
-                ),
-                Register(
-                    "TEMP",
-                    0x78,
-                    fields=[
-                        BitField(f"TEMP_{x}", 0xFFFF << 48 - 16 * idx, bit_width=16)
-                        for idx, x in enumerate(["A", "B", "C", "D"])
-                    ],
-                    read_only=True,
-                    bit_width=64,
-                ),
-            ),
+            registers=REGISTERS,
         )
 
+    def enable_metrics(self) -> Metrics:
+        """Start collecting bus and frame timing metrics.
+
+        Bus transactions are counted by wrapping the transport's ``bus``.
+        Custom transports without one are wrapped themselves, their
+        ``read_into`` and ``read_blocks`` calls then count as one transfer
+        each. While metrics are disabled the only cost is a ``None`` check
+        per frame.
+        """
+        if self.metrics is None:
+            names: t.Dict[int, str] = {}
+            for register in REGISTERS:
+                names.setdefault(register.address, register.name)
+            for offset in range(RAM_SIZE):
+                names[RAM_ADDRESS + offset] = f"RAM[{offset}]"
+            metrics = Metrics(names)
+            transport = self.device._i2c
+            if hasattr(transport, "bus"):
+                owner, attribute = transport, "bus"
+            else:
+                owner, attribute = self.device, "_i2c"
+            original = getattr(owner, attribute)
+            setattr(owner, attribute, InstrumentedSMBus(original, metrics))
+            self._unwrap_metrics = (owner, attribute, original)
+            self.metrics = metrics
+        return self.metrics
+
+    def disable_metrics(self):
+        if self.metrics is None:
+            return
+        owner, attribute, original = self._unwrap_metrics
+        setattr(owner, attribute, original)
+        self._unwrap_metrics = None
+        self.metrics = None
+
     def powerup(self):
 
         self.device.set("ENABLE", POWERON=1)
@@ -418,39 +783,95 @@ class AS7421:
 
             print(f"RAM[{x}] = {self.device.get(ram_value).VALUE:02X}")
 
-    def write_ram_data(self, data: t.List[int], offset: int):
-        for idx, value in enumerate(data):
-            self.device.set(f"CFG_RAM_{idx + offset}", VALUE=value)
+    def _write_block(self, register: int, values: t.Sequence[int]):
+        self.device._i2c.write_i2c_block_data(
+            self.device._i2c_address, register, list(values)
+        )
 
-    def configure_gain(self, value: int = 6):
-        data = [value] * 32
-        self.device.set("CFG_RAM", RAM_OFFSET="ASETUP_AB", REG_BANK=0)
-        self.write_ram_data(data, 0)
-        # self.print_ram()
-        self.device.set("CFG_RAM", RAM_OFFSET="ASETUP_CD", REG_BANK=0)
+    def _read_block(self, register: int, buffer: memoryview):
+        """Fill ``buffer`` from consecutive registers."""
+        self.device._i2c.read_into(self.device._i2c_address, register, buffer)
+
+    def select_ram_bank(self, bank: str):
+        """Map a RAM bank into the CFG_RAM window, skipping it if already mapped."""
+        if bank != self._ram_bank:
+            self.device.set("CFG_RAM", RAM_OFFSET=bank, REG_BANK=0)
+            self._ram_bank = bank
+
+    def write_ram_data(self, data: t.List[int], offset: int):
+        """Write ``data`` into the mapped RAM bank starting at ``offset``.
+
+        Bytes already known to hold the requested value are skipped and the
+        remaining ones are written as block transactions, merging runs that
+        are separated by only a couple of unchanged bytes.
+        """
+        if offset < 0 or offset + len(data) > RAM_SIZE:
+            raise ValueError(f"RAM write of {len(data)} bytes at {offset} out of range")
+
+        cache = self._ram_cache.setdefault(self._ram_bank, [None] * RAM_SIZE)
+        changed = [
+            idx for idx, value in enumerate(data) if cache[idx + offset] != value
+        ]
+        if self._ram_bank is None:
+            # Bank was selected outside of select_ram_bank, nothing is known
+            changed = list(range(len(data)))
+
+        runs = []
+        for idx in changed:
+            if runs and idx - runs[-1][1] <= RAM_MERGE_GAP + 1:
+                runs[-1][1] = idx
+            else:
+                runs.append([idx, idx])
+
+        for start, end in runs:
+            self._write_block(RAM_ADDRESS + offset + start, data[start : end + 1])
+
+        if self._ram_bank is not None:
+            cache[offset : offset + len(data)] = [int(x) for x in data]
+
+    def write_ram_bank(self, bank: str, data: t.List[int]):
+        """Upload a full 32 byte image to a RAM bank."""
+        if len(data) != RAM_SIZE:
+            raise ValueError(f"RAM bank image must be {RAM_SIZE} bytes")
+        self.select_ram_bank(bank)
         self.write_ram_data(data, 0)
-        # self.print_ram()
+
+    def configure_gain(self, value: t.Union[int, t.Sequence[int]] = 6):
+        """Set the gain of every channel, or per channel from 64 values."""
+        if isinstance(value, (int, np.integer)):
+            data = [int(value)] * NUM_CHANNELS
+        else:
+            data = [int(x) for x in value]
+            if len(data) != NUM_CHANNELS:
+                raise ValueError(f"Expected {NUM_CHANNELS} gain values")
+        self.write_ram_bank("ASETUP_AB", data[:32])
+        self.write_ram_bank("ASETUP_CD", data[32:])
+
+    @property
+    def gains(self) -> t.List[t.Optional[int]]:
+        """Per channel gains written since the last reset, None if unknown."""
+        return self._ram_cache.get("ASETUP_AB", [None] * RAM_SIZE) + self._ram_cache.get(
+            "ASETUP_CD", [None] * RAM_SIZE
+        )
 
     def zero_smux(self):
         zero_smux = [0] * 32
-        for x in ["SMUX_A", "SMUX_B", "SMUX_C", "SMUX_D"]:
-            res = self.device.set("CFG_RAM", RAM_OFFSET=x)
-            self.write_ram_data(zero_smux, 0)
+        for x in SMUX_BANKS:
+            self.write_ram_bank(x, zero_smux)
 
     def configure_smux(self, smux_data=None):
         default_smux = smux_data
-        self.zero_smux()
-        zero_smux = [0] * 32
         if default_smux is None:
             default_smux = [0x21, 0x21, 0x21, 0x21, 0x43, 0x43, 0x43, 0x43]
-        self.configure_smux_a(default_smux)
-        self.configure_smux_b(default_smux)
-        self.configure_smux_c(default_smux)
-        self.configure_smux_d(default_smux)
-        # self.print_ram()
+        # Equivalent to zero_smux followed by configure_smux_a..d, but each
+        # bank is uploaded once
+        for idx, bank in enumerate(SMUX_BANKS):
+            image = [0] * RAM_SIZE
+            image[8 * idx : 8 * idx + len(default_smux)] = default_smux
+            self.write_ram_bank(bank, image)
 
     def _configure_smux(self, smux_data, offset: int, ram_offset: str):
-        res = self.device.set("CFG_RAM", RAM_OFFSET=ram_offset)
+        self.select_ram_bank(ram_offset)
         self.write_ram_data(smux_data, offset)
 
     def configure_smux_a(self, smux_data):
@@ -485,8 +906,8 @@ class AS7421:
         for x in range(4):
             self.device.set("CFG_LED", LED_OFFSET=x)
             self.device.set("CFG_LED_MULT", LED_MULT=leds)
-        self.device.set("CFG_LED", LED_OFFSET=0)
-        self.device.set("CFG_LED", LED_CURRENT=current)
+            self._led_mult[x] = leds
+        self.device.set("CFG_LED", LED_OFFSET=0, LED_CURRENT=current)
 
     def disable_led_wait(self):
         self.device.set("CFG_MISC", LED_WAIT_OFF=1)
@@ -496,6 +917,10 @@ class AS7421:
 
     def reset(self):
         self.device.set("CFG_MISC", SW_RESET=1)
+        self.device.invalidate()
+        self._ram_bank = None
+        self._ram_cache.clear()
+        self._led_mult = [None] * 4
 
     def switch_on_led(self):
         self.device.set("CFG_LED", SET_LED_ON=1)
@@ -503,13 +928,43 @@ class AS7421:
     def switch_off_led(self):
         self.device.set("CFG_LED", SET_LED_ON=0)
 
-    def start_measurement(self, with_led: bool = False):
-        led_flag = "ON" if with_led else "OFF"
+    def start_measurement(
+        self,
+        with_led: t.Union[bool, t.Literal["OFF1ON2", "ON1OFF2"]] = False,
+    ):
+        if isinstance(with_led, str):
+            led_flag = with_led
+        else:
+            led_flag = "ON" if with_led else "OFF"
+        # The device may have cleared LTF_EN itself, always write ENABLE
+        self.device.mark_unwritten("ENABLE")
         self.device.set("ENABLE", POWERON=1, LTF_EN=1, TSD_EN=1, LED_AUTO=led_flag)
+        self._frame_period = self.frame_period()
+        # No wait cycle precedes the first frame
+        first = self._frame_period
+        if self.device.get("CFG_MISC").WAIT_CYCLE_ON:
+            first -= (self.wait_ticks + 1) / CLOCK_HZ
+        self._next_frame_due = time.perf_counter() + first
+        self._trailing_status[0] = 0
+        if self.metrics is not None:
+            self.metrics.last_ready = None
 
     def stop_measurement(self):
         self.device.set("ENABLE", LTF_EN=0, TSD_EN=0, LED_AUTO="OFF")
 
+    def rearm_measurement(
+        self,
+        with_led: t.Union[bool, t.Literal["OFF1ON2", "ON1OFF2"]] = False,
+    ):
+        """Start a new sequence once the previous one has taken ICOUNT frames.
+
+        A sequence is started by the rising edge of LTF_EN, so it is dropped
+        and set again. The channel registers keep the last frame until the
+        new sequence produces its first, so it can still be read afterwards.
+        """
+        self.device.set("ENABLE", LTF_EN=0)
+        self.start_measurement(with_led=with_led)
+
     def measurement_status(self) -> MeasumentStatus:
         reg = self.device.get("STATUS_7")
         return MeasumentStatus(
@@ -531,32 +986,243 @@ class AS7421:
             print("-------")
         return measurement_stat.data_available
 
+    def frame_period(self) -> float:
+        """Expected seconds between frames for the current configuration.
+
+        Computed from LTF_ITIME, LTF_WTIME, the enabled ``LTF_CYCLE`` and the
+        autozero settings. These are all shadowed so no bus traffic is needed
+        once they have been read or written.
+        """
+        cycles = len(self.device.get("CFG_LTF").LTF_CYCLE)
+        period = cycles * (self.integration_ticks + 1) / CLOCK_HZ
+        az = self.device.get("CFG_AZ")
+        if az.AZ_EN:
+            per_frame = cycles if az.AZ_CYCLE else 1
+            period += AZ_WAIT_TIMES[az.AZ_WTIME] * (az.AZ_ITERATION + 1) * per_frame
+        if self.device.get("CFG_MISC").WAIT_CYCLE_ON:
+            period += (self.wait_ticks + 1) / CLOCK_HZ
+        return period
+
+    def wait_for_data(self, timeout: t.Optional[float] = None) -> t.Optional[int]:
+        """Wait for the next frame of a running measurement.
+
+        Sleeps until just before the frame is predicted to be ready, then
+        polls STATUS_7 with a backoff bounded by ``POLL_MAX``. Returns the raw
+        STATUS_7 value, or ``None`` if the sequence finished without further
+        data or ``timeout`` seconds passed.
+        """
+        steps = self._wait_steps(timeout)
+        try:
+            while True:
+                time.sleep(next(steps))
+        except StopIteration as done:
+            return done.value
+
+    def _wait_steps(
+        self, timeout: t.Optional[float]
+    ) -> t.Generator[float, None, t.Optional[int]]:
+        """Body of ``wait_for_data`` yielding the delays to sleep for.
+
+        Kept separate so blocking and asyncio callers share the same schedule.
+        """
+        now = started = time.perf_counter()
+        metrics = self.metrics
+        deadline = None if timeout is None else now + timeout
+        due = self._next_frame_due
+        period = self._frame_period
+        # DLOST is cleared by reading STATUS_7, keep it from polls that
+        # found no data so it is reported with the next frame
+        lost = self._trailing_status[0]
+        self._trailing_status[0] = 0
+        if lost & STATUS_ADATA:
+            # The next frame was already there when the last one was read
+            self.last_status = lost
+            self._schedule_next_frame(due, None, now)
+            if metrics is not None:
+                metrics.record_ready(0.0, now, period)
+            return lost
+        lost &= STATUS_DLOST
+        delay = due - POLL_MARGIN - now
+        if delay > 0:
+            if deadline is not None:
+                delay = min(delay, deadline - now)
+            yield delay
+
+        interval = POLL_MIN
+        last_miss = None
+        while True:
+            status = self.device.read_register("STATUS_7") | lost
+            now = time.perf_counter()
+            if metrics is not None:
+                metrics.polls += 1
+            if status & STATUS_ADATA:
+                self.last_status = status
+                self._schedule_next_frame(due, last_miss, now)
+                if metrics is not None:
+                    metrics.record_ready(now - started, now, period)
+                return status
+            lost = status & STATUS_DLOST
+            if deadline is not None and now >= deadline:
+                return None
+            # Only check for the end of the sequence once the frame is overdue
+            if now > due + period + POLL_MAX and not self.ltf_busy:
+                status = self.device.read_register("STATUS_7") | lost
+                if status & STATUS_ADATA:
+                    self.last_status = status
+                    self._schedule_next_frame(due, last_miss, now)
+                    if metrics is not None:
+                        metrics.record_ready(now - started, now, period)
+                    return status
+                return None
+            last_miss = now
+            # The backoff must not carry the last sleep past the deadline
+            yield interval if deadline is None else min(interval, deadline - now)
+            interval = min(interval * 2, POLL_MAX, max(period / 8, POLL_MIN))
+
+    def _schedule_next_frame(
+        self, due: float, last_miss: t.Optional[float], ready: float
+    ):
+        period = self._frame_period
+        if last_miss is not None:
+            # The frame arrived between the last two polls, re-anchor on it
+            self._next_frame_due = (last_miss + ready) / 2 + period
+        elif ready < due:
+            # Device runs ahead of the prediction
+            self._next_frame_due = ready + period
+        else:
+            # Keep to the schedule, skipping frames that were missed
+            self._next_frame_due = due + period * (int((ready - due) / period) + 1)
+
+    def config_snapshot(self) -> t.Dict[str, t.Any]:
+        """Current acquisition settings, taken from the shadow and RAM cache.
+
+        Gains and SMUX bytes that have not been written since the last
+        reset are reported as ``None``.
+        """
+        return {
+            "integration_ticks": self.integration_ticks,
+            "wait_ticks": self.wait_ticks,
+            "channels": self.device.get("CFG_LTF").LTF_CYCLE,
+            "gains": self.gains,
+            "smux": {bank: self._ram_cache.get(bank) for bank in SMUX_BANKS},
+        }
+
+    def analog_saturation(self) -> int:
+        """STATUS_ASAT as a 16 bit mask, bit ``n`` set if ADC ``n`` saturated."""
+        value = self.device.read_register("STATUS_ASAT")
+        return ((value & 0xFF) << 8) | (value >> 8)
+
     @property
     def ltf_busy(self):
         return bool(self.device.get("STATUS_6").LTF_BUSY)
 
     @property
-    def integration_time(self) -> u.Quantity:
-        return self.device.get("LTF_ITIME").ITIME
+    def integration_ticks(self) -> int:
+        """LTF_ITIME in clock ticks, the integration lasts ``ticks + 1``."""
+        return self.device.get_field("LTF_ITIME", "ITIME")
 
-    @integration_time.
-    def integration_time(self, value: u.Quantity):
+    @integration_ticks.setter
+    def integration_ticks(self, value: int):
         self.device.set("LTF_ITIME", ITIME=value)
 
     @property
-    def wait_time(self) -> u.Quantity:
-        return self.device.get("LTF_WTIME").WTIME
+    def integration_time_us(self) -> int:
+        return (self.integration_ticks + 1) * 1_000_000 // CLOCK_HZ
 
-    @wait_time.setter
-    def wait_time(self, value: u.Quantity):
+    @integration_time_us.setter
+    def integration_time_us(self, value: int):
+        self.integration_ticks = int(value) * CLOCK_HZ // 1_000_000 - 1
+
+    @property
+    def integration_time(self) -> "u.Quantity":
+        from astropy import units as u
+
+        return ((self.integration_ticks + 1) / CLOCK_HZ) << u.s
+
+    @integration_time.setter
+    def integration_time(self, value: "u.Quantity"):
+        """Set from a time Quantity or a number of seconds."""
+        self.integration_ticks = round(_to_seconds(value) * CLOCK_HZ) - 1
+
+    @property
+    def wait_ticks(self) -> int:
+        """LTF_WTIME in clock ticks, the wait lasts ``ticks + 1``."""
+        return self.device.get_field("LTF_WTIME", "WTIME")
+
+    @wait_ticks.setter
+    def wait_ticks(self, value: int):
         self.device.set("LTF_WTIME", WTIME=value)
 
+    @property
+    def wait_time_us(self) -> int:
+        return (self.wait_ticks + 1) * 1_000_000 // CLOCK_HZ
+
+    @wait_time_us.setter
+    def wait_time_us(self, value: int):
+        self.wait_ticks = int(value) * CLOCK_HZ // 1_000_000 - 1
+
+    @property
+    def wait_time(self) -> "u.Quantity":
+        from astropy import units as u
+
+        return ((self.wait_ticks + 1) / CLOCK_HZ) << u.s
+
+    @wait_time.setter
+    def wait_time(self, value: "u.Quantity"):
+        """Set from a time Quantity or a number of seconds."""
+        self.wait_ticks = round(_to_seconds(value) * CLOCK_HZ) - 1
+
     def enable_channels(
         self,
         channels: t.Optional[ChannelEnable] = ChannelEnable.ABCD,
     ):
         self.device.set("CFG_LTF", LTF_CYCLE=channels)
 
+    def read_frame(
+        self,
+        channels: t.Optional[np.ndarray] = None,
+        temperatures: t.Optional[np.ndarray] = None,
+    ) -> t.Tuple[np.ndarray, np.ndarray]:
+        """Read all channels and temperatures in one pass.
+
+        TEMP and the channel banks are read as a single contiguous block,
+        stopping after the last bank enabled in ``LTF_CYCLE``; channels of
+        disabled banks are returned as zero. Values are copied into
+        ``channels`` (64 uint16) and ``temperatures`` (4 uint16) when given,
+        otherwise new arrays are returned.
+
+        With a transport that combines reads, STATUS_7 is read in the same
+        transaction after the data. The next ``wait_for_data`` returns at
+        once if another frame had already arrived by then.
+        """
+        if self.metrics is not None:
+            start = time.perf_counter()
+        cycles = len(self.device.get("CFG_LTF").LTF_CYCLE)
+        length = CHANNEL_ADDRESS - TEMP_ADDRESS + 32 * cycles
+        buffer = memoryview(self._frame_buffer)
+        i2c = self.device._i2c
+        if i2c.combined_reads:
+            i2c.read_blocks(
+                self.device._i2c_address,
+                (
+                    (TEMP_ADDRESS, buffer[:length]),
+                    (STATUS_7_ADDRESS, memoryview(self._trailing_status)),
+                ),
+            )
+        else:
+            self._read_block(TEMP_ADDRESS, buffer[:length])
+        buffer[length:] = bytes(FRAME_SIZE - length)
+
+        if channels is None:
+            channels = np.empty(NUM_CHANNELS, dtype=np.uint16)
+        if temperatures is None:
+            temperatures = np.empty(4, dtype=np.uint16)
+        np.copyto(channels, self._frame_channels)
+        np.copyto(temperatures, self._frame_temperatures)
+        if self.metrics is not None:
+            self.metrics.readout.record(time.perf_counter() - start)
+        return channels, temperatures
+
     def channel_data(self, channel_label: t.Literal["A", "B", "C", "D"]) -> t.List[int]:
         reg = self.device.get(f"CHANNEL_{channel_label}")
 
@@ -599,36 +1265,179 @@ class AS7421:
         return ESTIMATED_WAVELENGTHS
 
     def setup_regs(self):
-        self.device.set("CFG_MISC", LED_WAIT_OFF=0, WAIT_CYCLE_ON=1)
-        self.device.set("LED_WAIT", LED_WAIT=2)
-        self.device.set("LTF_CCOUNT", CCOUNT=1023)
-        self.device.set("ENABLE", LED_AUTO="OFF")
-        self.integration_time = 20 << u.ms
-        self.wait_time = 10 << u.ms
-        self.num_measurements = 1
-        self.device.set("CFG_LTF", LTF_CYCLE="ABCD")
-        self.enable_autozero(
-            True,
-            1,
-            0,
-            "128us",
-        )
-        self.enable_led_wait()
+        with self.device.deferred():
+            self.device.set("CFG_MISC", LED_WAIT_OFF=0, WAIT_CYCLE_ON=1)
+            self.device.set("LED_WAIT", LED_WAIT=2)
+            self.device.set("LTF_CCOUNT", CCOUNT=1023)
+            self.device.set("ENABLE", LED_AUTO="OFF")
+            self.integration_time_us = 20_000
+            self.wait_time_us = 10_000
+            self.num_measurements = 1
+            self.device.set("CFG_LTF", LTF_CYCLE="ABCD")
+            self.enable_autozero(
+                True,
+                1,
+                0,
+                "128us",
+            )
+            self.enable_led_wait()
 
     def do_measurement(
         self, with_led: t.Optional[bool] = True, print_timing: t.Optional[bool] = False
     ) -> t.Generator[t.Tuple[float, t.List[int], t.List[int]], None, None]:
-        import time
+        remaining = self.num_measurements or None
+        self.start_measurement(with_led=with_led)
+        try:
+            # With ICOUNT set the sequence length is known, so the generator
+            # does not need to wait for LTF_BUSY to drop after the last frame
+            while remaining != 0:
+                start = time.perf_counter()
+                if self.wait_for_data() is None:
+                    break
+                end = time.perf_counter()
+                if print_timing:
+                    print(f"Time to get data: {end - start:.6f} s")
+                channel_data, temperature_data = self.read_frame()
+                yield end, channel_data.tolist(), temperature_data.tolist()
+                if remaining is not None:
+                    remaining -= 1
+        finally:
+            self.stop_measurement()
+
+    def differential_measurement(self, pairs: int) -> DifferentialFrames:
+        """Take ``pairs`` LED off/on frame pairs in a single sequence.
+
+        ICOUNT is set to ``2 * pairs`` and the LED is driven with ``OFF1ON2``
+        so it alternates between frames, then all pairs are subtracted at
+        once. If the device reports lost data the position in the sequence,
+        and with it the LED state, is no longer known, so the pair of the
+        last frame read is dropped and a new sequence started for the rest.
+        """
+        if not 1 <= pairs <= 0xFF // 2:
+            raise ValueError(f"pairs must be between 1 and {0xFF // 2}")
+        count = 2 * pairs
+        timestamps = np.zeros(count, dtype=np.float64)
+        channels = np.zeros((count, NUM_CHANNELS), dtype=np.uint16)
+        temperatures = np.zeros((count, 4), dtype=np.uint16)
+        status = np.zeros(count, dtype=np.uint8)
+        restarts = 0
+
+        self.num_measurements = count
+        self.start_measurement(with_led="OFF1ON2")
+        idx = 0
+        pointer = None
+        stalled = 0
+        try:
+            while idx < count:
+                frame_status = self.wait_for_data()
+                lost = frame_status is None or bool(frame_status & STATUS_DLOST)
+                if not lost:
+                    # I2C_DATA_POINTER skipping ahead also means a frame
+                    # arrived unnoticed, e.g. during the previous read
+                    previous, pointer = pointer, frame_status >> 6
+                    lost = previous is not None and (pointer - previous) % 4 > 1
+                if lost:
+                    pointer = None
+                    stalled += 1
+                    if stalled > MAX_STALLED_RESTARTS:
+                        raise RuntimeError(
+                            "Frames are lost faster than pairs can be read, "
+                            "increase the integration or wait time"
+                        )
+                    # The frame read last may already have been overwritten
+                    # by the one lost, drop the pair it belongs to as well
+                    idx = max(idx - 1, 0)
+                    idx -= idx % 2
+                    self.num_measurements = count - idx
+                    self.rearm_measurement(with_led="OFF1ON2")
+                    restarts += 1
+                    if frame_status is None:
+                        continue
+                timestamps[idx] = time.perf_counter()
+                # Read even when discarding, this clears ADATA
+                self.read_frame(channels[idx], temperatures[idx])
+                status[idx] = frame_status
+                if not lost:
+                    idx += 1
+                    if idx % 2 == 0:
+                        stalled = 0
+        finally:
+            self.stop_measurement()
+
+        difference = channels[1::2].astype(np.int32)
+        difference -= channels[0::2]
+        return DifferentialFrames(
+            timestamps[1::2],
+            difference,
+            temperatures[1::2],
+            status[0::2] | status[1::2],
+            restarts,
+        )
 
+    def continuous_measurement(
+        self, with_led: bool = True, stats: t.Optional[ContinuousStats] = None
+    ) -> t.Generator[t.Tuple[float, int], None, None]:
+        """Acquire without end, re-arming after every ICOUNT frames.
+
+        Yields the timestamp and STATUS_7 value of each frame, which should be
+        read with :meth:`read_frame` before the next one is requested. The
+        last frame of a sequence is yielded after the next sequence has been
+        started, so it is read out while the following frame integrates and
+        the only dead time is the re-arm itself. ``stats`` is updated as the
+        acquisition runs.
+
+        If frames were lost and the sequence ended earlier than counted, or
+        ICOUNT is 0, the sequence is re-armed once it is seen to have ended.
+        """
+        stats = ContinuousStats() if stats is None else stats
+        batch = self.num_measurements or None
+        remaining = batch
         self.start_measurement(with_led=with_led)
-        while self.ltf_busy:
-            start = time.perf_counter()
-            while not self.measurement_ready:
-                pass
-            end = time.perf_counter()
-            if print_timing:
-                print(f"Time to get data: {end,- start}")
-            channel_data = self.all_channel_data()
-            temperature_data = self.all_temperature_data()
-            yield end, channel_data, temperature_data
-        self.stop_measurement()
+        started = time.perf_counter()
+        batch_end = None
+        try:
+            while True:
+                status = self.wait_for_data()
+                now = time.perf_counter()
+                if status is None:
+                    batch_end = batch_end or now
+                    self._rearm(with_led, stats)
+                    remaining = batch
+                    continue
+
+                if batch_end is not None:
+                    stats.add_gap(now - batch_end - self._frame_period)
+                    batch_end = None
+                if status & STATUS_DLOST:
+                    stats.lost_frames += 1
+                    # The count is off, find out if this was the last frame
+                    if remaining is not None and not self.ltf_busy:
+                        remaining = 1
+                if remaining is not None:
+                    remaining -= 1
+                    if remaining == 0:
+                        self._rearm(with_led, stats)
+                        remaining = batch
+                        batch_end = now
+
+                stats.frames += 1
+                stats.elapsed = now - started
+                yield now, status
+        finally:
+            self.stop_measurement()
+
+    def _rearm(self, with_led: bool, stats: ContinuousStats):
+        start = time.perf_counter()
+        self.rearm_measurement(with_led=with_led)
+        took = time.perf_counter() - start
+        stats.rearms += 1
+        stats.rearm_time += took
+        stats.max_rearm = max(stats.max_rearm, took)
+
+    def do_continuous_measurement(
+        self, with_led: bool = True, stats: t.Optional[ContinuousStats] = None
+    ) -> t.Generator[t.Tuple[float, t.List[int], t.List[int]], None, None]:
+        """Like :meth:`do_measurement`, but not limited to ICOUNT frames."""
+        for timestamp, _ in self.continuous_measurement(with_led, stats):
+            channel_data, temperature_data = self.read_frame()
+            yield timestamp, channel_data.tolist(), temperature_data.tolist()
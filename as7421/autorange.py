@@ -0,0 +1,135 @@
+"""Closed loop integration time and per channel gain control."""
+
+import typing as t
+
+import numpy as np
+from as7421.as7421 import AS7421, CLOCK_HZ, NUM_CHANNELS, STATUS_ASAT, STATUS_DSAT
+
+FULL_SCALE = 0xFFFF
+
+
+class AutoRanger:
+    """Converge integration time and channel gains from measured frames.
+
+    Integration time is chosen so the brightest channel reaches ``target``
+    (a fraction of full scale) at ``base_gain``; every other channel then
+    gets the highest gain that keeps it at or below the target. Gain steps
+    are assumed to double the response. Saturated frames (DSAT, ASAT or a
+    channel above ``high``) lower the gain of the offending channels, or
+    halve the integration time once they are at ``min_gain``.
+
+    Only settings that change are written: the register shadow skips an
+    unchanged LTF_ITIME and the RAM cache only uploads modified ASETUP bytes.
+    """
+
+    def __init__(
+        self,
+        sensor: AS7421,
+        target: float = 0.6,
+        low: float = 0.25,
+        high: float = 0.9,
+        base_gain: int = 6,
+        min_gain: int = 0,
+        max_gain: int = 10,
+        min_integration_time: float = 50e-6,
+        max_integration_time: float = 0.5,
+    ):
+        self.sensor = sensor
+        self.target = target
+        self.low = low
+        self.high = high
+        self.base_gain = base_gain
+        self.min_gain = min_gain
+        self.max_gain = max_gain
+        self.min_integration_time = min_integration_time
+        self.max_integration_time = max_integration_time
+
+    def _gains(self) -> np.ndarray:
+        gains = self.sensor.gains
+        if any(g is None for g in gains):
+            self.sensor.configure_gain(self.base_gain)
+            gains = self.sensor.gains
+        return np.array(gains, dtype=np.int64)
+
+    def update(
+        self, channels: np.ndarray, status: int, asat: int = 0
+    ) -> bool:
+        """Adjust settings from one frame, returns True once settled.
+
+        ``status`` is the frame's STATUS_7 value and ``asat`` the
+        STATUS_ASAT mask (see :meth:`AS7421.analog_saturation`).
+        """
+        sensor = self.sensor
+        channels = np.asarray(channels, dtype=np.float64)
+        gains = self._gains()
+        ticks = sensor.integration_ticks
+        itime = (ticks + 1) / CLOCK_HZ
+        enabled = np.arange(NUM_CHANNELS) < 16 * len(
+            sensor.device.get("CFG_LTF").LTF_CYCLE
+        )
+
+        saturated = channels >= self.high * FULL_SCALE
+        if status & STATUS_ASAT:
+            adc_saturated = (asat >> (np.arange(NUM_CHANNELS) % 16)) & 1
+            saturated |= adc_saturated.astype(bool)
+        if status & STATUS_DSAT:
+            saturated |= channels >= FULL_SCALE
+        saturated &= enabled
+
+        new_gains = gains.copy()
+        new_itime = itime
+        if saturated.any():
+            reducible = saturated & (gains > self.min_gain)
+            new_gains[reducible] = np.maximum(gains[reducible] - 2, self.min_gain)
+            if (saturated & ~reducible).any():
+                new_itime = itime / 2
+        else:
+            rate = channels / (itime * 2.0 ** (gains - self.base_gain))
+            brightest = rate[enabled].max()
+            if brightest > 0:
+                new_itime = self.target * FULL_SCALE / brightest
+            else:
+                new_itime = self.max_integration_time
+            new_itime = min(
+                max(new_itime, self.min_integration_time), self.max_integration_time
+            )
+            with np.errstate(divide="ignore"):
+                headroom = np.log2(self.target * FULL_SCALE / (rate * new_itime))
+            new_gains = np.clip(
+                np.floor(headroom) + self.base_gain, self.min_gain, self.max_gain
+            ).astype(np.int64)
+            new_gains[~enabled] = gains[~enabled]
+
+        sensor.integration_ticks = round(new_itime * CLOCK_HZ) - 1
+        itime_changed = sensor.integration_ticks != ticks
+        gains_changed = not np.array_equal(new_gains, gains)
+        if gains_changed:
+            sensor.configure_gain(new_gains.tolist())
+
+        levels = channels[enabled] / FULL_SCALE
+        in_range = (levels <= self.high) & (
+            (levels >= self.low) | (gains[enabled] >= self.max_gain)
+        )
+        return not (itime_changed or gains_changed or saturated.any()) and bool(
+            in_range.all()
+        )
+
+    def run(self, max_frames: int = 10, with_led: bool = True) -> bool:
+        """Take single frames until settled, returns False if it never did."""
+        sensor = self.sensor
+        count = sensor.num_measurements
+        sensor.num_measurements = 1
+        try:
+            for _ in range(max_frames):
+                channels = None
+                for _, channels, _ in sensor.do_measurement(with_led=with_led):
+                    pass
+                if channels is None:
+                    continue
+                status = sensor.last_status
+                asat = sensor.analog_saturation() if status & STATUS_ASAT else 0
+                if self.update(np.asarray(channels), status, asat):
+                    return True
+            return False
+        finally:
+            sensor.num_measurements = count
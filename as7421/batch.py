@@ -0,0 +1,225 @@
+"""Reprocess recordings into calibrated spectra on all cores.
+
+Recordings made with :class:`as7421.recorder.FrameRecorder` are cut into
+shards of ``shard_frames`` frames which a process pool converts with a
+:class:`CalibrationEngine`. The engine is built once in the parent and its
+folded tables are memory mapped read-only by every worker, so calibration
+files are neither parsed nor copied per worker.
+
+Each recording produces one ``<name>.spectra.npy`` file of
+:func:`output_dtype` records, one per frame and in frame order. Workers
+write their shard straight into it, so memory use is bounded by the
+shards in flight. Shard boundaries depend only on ``shard_frames``, so the
+output does not depend on the number of workers.
+
+The same is available from the command line as ``as7421-batch``.
+"""
+
+import argparse
+import multiprocessing
+import os
+import tempfile
+import typing as t
+
+import numpy as np
+
+from as7421.calibration import load_calib_file
+from as7421.processing import (
+    TEMPERATURE_DEGREE,
+    CalibrationEngine,
+    TemperatureCompensator,
+)
+from as7421.recorder import FrameReader
+
+SHARD_FRAMES = 4096
+# Recordings each worker keeps open between shards
+OPEN_READERS = 4
+
+
+def output_dtype(points: int) -> np.dtype:
+    return np.dtype(
+        [
+            ("timestamp", "<f8"),
+            ("status", "u1"),
+            ("spectrum", "<f4", (points,)),
+        ]
+    )
+
+
+def output_path(recording: str, output_dir: str) -> str:
+    name = os.path.splitext(os.path.basename(recording))[0]
+    return os.path.join(output_dir, f"{name}.spectra.npy")
+
+
+# Per worker state, set up by _init_worker
+_engine: t.Optional[CalibrationEngine] = None
+_compensator: t.Optional[TemperatureCompensator] = None
+_readers: t.Dict[str, FrameReader] = {}
+
+
+def _init_worker(tables: str, compensation: t.Optional[t.Tuple]):
+    global _engine, _compensator
+    folded = np.load(tables, mmap_mode="r")
+    _engine = CalibrationEngine.from_folded(folded[:-1], folded[-1])
+    _compensator = (
+        TemperatureCompensator(*compensation) if compensation is not None else None
+    )
+    _readers.clear()
+
+
+def _reader(path: str) -> FrameReader:
+    reader = _readers.pop(path, None)
+    if reader is None:
+        if len(_readers) >= OPEN_READERS:
+            _readers.pop(next(iter(_readers))).close()
+        reader = FrameReader(path)
+    # Most recently used last
+    _readers[path] = reader
+    return reader
+
+
+def _process_shard(shard: t.Tuple[str, str, int, int]) -> int:
+    recording, output, start, stop = shard
+    records = _reader(recording)[start:stop]
+    frames = records["channels"]
+    if _compensator is not None:
+        frames = _compensator.apply(frames, records["temperatures"])
+    out = np.load(output, mmap_mode="r+")
+    try:
+        block = out[start:stop]
+        block["timestamp"] = records["timestamp"]
+        block["status"] = records["status"]
+        block["spectrum"] = _engine.process(frames)
+        out.flush()
+    finally:
+        del out
+    return stop - start
+
+
+def process_recordings(
+    recordings: t.Sequence[str],
+    calibration: str,
+    output_dir: str,
+    workers: t.Optional[int] = None,
+    shard_frames: int = SHARD_FRAMES,
+    absolute: bool = False,
+    temperature_compensation: t.Optional[t.Dict[str, t.Any]] = None,
+) -> t.Iterator[t.Tuple[str, str, int]]:
+    """Convert ``recordings`` to spectra with ``workers`` processes.
+
+    Yields ``(recording, output, frames)`` as each recording is completed,
+    in the order given. ``workers`` defaults to the number of CPUs.
+    ``temperature_compensation`` holds the keyword arguments of
+    :meth:`TemperatureCompensator.from_calibration`, without it frames
+    are not compensated. Outputs are named after the recordings' file
+    names, so recordings with the same name from different directories
+    raise a ValueError before anything is written.
+    """
+    if shard_frames < 1:
+        raise ValueError("shard_frames must be positive")
+    outputs: t.Dict[str, t.List[str]] = {}
+    for recording in recordings:
+        outputs.setdefault(output_path(recording, output_dir), []).append(recording)
+    duplicates = [names for names in outputs.values() if len(names) > 1]
+    if duplicates:
+        raise ValueError(
+            "Recordings would overwrite each other's output: "
+            + "; ".join(", ".join(names) for names in duplicates)
+        )
+    os.makedirs(output_dir, exist_ok=True)
+    calib = load_calib_file(calibration)
+    engine = CalibrationEngine.from_calibration(calib, absolute)
+    compensation = None
+    if temperature_compensation is not None:
+        compensator = TemperatureCompensator.from_calibration(
+            calib, **temperature_compensation
+        )
+        compensation = (
+            compensator.coefficients,
+            compensator.reference,
+            compensator.scale,
+            compensator.offset,
+        )
+
+    # Create every output up front and describe the work as shards
+    jobs = []
+    shards = []
+    for recording in recordings:
+        output = output_path(recording, output_dir)
+        with FrameReader(recording) as reader:
+            count = len(reader)
+        np.lib.format.open_memmap(
+            output, mode="w+", dtype=output_dtype(engine.points), shape=(count,)
+        ).flush()
+        jobs.append((recording, output, count, -(-count // shard_frames)))
+        shards.extend(
+            (recording, output, start, min(start + shard_frames, count))
+            for start in range(0, count, shard_frames)
+        )
+
+    with tempfile.TemporaryDirectory(prefix="as7421-batch-") as tmp:
+        tables = os.path.join(tmp, "engine.npy")
+        np.save(tables, np.vstack([engine.gain, engine.offset[None, :]]))
+        with multiprocessing.Pool(
+            workers, initializer=_init_worker, initargs=(tables, compensation)
+        ) as pool:
+            # imap keeps shard order, so recordings finish in input order
+            results = pool.imap(_process_shard, shards)
+            for recording, output, count, num_shards in jobs:
+                for _ in range(num_shards):
+                    next(results)
+                yield recording, output, count
+
+
+def main(argv: t.Optional[t.Sequence[str]] = None):
+    parser = argparse.ArgumentParser(
+        prog="as7421-batch",
+        description="Convert AS7421 recordings to calibrated spectra in parallel.",
+    )
+    parser.add_argument("recordings", nargs="+", help="recording files")
+    parser.add_argument("-c", "--calibration", required=True, help="calibration file")
+    parser.add_argument("-o", "--output-dir", default=".", help="output directory")
+    parser.add_argument("-j", "--workers", type=int, default=None)
+    parser.add_argument("--shard-frames", type=int, default=SHARD_FRAMES)
+    parser.add_argument(
+        "--absolute", action="store_true", help="scale by the white reference"
+    )
+    parser.add_argument(
+        "--temperature-compensation",
+        nargs=3,
+        type=float,
+        metavar=("SCALE", "OFFSET", "REFERENCE"),
+        help="apply the calibration's temperature polynomials, converting TEMP "
+        "readings as SCALE * TEMP + OFFSET and normalising to REFERENCE",
+    )
+    parser.add_argument(
+        "--temperature-degree",
+        type=int,
+        default=TEMPERATURE_DEGREE,
+        help="highest power of the temperature polynomials to use "
+        f"(default {TEMPERATURE_DEGREE})",
+    )
+    args = parser.parse_args(argv)
+    compensation = None
+    if args.temperature_compensation is not None:
+        scale, offset, reference = args.temperature_compensation
+        compensation = {
+            "scale": scale,
+            "offset": offset,
+            "reference": reference,
+            "degree": args.temperature_degree,
+        }
+    for recording, output, count in process_recordings(
+        args.recordings,
+        args.calibration,
+        args.output_dir,
+        workers=args.workers,
+        shard_frames=args.shard_frames,
+        absolute=args.absolute,
+        temperature_compensation=compensation,
+    ):
+        print(f"{recording}: {count} frames -> {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,10 @@
 """Loader for calibration file."""
 
+import hashlib
+import typing as t
+from collections import OrderedDict
+
+import numpy as np
 from construct import (
     Struct,
     Int8ul,
@@ -13,6 +18,8 @@ from construct import (
     Bytes,
     Int32sl,
     Container,
+    FormatField,
+    Renamed,
 )
 
 calibration_data_structure = Struct(
@@ -151,3 +158,164 @@ def parse_calib_file(file_path: str) -> Container:
     with open(file_path, "rb") as file:
         data = calibration_data_structure.parse(file.read())
     return data
+
+
+def _dtype_from_construct(subcon) -> np.dtype:
+    """NumPy dtype with the same layout as a fixed size construct."""
+    if isinstance(subcon, Renamed):
+        return _dtype_from_construct(subcon.subcon)
+    if isinstance(subcon, FormatField):
+        # struct codes like "L" are platform sized in NumPy, use explicit sizes
+        order, code = subcon.fmtstr[0], subcon.fmtstr[-1]
+        kind = "f" if code in "efd" else "u" if code.isupper() else "i"
+        return np.dtype(f"{order}{kind}{subcon.length}")
+    if isinstance(subcon, Bytes):
+        return np.dtype((np.uint8, (subcon.length,)))
+    if isinstance(subcon, Array):
+        return np.dtype((_dtype_from_construct(subcon.subcon), (subcon.count,)))
+    if isinstance(subcon, Struct):
+        names, formats, offsets = [], [], []
+        offset = 0
+        for field in subcon.subcons:
+            if field.name is not None:
+                names.append(field.name)
+                formats.append(_dtype_from_construct(field))
+                offsets.append(offset)
+            # Padding has no name and only advances the offset
+            offset += field.sizeof()
+        return np.dtype(
+            {"names": names, "formats": formats, "offsets": offsets, "itemsize": offset}
+        )
+    raise TypeError(f"Cannot map {subcon} to a NumPy dtype")
+
+
+calibration_dtype = _dtype_from_construct(calibration_data_structure)
+
+
+class CalibrationData:
+    """Zero-copy view of a calibration file.
+
+    Fields are looked up lazily in a structured array laid out like
+    ``calibration_data_structure``. Arrays are returned as NumPy views so
+    only the pages of the fields actually used are read from a memory mapped
+    file. Scalars are returned as Python numbers, ``Bytes`` fields as
+    ``bytes`` and nested structs as another ``CalibrationData``; values are
+    the same as those produced by ``parse_calib_file``.
+    """
+
+    def __init__(self, record: np.ndarray, structure: Struct = calibration_data_structure):
+        self._record = record
+        self._fields = {
+            field.name: field.subcon for field in structure.subcons if field.name
+        }
+
+    def __getattr__(self, name: str):
+        try:
+            subcon = self._fields[name]
+        except KeyError:
+            raise AttributeError(name) from None
+        column = self._record[name]
+        if isinstance(subcon, Struct):
+            return CalibrationData(column, subcon)
+        value = column[0]
+        if isinstance(subcon, Bytes):
+            return value.tobytes()
+        if isinstance(subcon, FormatField):
+            return value.item()
+        return value
+
+    def __getitem__(self, name: str):
+        return getattr(self, name)
+
+    def __dir__(self):
+        return list(self._fields)
+
+    def keys(self) -> t.List[str]:
+        return list(self._fields)
+
+
+def load_calib_data(data: bytes) -> CalibrationData:
+    """Wrap an in-memory calibration blob without copying it."""
+    return CalibrationData(np.frombuffer(data, dtype=calibration_dtype, count=1))
+
+
+def load_calib_file(file_path: str) -> CalibrationData:
+    """Memory map a calibration file, see :class:`CalibrationData`."""
+    return CalibrationData(
+        np.memmap(file_path, dtype=calibration_dtype, mode="r", shape=(1,))
+    )
+
+
+def calibration_key(data: CalibrationData) -> str:
+    """Identity of a calibration from its checksum, chip and device ids."""
+    digest = hashlib.sha1(data.chip_ident + data.device_id).hexdigest()[:16]
+    return f"{data.checksum & 0xFFFFFFFFFFFFFFFF:016x}-{digest}"
+
+
+def _content_digest(data: CalibrationData) -> bytes:
+    return hashlib.blake2b(data._record.tobytes(), digest_size=16).digest()
+
+
+class _CacheEntry:
+    __slots__ = ("data", "digest", "derived")
+
+    def __init__(self, data: CalibrationData, digest: bytes):
+        self.data = data
+        self.digest = digest
+        self.derived: t.Dict[t.Hashable, t.Any] = {}
+
+
+class CalibrationCache:
+    """Bounded in-memory cache of calibrations and of tables built from them.
+
+    Entries are keyed by :func:`calibration_key` and hold the memory mapped
+    calibration together with whatever :meth:`derive` built from it, such
+    as a folded ``CalibrationEngine``. A digest of the whole record is taken
+    when an entry is created and checked on every load, so a file rewritten
+    under an unchanged key replaces the entry instead of serving stale
+    tables. At most ``max_entries`` calibrations are kept, the least
+    recently used one being evicted.
+    """
+
+    def __init__(self, max_entries: int = 32):
+        if max_entries < 1:
+            raise ValueError("max_entries must be positive")
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _entry(self, data: CalibrationData) -> _CacheEntry:
+        key = calibration_key(data)
+        digest = _content_digest(data)
+        entry = self._entries.get(key)
+        if entry is None or entry.digest != digest:
+            entry = self._entries[key] = _CacheEntry(data, digest)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+
+    def load(self, file_path: str) -> CalibrationData:
+        """Load ``file_path``, returning the cached calibration if it matches."""
+        return self._entry(load_calib_file(file_path)).data
+
+    def derive(
+        self,
+        data: CalibrationData,
+        name: t.Hashable,
+        factory: t.Callable[[CalibrationData], t.Any],
+    ) -> t.Any:
+        """``factory(data)``, built once per calibration and ``name``.
+
+        For example ``cache.derive(data, "engine",
+        CalibrationEngine.from_calibration)``.
+        """
+        entry = self._entry(data)
+        if name not in entry.derived:
+            entry.derived[name] = factory(entry.data)
+        return entry.derived[name]
+
+    def clear(self):
+        self._entries.clear()
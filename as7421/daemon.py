@@ -0,0 +1,615 @@
+"""Serve one sensor's frames to several processes through shared memory.
+
+:class:`FrameServer` owns the sensor, acquires continuously and publishes
+every frame into a ``multiprocessing.shared_memory`` ring of
+:data:`as7421.recorder.frame_dtype` records. Any number of
+:class:`FrameSubscriber` in other processes attach to the ring by name and
+read frames in place, so frames are read from the bus once and not
+copied per consumer.
+
+The ring is guarded by one sequence counter in its header, used as a
+seqlock: the server makes it odd while a slot is being written and even
+once the frame is published, so ``sequence // 2`` frames have been
+published. A reader compares the counter with the frames it holds to tell
+whether the writer has come round to them, see
+:meth:`FrameSubscriber.valid`.
+
+Python has no memory fences, so the counter and the slots are plain
+stores and loads in shared memory. On strongly ordered CPUs (x86) other
+processes see them in program order and the scheme holds. On weakly
+ordered CPUs such as the ARM cores of a Raspberry Pi the hardware may
+reorder them: a subscriber can see a frame counted as published before
+its data has arrived, or miss that the writer has already started
+overwriting it. There, ``valid`` and ``read`` only catch overwrites that
+are already visible in the counter and cannot guarantee a torn frame is
+never returned; keep subscribers well behind the writer (a large
+``capacity``) if that matters.
+
+Settings are changed through a Unix socket taking one JSON request per
+line (see :data:`COMMANDS`) and answering each with one JSON line. Requests
+run on the acquisition thread between frames, as the sensor is not
+shared between threads. The ``config`` field of each frame is the number
+of configuration changes made before it was taken.
+
+The server can be started from the command line as ``as7421-daemon``.
+"""
+
+import argparse
+import errno
+import json
+import os
+import queue
+import socket
+import socketserver
+import stat
+import threading
+import time
+import typing as t
+from concurrent.futures import Future
+from dataclasses import dataclass
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from as7421.as7421 import (
+    AS7421,
+    CLOCK_HZ,
+    MAX_TICKS,
+    NUM_CHANNELS,
+    ContinuousStats,
+)
+from as7421.profiles import Profile, apply_profile
+from as7421.recorder import frame_dtype
+
+MAGIC = b"AS7421SM"
+VERSION = 1
+DEFAULT_CAPACITY = 4096
+# Subscribers poll the sequence counter at this interval while waiting
+POLL_INTERVAL = 0.001
+COMMAND_TIMEOUT = 10.0
+
+header_dtype = np.dtype(
+    [
+        ("magic", "S8"),
+        ("version", "<u4"),
+        ("capacity", "<u4"),
+        ("sequence", "<u8"),
+        ("lost_frames", "<u8"),
+        ("config", "<u4"),
+        ("running", "u1"),
+    ]
+)
+HEADER_SIZE = 64
+
+COMMANDS = ("status", "set", "profile", "stop")
+# Settings accepted by the ``set`` command
+SETTINGS = ("integration_time_us", "wait_time_us", "num_measurements", "gain", "led")
+
+# LTF_ICOUNT is one byte
+MAX_MEASUREMENTS = 0xFF
+
+
+def _setting_int(request: t.Dict[str, t.Any], setting: str) -> int:
+    value = request[setting]
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid {setting} {value!r}") from None
+
+
+def _check_settings(request: t.Dict[str, t.Any]) -> t.Dict[str, t.Any]:
+    """Settings of a ``set`` request, converted and checked as a whole.
+
+    Nothing is applied unless every setting is valid.
+    """
+    unknown = set(request) - set(SETTINGS) - {"command"}
+    if unknown:
+        raise ValueError(f"Unknown settings {sorted(unknown)}")
+    settings: t.Dict[str, t.Any] = {}
+    for setting in ("integration_time_us", "wait_time_us"):
+        if setting in request:
+            value = _setting_int(request, setting)
+            if not 0 <= value * CLOCK_HZ // 1_000_000 - 1 <= MAX_TICKS:
+                raise ValueError(f"{setting} {value} is out of range")
+            settings[setting] = value
+    if "num_measurements" in request:
+        value = _setting_int(request, "num_measurements")
+        if not 0 <= value <= MAX_MEASUREMENTS:
+            raise ValueError(f"num_measurements {value} is out of range")
+        settings["num_measurements"] = value
+    if "gain" in request:
+        gain = request["gain"]
+        try:
+            if isinstance(gain, (int, float)):
+                gains = [int(gain)]
+            else:
+                gains = [int(x) for x in gain]
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid gain {gain!r}") from None
+        if len(gains) not in (1, NUM_CHANNELS):
+            raise ValueError(f"Expected 1 or {NUM_CHANNELS} gain values")
+        if not all(0 <= x <= 0xFF for x in gains):
+            raise ValueError(f"Invalid gain {gain!r}")
+        settings["gain"] = gains[0] if len(gains) == 1 else gains
+    if "led" in request:
+        settings["led"] = bool(request["led"])
+    return settings
+
+
+# Rings created by servers in this process
+_served: t.Set[str] = set()
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    try:
+        return shared_memory.SharedMemory(name, track=False)
+    except TypeError:
+        shm = shared_memory.SharedMemory(name)
+        if os.name == "posix" and shm.name not in _served:
+            # Only the server unlinks the ring, keep the tracker from doing so
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+def _views(shm: shared_memory.SharedMemory, capacity: int):
+    header = np.ndarray((), dtype=header_dtype, buffer=shm.buf)
+    frames = np.ndarray(
+        (capacity,), dtype=frame_dtype, buffer=shm.buf, offset=HEADER_SIZE
+    )
+    return header, frames
+
+
+class FrameServer:
+    """Acquire from ``sensor`` into a shared memory ring of ``capacity`` frames.
+
+    The ring is created under ``name``, or a generated name available as
+    :attr:`name`, and removed by :meth:`close`. With ``socket_path`` a
+    control socket is served there. The sensor should be set up before the
+    server is started.
+    """
+
+    def __init__(
+        self,
+        sensor: AS7421,
+        name: t.Optional[str] = None,
+        capacity: int = DEFAULT_CAPACITY,
+        socket_path: t.Optional[str] = None,
+        with_led: bool = True,
+    ):
+        if capacity < 1:
+            raise ValueError("capacity must be positive")
+        self.sensor = sensor
+        self.capacity = capacity
+        self.socket_path = socket_path
+        self.with_led = with_led
+        self.stats = ContinuousStats()
+        self.error: t.Optional[BaseException] = None
+
+        self.shm = shared_memory.SharedMemory(
+            name, create=True, size=HEADER_SIZE + capacity * frame_dtype.itemsize
+        )
+        _served.add(self.shm.name)
+        self.header, self.frames = _views(self.shm, capacity)
+        self.header["magic"] = MAGIC
+        self.header["version"] = VERSION
+        self.header["capacity"] = capacity
+        # Column and row views are created once so publishing allocates nothing
+        self._timestamps = self.frames["timestamp"]
+        self._status = self.frames["status"]
+        self._config = self.frames["config"]
+        self._channel_rows = list(self.frames["channels"])
+        self._temperature_rows = list(self.frames["temperatures"])
+        self._sequence = 0
+        self.config_id = 0
+        self._config_snapshot = sensor.config_snapshot()
+
+        self._commands: queue.Queue = queue.Queue()
+        # Held while queueing a command and while the stopped server drains
+        # the queue, so no command is queued after the final drain
+        self._commands_lock = threading.Lock()
+        self._accepting = False
+        self._stop = threading.Event()
+        self._thread: t.Optional[threading.Thread] = None
+        self._control: t.Optional[socketserver.ThreadingUnixStreamServer] = None
+        self._control_thread: t.Optional[threading.Thread] = None
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @property
+    def published(self) -> int:
+        return self._sequence // 2
+
+    def start(self):
+        if self._thread is not None:
+            raise RuntimeError("Server already running")
+        self._stop.clear()
+        # Bind first, so a socket in use fails before acquiring starts
+        if self.socket_path is not None and self._control is None:
+            self._control = _ControlServer(self.socket_path, self)
+            self._control_thread = threading.Thread(
+                target=self._control.serve_forever,
+                name="as7421-control",
+                daemon=True,
+            )
+            self._control_thread.start()
+        self.header["running"] = 1
+        with self._commands_lock:
+            self._accepting = True
+        self._thread = threading.Thread(
+            target=self._run, name="as7421-server", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def close(self):
+        """Stop, remove the control socket and unlink the ring."""
+        try:
+            self.stop()
+            if self._control is not None:
+                self._control.shutdown()
+                self._control.server_close()
+                self._control_thread.join()
+                self._control = None
+                try:
+                    os.unlink(self.socket_path)
+                except FileNotFoundError:
+                    pass
+        finally:
+            del self.header, self.frames, self._timestamps, self._status, self._config
+            self._channel_rows = self._temperature_rows = []
+            self.shm.close()
+            self.shm.unlink()
+            _served.discard(self.shm.name)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def wait(self, timeout: t.Optional[float] = None) -> bool:
+        """Wait for the acquisition to end, returns False on timeout."""
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                return False
+        if self.error is not None:
+            raise self.error
+        return True
+
+    def submit(self, request: t.Dict[str, t.Any]) -> "Future[t.Dict[str, t.Any]]":
+        """Queue a control request, see :data:`COMMANDS`.
+
+        ``status`` is answered at once, anything else once the current
+        frame has been published.
+        """
+        future: Future = Future()
+        command = request.get("command")
+        if command not in COMMANDS:
+            future.set_exception(ValueError(f"Unknown command {command!r}"))
+            return future
+        if command == "status":
+            future.set_result(self.status())
+            return future
+        if command == "set":
+            # Rejected here, a bad request must not interrupt the acquisition
+            try:
+                request = {"command": command, **_check_settings(request)}
+            except ValueError as e:
+                future.set_exception(e)
+                return future
+        with self._commands_lock:
+            if self._accepting:
+                self._commands.put((request, future))
+            else:
+                future.set_exception(RuntimeError("Server is not running"))
+        return future
+
+    def status(self) -> t.Dict[str, t.Any]:
+        stats = self.stats
+        return {
+            "name": self.name,
+            "capacity": self.capacity,
+            "running": self._thread is not None and self._thread.is_alive(),
+            "published": self.published,
+            "frames": stats.frames,
+            "lost_frames": stats.lost_frames,
+            "rearms": stats.rearms,
+            "dead_time": stats.dead_time,
+            "config": self.config_id,
+            "settings": self._config_snapshot,
+            "with_led": self.with_led,
+            "error": repr(self.error) if self.error is not None else None,
+        }
+
+    def _run(self):
+        sensor = self.sensor
+        header = self.header
+        capacity = self.capacity
+        try:
+            while not self._stop.is_set():
+                measurement = sensor.continuous_measurement(self.with_led, self.stats)
+                try:
+                    for timestamp, status in measurement:
+                        sequence = self._sequence
+                        idx = (sequence // 2) % capacity
+                        header["sequence"] = sequence + 1
+                        sensor.read_frame(
+                            self._channel_rows[idx], self._temperature_rows[idx]
+                        )
+                        self._timestamps[idx] = timestamp
+                        self._status[idx] = status
+                        self._config[idx] = self.config_id
+                        header["lost_frames"] = self.stats.lost_frames
+                        header["sequence"] = self._sequence = sequence + 2
+                        if self._stop.is_set() or not self._commands.empty():
+                            break
+                finally:
+                    # Stops the measurement so settings can be changed
+                    measurement.close()
+                self._run_commands()
+        except BaseException as e:
+            self.error = e
+        finally:
+            header["running"] = 0
+            with self._commands_lock:
+                self._accepting = False
+            while not self._commands.empty():
+                _, future = self._commands.get()
+                future.set_exception(RuntimeError("Server stopped"))
+
+    def _run_commands(self):
+        while not self._commands.empty():
+            request, future = self._commands.get()
+            try:
+                future.set_result(self._execute(request))
+            except Exception as e:
+                future.set_exception(e)
+
+    def _execute(self, request: t.Dict[str, t.Any]) -> t.Dict[str, t.Any]:
+        command = request["command"]
+        if command == "stop":
+            self._stop.set()
+            return {}
+        sensor = self.sensor
+        if command == "set":
+            # Checked by submit
+            for setting in ("integration_time_us", "wait_time_us", "num_measurements"):
+                if setting in request:
+                    setattr(sensor, setting, request[setting])
+            if "gain" in request:
+                sensor.configure_gain(request["gain"])
+            if "led" in request:
+                self.with_led = bool(request["led"])
+        elif command == "profile":
+            apply_profile(sensor, Profile.from_dict(request["profile"]))
+        self.config_id += 1
+        self.header["config"] = self.config_id
+        self._config_snapshot = sensor.config_snapshot()
+        return {"config": self.config_id}
+
+
+class _ControlHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("Request must be a JSON object")
+                result = self.server.frame_server.submit(request).result(
+                    COMMAND_TIMEOUT
+                )
+                reply = {"ok": True, **result}
+            except Exception as e:
+                reply = {"ok": False, "error": str(e) or type(e).__name__}
+            self.wfile.write(json.dumps(reply).encode() + b"\n")
+
+
+class _ControlServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str, frame_server: FrameServer):
+        self.frame_server = frame_server
+        super().__init__(path, _ControlHandler)
+
+    def server_bind(self):
+        # A socket left behind by a server that died is removed, one that
+        # still accepts connections belongs to a live server
+        path = self.server_address
+        if os.path.exists(path) and stat.S_ISSOCK(os.stat(path).st_mode):
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                try:
+                    probe.connect(path)
+                except (ConnectionRefusedError, FileNotFoundError):
+                    try:
+                        os.unlink(path)
+                    except FileNotFoundError:
+                        pass
+                else:
+                    raise OSError(
+                        errno.EADDRINUSE, f"{path} is in use by another server"
+                    )
+        super().server_bind()
+
+
+@dataclass
+class SharedFrames:
+    """Frames ``first`` onwards, as a view into the shared ring.
+
+    The view is overwritten once the server laps it; check
+    :meth:`FrameSubscriber.valid` after using it, or use
+    :meth:`FrameSubscriber.read` for a copy (see the module docstring for
+    the limits of both).
+    """
+
+    first: int
+    frames: np.ndarray
+
+    def __len__(self):
+        return len(self.frames)
+
+
+class FrameSubscriber:
+    """Read frames published by a :class:`FrameServer` in another process.
+
+    Starts with the next frame to be published, or with the oldest frame
+    still in the ring if ``from_oldest``. Frames the server overwrote
+    before they were read are counted in ``overruns``.
+    """
+
+    def __init__(self, name: str, from_oldest: bool = False):
+        self.shm = _attach(name)
+        header = np.ndarray((), dtype=header_dtype, buffer=self.shm.buf)
+        if bytes(header["magic"]) != MAGIC or int(header["version"]) != VERSION:
+            del header
+            self.shm.close()
+            raise ValueError(f"{name} is not an AS7421 frame ring")
+        self.capacity = int(header["capacity"])
+        del header
+        self.header, self.frames = _views(self.shm, self.capacity)
+        self.next = self._oldest() if from_oldest else self.published
+        self.overruns = 0
+
+    @property
+    def sequence(self) -> int:
+        return int(self.header["sequence"])
+
+    @property
+    def published(self) -> int:
+        return self.sequence // 2
+
+    @property
+    def running(self) -> bool:
+        return bool(self.header["running"])
+
+    @property
+    def config(self) -> int:
+        return int(self.header["config"])
+
+    def _oldest(self) -> int:
+        """Oldest frame the server is not writing over."""
+        return max((self.sequence + 1) // 2 - self.capacity, 0)
+
+    def valid(self, frames: SharedFrames) -> bool:
+        """Whether the sequence counter shows none of ``frames`` being
+        overwritten yet. Best effort on weakly ordered CPUs, see the
+        module docstring."""
+        return frames.first >= self._oldest()
+
+    def acquire(
+        self, max_frames: t.Optional[int] = None, timeout: t.Optional[float] = None
+    ) -> SharedFrames:
+        """Frames published since the last call, as a view into the ring.
+
+        Waits for at least one frame unless ``timeout`` expires or the
+        server stops first. At most ``max_frames`` frames are returned, and
+        fewer if the frames wrap around the end of the ring.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.published <= self.next:
+            if not self.running or (deadline is not None and time.monotonic() >= deadline):
+                break
+            time.sleep(POLL_INTERVAL)
+        published = self.published
+        oldest = self._oldest()
+        if self.next < oldest:
+            self.overruns += oldest - self.next
+            self.next = oldest
+        start = self.next % self.capacity
+        count = min(published - self.next, self.capacity - start)
+        if max_frames is not None:
+            count = min(count, max_frames)
+        frames = SharedFrames(self.next, self.frames[start : start + count])
+        self.next += count
+        return frames
+
+    def read(
+        self, max_frames: t.Optional[int] = None, timeout: t.Optional[float] = None
+    ) -> np.ndarray:
+        """Like :meth:`acquire`, but returns a copy, dropping the frames
+        the sequence counter shows were overwritten while copying."""
+        shared = self.acquire(max_frames, timeout)
+        frames = shared.frames.copy()
+        torn = max(self._oldest() - shared.first, 0)
+        self.overruns += min(torn, len(frames))
+        return frames[torn:]
+
+    def close(self):
+        del self.header, self.frames
+        self.shm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def send_command(socket_path: str, command: str, **kwargs) -> t.Dict[str, t.Any]:
+    """Send one request to a server's control socket and return the reply.
+
+    Raises ``RuntimeError`` if the server rejected the request.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        sock.sendall(json.dumps({"command": command, **kwargs}).encode() + b"\n")
+        with sock.makefile("rb") as reply:
+            result = json.loads(reply.readline())
+    if not result.pop("ok"):
+        raise RuntimeError(result["error"])
+    return result
+
+
+def main(argv: t.Optional[t.Sequence[str]] = None):
+    parser = argparse.ArgumentParser(
+        prog="as7421-daemon",
+        description="Acquire from an AS7421 and share the frames through shared memory.",
+    )
+    parser.add_argument("-b", "--bus", type=int, default=1, help="I2C bus number")
+    parser.add_argument("-n", "--name", default="as7421", help="shared memory name")
+    parser.add_argument("-s", "--socket", default=None, help="control socket path")
+    parser.add_argument("--capacity", type=int, default=DEFAULT_CAPACITY)
+    parser.add_argument("--integration-time-us", type=int, default=20_000)
+    parser.add_argument("--no-led", action="store_true", help="measure without LEDs")
+    parser.add_argument(
+        "--emulate", action="store_true", help="use the emulated sensor"
+    )
+    args = parser.parse_args(argv)
+
+    if args.emulate:
+        from as7421.emulator import EmulatedSMBus
+
+        sensor = AS7421(EmulatedSMBus(args.bus))
+    else:
+        sensor = AS7421(args.bus)
+    sensor.setup_regs()
+    sensor.powerup()
+    sensor.configure_smux()
+    sensor.configure_gain()
+    sensor.configure_led()
+    sensor.enable_channels()
+    sensor.integration_time_us = args.integration_time_us
+
+    socket_path = args.socket or f"/tmp/{args.name}.sock"
+    with FrameServer(
+        sensor, args.name, args.capacity, socket_path, with_led=not args.no_led
+    ) as server:
+        print(f"Serving {server.name}, control socket {socket_path}")
+        try:
+            server.wait()
+        except KeyboardInterrupt:
+            pass
+    sensor.sleep()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,502 @@
+"""Emulated SMBus modelling the AS7421 register file.
+
+Lets ``AS7421`` run without the physical sensor, e.g. for offline testing and
+for measuring transaction counts and frame throughput in CI.
+"""
+
+import ctypes
+import errno
+import math
+import random
+import threading
+import time
+import typing as t
+
+from smbus2.smbus2 import I2C_M_RD
+
+DEFAULT_ADDRESS = 0x64
+
+RAM_WINDOW = 0x40
+RAM_SIZE = 32
+
+REG_CFG_MISC = 0x38
+REG_CFG_LED_MULT = 0x39
+REG_ENABLE = 0x60
+REG_CFG_LTF = 0x67
+REG_CFG_LED = 0x68
+REG_LTF_ICOUNT = 0x69
+REG_CFG_RAM = 0x6A
+REG_CFG_AZ = 0x6D
+REG_STATUS_0 = 0x70
+REG_STATUS_1 = 0x71
+REG_STATUS_ASAT = 0x72
+REG_STATUS_6 = 0x76
+REG_STATUS_7 = 0x77
+REG_TEMP = 0x78
+REG_CHANNEL = 0x80
+
+RAM_ASETUP_AB = 0x10
+RAM_ASETUP_CD = 0x11
+
+CLOCK_HZ = 1_000_000
+
+
+def _default_scene(wavelength_count: int = 64) -> t.Tuple[t.List[float], t.List[float]]:
+    """Smooth ambient and LED responses in counts per ms at the default gain."""
+    ambient = []
+    led = []
+    for x in range(wavelength_count):
+        ambient.append(40.0 + 25.0 * math.sin(x * 0.37) ** 2)
+        led.append(300.0 + 200.0 * math.cos(x * 0.11) ** 2)
+    return ambient, led
+
+
+class EmulatedSMBus:
+    """SMBus stand-in for a single AS7421.
+
+    Implements the subset of the ``smbus2.SMBus`` interface used by
+    ``i2cdevice`` so an instance can be passed as ``bus`` to ``AS7421``.
+    Integration, wait and autozero timing are derived from the register
+    contents and run on the wall clock. Each transaction blocks for the time
+    it would take on a bus running at ``bus_speed`` plus
+    ``transaction_overhead``.
+    """
+
+    def __init__(
+        self,
+        bus: t.Optional[int] = None,
+        address: int = DEFAULT_ADDRESS,
+        bus_speed: t.Optional[int] = 100_000,
+        transaction_overhead: float = 50e-6,
+        noise: float = 0.0,
+        seed: t.Optional[int] = None,
+        dev_id: int = 0x21,
+        rev_id: int = 0x01,
+        reset_time: float = 1e-3,
+        temperature: int = 3000,
+    ):
+        self.bus = bus
+        self.address = address
+        self.bus_speed = bus_speed
+        self.transaction_overhead = transaction_overhead
+        self.noise = noise
+        self.dev_id = dev_id
+        self.rev_id = rev_id
+        self.reset_time = reset_time
+        self.temperature = temperature
+        self.ambient, self.led_response = _default_scene()
+
+        self._rng = random.Random(seed)
+        self._lock = threading.RLock()
+        self.reset_stats()
+        self._power_on_reset()
+
+    # ------------------------------------------------------------------
+    # Statistics
+
+    def reset_stats(self):
+        self.transactions = 0
+        self.reads = 0
+        self.writes = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.bus_time = 0.0
+        self.frames = 0
+        self.register_reads: t.Dict[int, int] = {}
+        self.register_writes: t.Dict[int, int] = {}
+
+    def stats(self) -> t.Dict[str, t.Any]:
+        return {
+            "transactions": self.transactions,
+            "reads": self.reads,
+            "writes": self.writes,
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+            "bus_time": self.bus_time,
+            "frames": self.frames,
+        }
+
+    # ------------------------------------------------------------------
+    # Device state
+
+    def _power_on_reset(self):
+        self.regs = bytearray(256)
+        self.regs[REG_STATUS_0] = self.dev_id & 0x3F
+        self.regs[REG_STATUS_1] = self.rev_id & 0x3F
+        self.ram: t.Dict[int, bytearray] = {}
+        self.led_mult = [0, 0, 0, 0]
+        self._reset_until = 0.0
+        self._running = False
+        self._seq_start = 0.0
+        self._seq_total = 0
+        self._seq_done = 0
+        self._seq_period = 0.0
+        self._seq_wait = 0.0
+        self._adata = False
+        self._dlost = False
+        self._dsat = False
+        self._asat = False
+        self._az_done = False
+        self._data_pointer = 0
+
+    def _ram_bank(self) -> bytearray:
+        bank = self.regs[REG_CFG_RAM] & 0x1F
+        if bank not in self.ram:
+            self.ram[bank] = bytearray(RAM_SIZE)
+        return self.ram[bank]
+
+    def _ticks(self, register: int) -> int:
+        # Stored as low, mid, high bytes
+        return (
+            self.regs[register]
+            | (self.regs[register + 1] << 8)
+            | (self.regs[register + 2] << 16)
+        )
+
+    @property
+    def integration_time(self) -> float:
+        return (self._ticks(0x61) + 1) / CLOCK_HZ
+
+    @property
+    def wait_time(self) -> float:
+        return (self._ticks(0x64) + 1) / CLOCK_HZ
+
+    @property
+    def cycles(self) -> int:
+        return ((self.regs[REG_CFG_LTF] >> 3) & 0b11) + 1
+
+    @property
+    def autozero_time(self) -> float:
+        cfg = self.regs[REG_CFG_AZ]
+        if not cfg & 0b00010000:
+            return 0.0
+        az_wait = (32 << ((cfg >> 5) & 0b11)) * 1e-6
+        iterations = (cfg & 0b111) + 1
+        per_frame = self.cycles if cfg & 0b00001000 else 1
+        return az_wait * iterations * per_frame
+
+    def frame_period(self) -> float:
+        """Seconds between consecutive frames of a running sequence."""
+        period = self.cycles * self.integration_time + self.autozero_time
+        if self.regs[REG_CFG_MISC] & 0b10:
+            period += self.wait_time
+        return period
+
+    def _start_sequence(self, now: float):
+        count = self.regs[REG_LTF_ICOUNT]
+        self._running = True
+        self._seq_start = now
+        self._seq_total = count if count else 1
+        self._seq_done = 0
+        self._seq_period = self.frame_period()
+        self._seq_wait = self.wait_time if self.regs[REG_CFG_MISC] & 0b10 else 0.0
+
+    def _led_on(self, frame_index: int) -> bool:
+        mode = (self.regs[REG_ENABLE] >> 4) & 0b11
+        if mode == 0b11:
+            return True
+        if mode == 0b01:
+            return frame_index % 2 == 1
+        if mode == 0b10:
+            return frame_index % 2 == 0
+        return bool(self.regs[REG_CFG_LED] & 0x80)
+
+    def _gain(self, channel: int) -> int:
+        bank = RAM_ASETUP_AB if channel < 32 else RAM_ASETUP_CD
+        ram = self.ram.get(bank)
+        return ram[channel % 32] if ram is not None else 0
+
+    def _produce_frame(self, frame_index: int):
+        itime_ms = self.integration_time * 1e3
+        cycles = self.cycles
+        led_on = self._led_on(frame_index)
+        led_scale = 1.5 if self.regs[REG_CFG_LED] & 0b111 else 1.0
+        asat_bits = 0
+        dsat = False
+        for ch in range(64):
+            offset = REG_CHANNEL + 2 * ch
+            if ch // 16 >= cycles:
+                value = 0
+            else:
+                rate = self.ambient[ch]
+                if led_on:
+                    rate += self.led_response[ch] * led_scale
+                counts = rate * itime_ms * 2.0 ** (self._gain(ch) - 6)
+                if self.noise:
+                    counts += self._rng.gauss(0.0, self.noise * math.sqrt(counts))
+                if counts > 2 * 0xFFFF:
+                    asat_bits |= 1 << (ch % 16)
+                if counts >= 0xFFFF:
+                    dsat = True
+                value = min(max(int(counts), 0), 0xFFFF)
+            self.regs[offset] = value & 0xFF
+            self.regs[offset + 1] = value >> 8
+        for idx in range(4):
+            temp = self.temperature + idx
+            self.regs[REG_TEMP + 2 * idx] = (temp >> 8) & 0xFF
+            self.regs[REG_TEMP + 2 * idx + 1] = temp & 0xFF
+        self.regs[REG_STATUS_ASAT] = asat_bits & 0xFF
+        self.regs[REG_STATUS_ASAT + 1] = asat_bits >> 8
+        self._asat = bool(asat_bits)
+        self._dsat = dsat
+        self._az_done = bool(self.regs[REG_CFG_AZ] & 0b00010000)
+        self._data_pointer = (self._data_pointer + 1) & 0b11
+        self.frames += 1
+
+    def _advance(self, now: float):
+        if self._reset_until and now >= self._reset_until:
+            self._reset_until = 0.0
+            self.regs[REG_CFG_MISC] &= ~0x01
+        if not self._running:
+            return
+        elapsed = now - self._seq_start + self._seq_wait
+        completed = min(self._seq_total, int(elapsed / self._seq_period))
+        if completed > self._seq_done:
+            if self._adata or completed - self._seq_done > 1:
+                self._dlost = True
+            self._produce_frame(completed - 1)
+            self._adata = True
+            self._seq_done = completed
+        if self._seq_done >= self._seq_total:
+            self._running = False
+
+    def _read_register(self, register: int) -> int:
+        if RAM_WINDOW <= register < RAM_WINDOW + RAM_SIZE:
+            return self._ram_bank()[register - RAM_WINDOW]
+        if register == REG_CFG_LED_MULT:
+            return self.led_mult[(self.regs[REG_CFG_LED] >> 4) & 0b11]
+        if register == REG_STATUS_6:
+            powered = self.regs[REG_ENABLE] & 0x01
+            busy = 0x10 if self._running else 0x00
+            ready = 0x20 if powered and not self._running else 0x00
+            return busy | ready
+        if register == REG_STATUS_7:
+            value = (
+                (self._data_pointer << 6)
+                | (0x20 if self._dlost else 0)
+                | (0x10 if self._dsat else 0)
+                | (0x08 if self._asat else 0)
+                | (0x02 if self._az_done else 0)
+                | (0x01 if self._adata else 0)
+            )
+            self._dlost = False
+            self._az_done = False
+            return value
+        return self.regs[register]
+
+    def _write_register(self, register: int, value: int, now: float):
+        value &= 0xFF
+        if RAM_WINDOW <= register < RAM_WINDOW + RAM_SIZE:
+            self._ram_bank()[register - RAM_WINDOW] = value
+        elif register == REG_CFG_LED_MULT:
+            self.led_mult[(self.regs[REG_CFG_LED] >> 4) & 0b11] = value
+        elif register == REG_CFG_MISC:
+            if value & 0x01:
+                self._power_on_reset()
+                self.regs[REG_CFG_MISC] = 0x01
+                self._reset_until = now + self.reset_time
+            else:
+                self.regs[REG_CFG_MISC] = value
+        elif register == REG_ENABLE:
+            previous = self.regs[REG_ENABLE]
+            self.regs[REG_ENABLE] = value
+            was_enabled = previous & 0x03 == 0x03
+            enabled = value & 0x03 == 0x03
+            if enabled and not was_enabled:
+                self._start_sequence(now)
+            elif not enabled:
+                self._running = False
+        elif register >= REG_STATUS_0:
+            # Status, temperature and channel data are read-only
+            pass
+        else:
+            self.regs[register] = value
+
+    # ------------------------------------------------------------------
+    # Bus
+
+    def _transaction(self, i2c_addr: int, payload_bytes: int) -> float:
+        if i2c_addr != self.address:
+            raise OSError(errno.EREMOTEIO, "Remote I/O error")
+        wire = 0.0
+        if self.bus_speed:
+            # start/stop plus nine clocks per byte on the wire
+            wire = (payload_bytes * 9 + 2) / self.bus_speed
+        delay = wire + self.transaction_overhead
+        if delay > 0:
+            time.sleep(delay)
+        self.transactions += 1
+        self.bus_time += wire
+        return time.perf_counter()
+
+    def read_i2c_block_data(
+        self, i2c_addr: int, register: int, length: int, force=None
+    ) -> t.List[int]:
+        with self._lock:
+            now = self._transaction(i2c_addr, length + 3)
+            self._advance(now)
+            data = [self._read_register((register + x) & 0xFF) for x in range(length)]
+            if register + length > REG_CHANNEL and register < 0x100:
+                self._adata = False
+            self.reads += 1
+            self.bytes_read += length
+            self.register_reads[register] = self.register_reads.get(register, 0) + 1
+            return data
+
+    def write_i2c_block_data(
+        self, i2c_addr: int, register: int, data: t.Sequence[int], force=None
+    ):
+        with self._lock:
+            now = self._transaction(i2c_addr, len(data) + 2)
+            self._advance(now)
+            for x, value in enumerate(data):
+                self._write_register((register + x) & 0xFF, value, now)
+            self.writes += 1
+            self.bytes_written += len(data)
+            self.register_writes[register] = self.register_writes.get(register, 0) + 1
+
+    def i2c_rdwr(self, *messages):
+        """Combined transaction of ``smbus2.i2c_msg`` writes and reads.
+
+        The first byte of a write sets the register pointer and any further
+        bytes are written from there; reads continue from the pointer.
+        """
+        with self._lock:
+            for message in messages:
+                if message.addr != self.address:
+                    raise OSError(errno.EREMOTEIO, "Remote I/O error")
+            size = sum(message.len for message in messages) + len(messages)
+            now = self._transaction(self.address, size)
+            self._advance(now)
+            pointer = 0
+            for message in messages:
+                if message.flags & I2C_M_RD:
+                    data = bytes(
+                        self._read_register((pointer + x) & 0xFF)
+                        for x in range(message.len)
+                    )
+                    ctypes.memmove(message.buf, data, message.len)
+                    if pointer + message.len > REG_CHANNEL and pointer < 0x100:
+                        self._adata = False
+                    self.reads += 1
+                    self.bytes_read += message.len
+                    self.register_reads[pointer] = self.register_reads.get(pointer, 0) + 1
+                    pointer += message.len
+                else:
+                    payload = bytes(message)
+                    pointer = payload[0]
+                    if len(payload) > 1:
+                        for x, value in enumerate(payload[1:]):
+                            self._write_register((pointer + x) & 0xFF, value, now)
+                        self.writes += 1
+                        self.bytes_written += len(payload) - 1
+                        self.register_writes[pointer] = (
+                            self.register_writes.get(pointer, 0) + 1
+                        )
+
+    def read_byte_data(self, i2c_addr: int, register: int, force=None) -> int:
+        return self.read_i2c_block_data(i2c_addr, register, 1)[0]
+
+    def write_byte_data(self, i2c_addr: int, register: int, value: int, force=None):
+        self.write_i2c_block_data(i2c_addr, register, [value])
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def benchmark(
+    num_measurements: int = 10,
+    integration_ms: float = 5.0,
+    wait_ms: float = 1.0,
+    with_led: bool = True,
+    **bus_kwargs,
+) -> t.Dict[str, t.Any]:
+    """Run ``do_measurement`` against the emulator and report bus statistics.
+
+    Returns the emulator statistics for the measurement only (setup traffic
+    is excluded) plus ``elapsed``, ``fps`` and ``transactions_per_frame``.
+    """
+    from as7421.as7421 import AS7421
+
+    bus = EmulatedSMBus(**bus_kwargs)
+    sensor = AS7421(bus=bus)
+    sensor.setup_regs()
+    sensor.integration_time_us = round(integration_ms * 1000)
+    sensor.wait_time_us = round(wait_ms * 1000)
+    sensor.powerup()
+    sensor.configure_smux()
+    sensor.configure_gain()
+    sensor.configure_led()
+    sensor.num_measurements = num_measurements
+
+    bus.reset_stats()
+    start = time.perf_counter()
+    frames = sum(1 for _ in sensor.do_measurement(with_led=with_led))
+    elapsed = time.perf_counter() - start
+
+    result = bus.stats()
+    result["elapsed"] = elapsed
+    result["frames"] = frames
+    result["fps"] = frames / elapsed if elapsed else 0.0
+    result["transactions_per_frame"] = bus.transactions / frames if frames else 0.0
+    return result
+
+
+class EmulatedMuxBus:
+    """Emulated bus with sensors behind a TCA9548A style multiplexer.
+
+    ``devices`` maps mux channel numbers to :class:`EmulatedSMBus` instances.
+    Writing a channel mask to the mux address routes subsequent transactions
+    to the selected device. Transactions are serialised as on a real bus.
+    """
+
+    def __init__(
+        self,
+        devices: t.Dict[int, EmulatedSMBus],
+        address: int = 0x70,
+        transaction_overhead: float = 50e-6,
+        bus_speed: t.Optional[int] = 100_000,
+    ):
+        self.devices = devices
+        self.address = address
+        self.transaction_overhead = transaction_overhead
+        self.bus_speed = bus_speed
+        self.selected = 0
+        self.mux_switches = 0
+        self._lock = threading.RLock()
+
+    def _device(self) -> EmulatedSMBus:
+        for channel, device in self.devices.items():
+            if self.selected & (1 << channel):
+                return device
+        raise OSError(errno.EREMOTEIO, "Remote I/O error")
+
+    def write_byte(self, i2c_addr: int, value: int, force=None):
+        if i2c_addr != self.address:
+            raise OSError(errno.EREMOTEIO, "Remote I/O error")
+        with self._lock:
+            wire = (2 * 9 + 2) / self.bus_speed if self.bus_speed else 0.0
+            time.sleep(wire + self.transaction_overhead)
+            self.selected = value & 0xFF
+            self.mux_switches += 1
+
+    def read_i2c_block_data(self, i2c_addr, register, length, force=None):
+        with self._lock:
+            return self._device().read_i2c_block_data(i2c_addr, register, length)
+
+    def write_i2c_block_data(self, i2c_addr, register, data, force=None):
+        with self._lock:
+            return self._device().write_i2c_block_data(i2c_addr, register, data)
+
+    def i2c_rdwr(self, *messages):
+        with self._lock:
+            return self._device().i2c_rdwr(*messages)
+
+    def close(self):
+        pass
@@ -0,0 +1,283 @@
+"""Running several AS7421 sensors across I2C buses and multiplexers."""
+
+import queue
+import threading
+import time
+import typing as t
+from collections import deque
+from dataclasses import dataclass, field
+
+import numpy as np
+import smbus2
+
+from as7421.as7421 import AS7421
+
+DEFAULT_MUX_ADDRESS = 0x70
+
+
+class I2CMux:
+    """TCA9548A style I2C multiplexer.
+
+    Channel selection and the transaction that follows it happen under one
+    lock so sensors behind the same mux never see each other's traffic.
+    """
+
+    def __init__(self, bus, address: int = DEFAULT_MUX_ADDRESS):
+        self.bus = bus
+        self.address = address
+        self.lock = threading.RLock()
+        self._selected: t.Optional[int] = None
+
+    def select(self, channel: int):
+        if channel != self._selected:
+            self.bus.write_byte(self.address, 1 << channel)
+            self._selected = channel
+
+
+class MuxChannel:
+    """SMBus-like view of one downstream channel of an :class:`I2CMux`."""
+
+    def __init__(self, mux: I2CMux, channel: int):
+        self.mux = mux
+        self.channel = channel
+
+    def read_i2c_block_data(self, i2c_addr, register, length, force=None):
+        with self.mux.lock:
+            self.mux.select(self.channel)
+            return self.mux.bus.read_i2c_block_data(i2c_addr, register, length)
+
+    def write_i2c_block_data(self, i2c_addr, register, data, force=None):
+        with self.mux.lock:
+            self.mux.select(self.channel)
+            return self.mux.bus.write_i2c_block_data(i2c_addr, register, data)
+
+    def i2c_rdwr(self, *messages):
+        with self.mux.lock:
+            self.mux.select(self.channel)
+            return self.mux.bus.i2c_rdwr(*messages)
+
+
+@dataclass
+class SensorFrame:
+    name: str
+    timestamp: float
+    channels: np.ndarray
+    temperatures: np.ndarray
+    status: int
+
+
+@dataclass
+class AlignedFrame:
+    """Frames of several sensors read out within the alignment tolerance."""
+
+    index: int
+    timestamp: float
+    frames: t.Dict[str, SensorFrame] = field(default_factory=dict)
+
+    @property
+    def skew(self) -> float:
+        """Spread of the member timestamps in seconds."""
+        timestamps = [f.timestamp for f in self.frames.values()]
+        return max(timestamps) - min(timestamps)
+
+
+_DONE = object()
+
+
+class SensorManager:
+    """Owns several sensors and acquires from them concurrently.
+
+    Sensors are grouped by physical bus, each group being driven by its own
+    worker thread. Sensors sharing a bus (behind a multiplexer) integrate in
+    parallel and are polled and read out in turn, the mux being switched
+    only when the next transaction targets a different channel.
+    """
+
+    def __init__(self):
+        self.sensors: t.Dict[str, AS7421] = {}
+        self._bus_of: t.Dict[str, t.Hashable] = {}
+        self._buses: t.Dict[t.Hashable, t.Any] = {}
+        self._muxes: t.Dict[t.Tuple[t.Hashable, int], I2CMux] = {}
+        # Frames left out of any aligned group by the last ``frames`` call
+        self.dropped: t.Dict[str, int] = {}
+
+    def _bus(self, bus) -> t.Tuple[t.Hashable, t.Any]:
+        key = bus if bus is None or isinstance(bus, int) else id(bus)
+        if key not in self._buses:
+            self._buses[key] = (
+                smbus2.SMBus(bus) if bus is None or isinstance(bus, int) else bus
+            )
+        return key, self._buses[key]
+
+    def add(
+        self,
+        name: str,
+        bus: t.Union[int, t.Any, None] = 1,
+        mux_channel: t.Optional[int] = None,
+        mux_address: int = DEFAULT_MUX_ADDRESS,
+        reset: bool = True,
+    ) -> AS7421:
+        """Add a sensor on ``bus``, optionally behind a mux channel."""
+        if name in self.sensors:
+            raise ValueError(f"Sensor {name} already added")
+        key, i2c_dev = self._bus(bus)
+        if mux_channel is not None:
+            mux = self._muxes.get((key, mux_address))
+            if mux is None:
+                mux = self._muxes[(key, mux_address)] = I2CMux(i2c_dev, mux_address)
+            i2c_dev = MuxChannel(mux, mux_channel)
+        sensor = AS7421(bus=i2c_dev, reset=reset)
+        self.sensors[name] = sensor
+        self._bus_of[name] = key
+        return sensor
+
+    def _groups(self) -> t.List[t.List[t.Tuple[str, AS7421]]]:
+        groups: t.Dict[t.Hashable, t.List[t.Tuple[str, AS7421]]] = {}
+        for name, sensor in self.sensors.items():
+            groups.setdefault(self._bus_of[name], []).append((name, sensor))
+        return list(groups.values())
+
+    def configure(self, fn: t.Callable[[AS7421], t.Any]):
+        """Call ``fn`` on every sensor, running different buses in parallel."""
+        errors = []
+
+        def run(group):
+            try:
+                for _, sensor in group:
+                    fn(sensor)
+            except BaseException as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=run, args=(g,)) for g in self._groups()]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+
+    def _acquire(
+        self,
+        group: t.List[t.Tuple[str, AS7421]],
+        with_led: bool,
+        out: queue.Queue,
+        stop: threading.Event,
+    ):
+        remaining = {}
+        steps = {}
+        wake = {}
+        started = []
+        try:
+            for name, sensor in group:
+                remaining[name] = sensor.num_measurements or None
+                sensor.start_measurement(with_led=with_led)
+                started.append(sensor)
+                steps[name] = sensor._wait_steps(None)
+                wake[name] = time.perf_counter()
+
+            sensors = dict(group)
+            while steps and not stop.is_set():
+                # Service whichever sensor wants the bus soonest
+                name = min(wake, key=wake.get)
+                delay = wake[name] - time.perf_counter()
+                if delay > 0 and stop.wait(delay):
+                    break
+                try:
+                    wake[name] = time.perf_counter() + next(steps[name])
+                    continue
+                except StopIteration as done:
+                    status = done.value
+
+                if status is not None:
+                    timestamp = time.perf_counter()
+                    channels, temperatures = sensors[name].read_frame()
+                    out.put(SensorFrame(name, timestamp, channels, temperatures, status))
+                    if remaining[name] is not None:
+                        remaining[name] -= 1
+                if status is None or remaining[name] == 0:
+                    del steps[name], wake[name]
+                    out.put((_DONE, name))
+                else:
+                    steps[name] = sensors[name]._wait_steps(None)
+                    wake[name] = time.perf_counter()
+        except BaseException as e:
+            out.put(e)
+        finally:
+            for sensor in started:
+                sensor.stop_measurement()
+            for name in steps:
+                out.put((_DONE, name))
+
+    def frames(
+        self, with_led: bool = True, tolerance: t.Optional[float] = None
+    ) -> t.Iterator[AlignedFrame]:
+        """Run one measurement sequence on every sensor.
+
+        Frames are merged by readout time: frames of different sensors read
+        within ``tolerance`` seconds of each other are grouped into one
+        :class:`AlignedFrame`, timestamped with the latest of its members.
+        ``tolerance`` defaults to half the shortest frame period. A frame
+        that cannot be matched because another sensor has already moved on
+        is dropped and counted in :attr:`dropped`. Sensors that end early
+        simply drop out of the remaining groups.
+        """
+        if tolerance is None:
+            tolerance = min(s.frame_period() for s in self.sensors.values()) / 2
+        self.dropped = dict.fromkeys(self.sensors, 0)
+        out: queue.Queue = queue.Queue()
+        stop = threading.Event()
+        threads = [
+            threading.Thread(
+                target=self._acquire,
+                args=(group, with_led, out, stop),
+                name="as7421-bus",
+                daemon=True,
+            )
+            for group in self._groups()
+        ]
+        for thread in threads:
+            thread.start()
+
+        pending: t.Dict[str, t.Deque[SensorFrame]] = {
+            name: deque() for name in self.sensors
+        }
+        finished: t.Set[str] = set()
+        index = 0
+        try:
+            while len(finished) < len(pending) or any(pending.values()):
+                if len(finished) < len(pending):
+                    item = out.get()
+                    if isinstance(item, BaseException):
+                        raise item
+                    if isinstance(item, tuple) and item[0] is _DONE:
+                        finished.add(item[1])
+                    else:
+                        pending[item.name].append(item)
+
+                while any(pending.values()) and all(
+                    frames or name in finished for name, frames in pending.items()
+                ):
+                    heads = {
+                        name: frames[0] for name, frames in pending.items() if frames
+                    }
+                    timestamp = max(f.timestamp for f in heads.values())
+                    # Later frames of the other sensors are later still, a
+                    # head this far behind the newest one cannot be matched
+                    stale = [
+                        name
+                        for name, frame in heads.items()
+                        if frame.timestamp < timestamp - tolerance
+                    ]
+                    if stale:
+                        for name in stale:
+                            pending[name].popleft()
+                            self.dropped[name] += 1
+                        continue
+                    for name in heads:
+                        pending[name].popleft()
+                    yield AlignedFrame(index, timestamp, heads)
+                    index += 1
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
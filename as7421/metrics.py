@@ -0,0 +1,210 @@
+"""Opt-in bus and acquisition metrics, see :meth:`AS7421.enable_metrics`."""
+
+import bisect
+import time
+import typing as t
+from dataclasses import dataclass, field
+
+from smbus2.smbus2 import I2C_M_RD
+
+# Histogram bucket upper bounds in seconds, 1us doubling up to about 16s
+BUCKET_BOUNDS = tuple(2**k * 1e-6 for k in range(25))
+
+
+class Histogram:
+    """Latency histogram with fixed power of two buckets."""
+
+    __slots__ = ("count", "total", "minimum", "maximum", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.minimum = float("inf")
+        self.maximum = 0.0
+        # The last bucket collects everything above the largest bound
+        self.buckets = [0] * (len(BUCKET_BOUNDS) + 1)
+
+    def record(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        if seconds < self.minimum:
+            self.minimum = seconds
+        if seconds > self.maximum:
+            self.maximum = seconds
+        self.buckets[bisect.bisect_left(BUCKET_BOUNDS, seconds)] += 1
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the ``q`` quantile."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKET_BOUNDS, self.buckets):
+            seen += count
+            if seen >= target:
+                return min(bound, self.maximum)
+        return self.maximum
+
+    def snapshot(self) -> t.Dict[str, t.Any]:
+        """Summary in seconds; ``buckets`` maps upper bounds to counts."""
+        bounds = BUCKET_BOUNDS + (float("inf"),)
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.mean,
+            "min": self.minimum if self.count else 0.0,
+            "max": self.maximum,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+            "buckets": {
+                bound: count for bound, count in zip(bounds, self.buckets) if count
+            },
+        }
+
+
+@dataclass
+class TransferStats:
+    """Transfers of one kind starting at one register address."""
+
+    count: int = 0
+    bytes: int = 0
+    latency: Histogram = field(default_factory=Histogram)
+
+
+class Metrics:
+    """Counters and latency histograms for one sensor.
+
+    Bus transfers are grouped by direction and start register. Frame
+    timings cover the time from calling ``wait_for_data`` until the frame
+    is ready, the time to read it out, and the dead time: how much longer
+    than the frame period passed between two consecutive frames being seen.
+    """
+
+    def __init__(self, register_names: t.Optional[t.Dict[int, str]] = None):
+        self.register_names = dict(register_names or {})
+        self.reset()
+
+    def reset(self):
+        self.started = time.perf_counter()
+        self.transfers: t.Dict[t.Tuple[str, int], TransferStats] = {}
+        self.frames = 0
+        self.polls = 0
+        self.time_to_ready = Histogram()
+        self.readout = Histogram()
+        self.dead_time = Histogram()
+        self.last_ready: t.Optional[float] = None
+
+    def record_transfer(self, kind: str, register: int, size: int, seconds: float):
+        stats = self.transfers.get((kind, register))
+        if stats is None:
+            stats = self.transfers[kind, register] = TransferStats()
+        stats.count += 1
+        stats.bytes += size
+        stats.latency.record(seconds)
+
+    def record_ready(self, waited: float, ready: float, period: float):
+        self.frames += 1
+        self.time_to_ready.record(waited)
+        if self.last_ready is not None:
+            self.dead_time.record(max(ready - self.last_ready - period, 0.0))
+        self.last_ready = ready
+
+    def _register_name(self, register: int) -> str:
+        return self.register_names.get(register, f"0x{register:02X}")
+
+    def snapshot(self) -> t.Dict[str, t.Any]:
+        """All metrics as plain data, e.g. for JSON export."""
+        transfers: t.Dict[str, t.Dict[str, t.Any]] = {"read": {}, "write": {}}
+        for (kind, register), stats in sorted(self.transfers.items()):
+            transfers[kind][self._register_name(register)] = {
+                "count": stats.count,
+                "bytes": stats.bytes,
+                "latency": stats.latency.snapshot(),
+            }
+        return {
+            "elapsed": time.perf_counter() - self.started,
+            "transactions": sum(s.count for s in self.transfers.values()),
+            "transfers": transfers,
+            "frames": self.frames,
+            "polls": self.polls,
+            "polls_per_frame": self.polls / self.frames if self.frames else 0.0,
+            "time_to_ready": self.time_to_ready.snapshot(),
+            "readout": self.readout.snapshot(),
+            "dead_time": self.dead_time.snapshot(),
+        }
+
+
+class InstrumentedSMBus:
+    """SMBus or transport wrapper recording every transfer in ``metrics``.
+
+    An ``i2c_rdwr`` transaction is recorded once as a read under its first
+    register if it contains any reads, otherwise as a write. When wrapping
+    a transport, ``read_into`` and ``read_blocks`` calls are recorded the
+    same way, once per call. Other attributes are passed through to the
+    wrapped object.
+    """
+
+    def __init__(self, bus, metrics: Metrics):
+        self.bus = bus
+        self.metrics = metrics
+
+    def __getattr__(self, name):
+        return getattr(self.bus, name)
+
+    def read_i2c_block_data(self, i2c_addr: int, register: int, length: int, force=None):
+        start = time.perf_counter()
+        data = self.bus.read_i2c_block_data(i2c_addr, register, length, force)
+        self.metrics.record_transfer(
+            "read", register, length, time.perf_counter() - start
+        )
+        return data
+
+    def write_i2c_block_data(self, i2c_addr: int, register: int, data, force=None):
+        start = time.perf_counter()
+        self.bus.write_i2c_block_data(i2c_addr, register, data, force)
+        self.metrics.record_transfer(
+            "write", register, len(data), time.perf_counter() - start
+        )
+
+    def read_byte_data(self, i2c_addr: int, register: int, force=None) -> int:
+        start = time.perf_counter()
+        value = self.bus.read_byte_data(i2c_addr, register, force)
+        self.metrics.record_transfer("read", register, 1, time.perf_counter() - start)
+        return value
+
+    def write_byte_data(self, i2c_addr: int, register: int, value: int, force=None):
+        start = time.perf_counter()
+        self.bus.write_byte_data(i2c_addr, register, value, force)
+        self.metrics.record_transfer("write", register, 1, time.perf_counter() - start)
+
+    def i2c_rdwr(self, *messages):
+        start = time.perf_counter()
+        self.bus.i2c_rdwr(*messages)
+        elapsed = time.perf_counter() - start
+        register = next(iter(messages[0])) if messages and len(messages[0]) else 0
+        read = sum(m.len for m in messages if m.flags & I2C_M_RD)
+        if read:
+            self.metrics.record_transfer("read", register, read, elapsed)
+        else:
+            written = sum(m.len for m in messages) - 1
+            self.metrics.record_transfer("write", register, written, elapsed)
+
+    def read_into(self, i2c_addr: int, register: int, buffer: memoryview):
+        start = time.perf_counter()
+        self.bus.read_into(i2c_addr, register, buffer)
+        self.metrics.record_transfer(
+            "read", register, len(buffer), time.perf_counter() - start
+        )
+
+    def read_blocks(self, i2c_addr: int, blocks: t.Sequence[t.Tuple[int, memoryview]]):
+        start = time.perf_counter()
+        self.bus.read_blocks(i2c_addr, blocks)
+        register = blocks[0][0] if blocks else 0
+        size = sum(len(buffer) for _, buffer in blocks)
+        self.metrics.record_transfer(
+            "read", register, size, time.perf_counter() - start
+        )
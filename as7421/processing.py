@@ -0,0 +1,323 @@
+"""Vectorised conversion of raw frames using calibration data.
+
+The meaning of the calibration arrays is inferred (see the README), the
+shapes used here are the best guess consistent with their sizes.
+"""
+
+import typing as t
+
+import numpy as np
+
+from as7421.as7421 import ESTIMATED_WAVELENGTHS, NUM_CHANNELS
+
+SPECTRUM_POINTS = 401
+# Default spacing of the resampling grid, that of the estimated wavelengths
+GRID_STEP_NM = 5.0
+# Highest power of the temperature polynomials used unless asked otherwise
+TEMPERATURE_DEGREE = 3
+
+
+def _channel_mean(values) -> np.ndarray:
+    # References are stored as repeated blocks of 64 channel readings
+    return np.asarray(values, dtype=np.float32).reshape(-1, NUM_CHANNELS).mean(axis=0)
+
+
+class CalibrationEngine:
+    """Convert batches of raw 64 channel frames into calibrated spectra.
+
+    Dark subtraction, white normalisation and the channel to wavelength
+    matrix are folded once into a single ``(64, points)`` matrix and offset,
+    so converting a batch is one matrix multiply. Everything is float32.
+    """
+
+    def __init__(
+        self,
+        matrix: np.ndarray,
+        black: np.ndarray,
+        white: np.ndarray,
+        reference: t.Optional[np.ndarray] = None,
+    ):
+        matrix = np.asarray(matrix, dtype=np.float32).reshape(NUM_CHANNELS, -1)
+        black = np.asarray(black, dtype=np.float32)
+        white = np.asarray(white, dtype=np.float32)
+
+        span = white - black
+        # Channels without a usable white reading are dropped
+        valid = np.abs(span) > np.finfo(np.float32).eps
+        scale = np.where(valid, 1.0 / np.where(valid, span, 1.0), 0.0).astype(
+            np.float32
+        )
+
+        self.gain = scale[:, None] * matrix
+        self.offset = -(black * scale) @ matrix
+        if reference is not None:
+            reference = np.asarray(reference, dtype=np.float32)
+            self.gain *= reference
+            self.offset *= reference
+        self.points = matrix.shape[1]
+
+    @classmethod
+    def from_calibration(cls, calibration, absolute: bool = False) -> "CalibrationEngine":
+        """Build from a parsed or memory mapped calibration file.
+
+        With ``absolute`` the spectra are scaled by the white reference
+        spectrum (``dev_white_ref``) instead of being relative to white.
+        """
+        return cls(
+            np.asarray(calibration.dev_cal_matrix, dtype=np.float32).reshape(
+                NUM_CHANNELS, SPECTRUM_POINTS
+            ),
+            _channel_mean(calibration.dev_black),
+            _channel_mean(calibration.device_white),
+            calibration.dev_white_ref if absolute else None,
+        )
+
+    @classmethod
+    def from_folded(cls, gain: np.ndarray, offset: np.ndarray) -> "CalibrationEngine":
+        """Wrap the ``gain`` and ``offset`` of another engine without copying.
+
+        Lets processes share one engine's tables, e.g. through a memory map.
+        """
+        engine = cls.__new__(cls)
+        engine.gain = gain
+        engine.offset = offset
+        engine.points = gain.shape[1]
+        return engine
+
+    def process(
+        self, frames: np.ndarray, out: t.Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """Convert ``(n, 64)`` raw frames (or a single frame) to spectra."""
+        frames = np.asarray(frames)
+        single = frames.ndim == 1
+        frames = np.atleast_2d(frames).astype(np.float32, copy=False)
+        if out is None:
+            out = np.empty((frames.shape[0], self.points), dtype=np.float32)
+        np.matmul(frames, self.gain, out=out)
+        out += self.offset
+        return out[0] if single else out
+
+
+class TemperatureCompensator:
+    """Per channel polynomial temperature correction for batches of frames.
+
+    Each channel ``c`` is scaled by ``P_c(reference) / P_c(T)`` where ``P_c``
+    is a polynomial with ``coefficients[c]`` (lowest order first) and ``T``
+    is the temperature of the integration cycle the channel belongs to
+    (TEMP_A for channels 0-15 and so on). Temperatures are converted from
+    raw TEMP readings with ``scale`` and ``offset`` and quantised to
+    ``bin_width``; the 64 factors of each bin are evaluated once and cached.
+    """
+
+    def __init__(
+        self,
+        coefficients: np.ndarray,
+        reference: float,
+        scale: float = 1.0,
+        offset: float = 0.0,
+        bin_width: float = 0.1,
+        max_bins: int = 4096,
+    ):
+        self.coefficients = np.asarray(coefficients, dtype=np.float64).reshape(
+            NUM_CHANNELS, -1
+        )
+        self.reference = float(reference)
+        self.scale = scale
+        self.offset = offset
+        self.bin_width = bin_width
+        self.max_bins = max_bins
+        self._reference_values = self._evaluate(np.array([self.reference]))[0]
+        self._cache: t.Dict[int, np.ndarray] = {}
+        self._bank = np.arange(NUM_CHANNELS) // 16
+        self._channel = np.arange(NUM_CHANNELS)
+
+    @classmethod
+    def from_calibration(
+        cls,
+        calibration,
+        scale: float,
+        offset: float,
+        reference: float,
+        degree: int = TEMPERATURE_DEGREE,
+        **kwargs,
+    ) -> "TemperatureCompensator":
+        """Build from ``dev_temp_coeff_poly``.
+
+        The table holds 2304 values, read as 64 rows of 36 coefficients,
+        lowest order first. Only the first ``degree + 1`` coefficients of a
+        row are used, a cubic by default: evaluating all 36 raises the
+        temperature to the 35th power, which loses all precision, and it is
+        not known whether the rest of a row holds higher orders at all. How TEMP
+        readings convert to the temperature the polynomials expect is not
+        known, so ``scale``, ``offset`` and the ``reference`` temperature
+        must be given.
+
+        ``dev_temp_coeff`` (46080 values) and ``dev_temp_coeff_az_poly``
+        (68 values) are not used: neither divides into per channel
+        polynomials, and their layout is unknown.
+        """
+        coefficients = np.asarray(calibration.dev_temp_coeff_poly, dtype=np.float64)
+        coefficients = coefficients.reshape(NUM_CHANNELS, -1)
+        if not 0 <= degree < coefficients.shape[1]:
+            raise ValueError(f"degree must be below {coefficients.shape[1]}")
+        coefficients = coefficients[:, : degree + 1]
+        return cls(coefficients, reference, scale, offset, **kwargs)
+
+    def _evaluate(self, temperatures: np.ndarray) -> np.ndarray:
+        """Polynomial values, shape ``(len(temperatures), 64)``."""
+        powers = temperatures[:, None] ** np.arange(self.coefficients.shape[1])
+        return powers @ self.coefficients.T
+
+    def factors(self, temperatures: np.ndarray) -> np.ndarray:
+        """Correction factors ``(n, 64)`` for raw ``(n, 4)`` TEMP readings."""
+        temperatures = np.atleast_2d(np.asarray(temperatures, dtype=np.float64))
+        bins = np.rint(
+            (temperatures * self.scale + self.offset) / self.bin_width
+        ).astype(np.int64)
+        if not bins.size:
+            return np.empty((0, NUM_CHANNELS), dtype=np.float32)
+        unique, inverse = np.unique(bins, return_inverse=True)
+        inverse = inverse.reshape(bins.shape)
+
+        missing = [b for b in unique.tolist() if b not in self._cache]
+        if missing:
+            if len(self._cache) + len(missing) > self.max_bins:
+                self._cache.clear()
+            values = self._evaluate(np.array(missing) * self.bin_width)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                ratios = self._reference_values / values
+            ratios = np.where(np.isfinite(ratios), ratios, 1.0).astype(np.float32)
+            self._cache.update(zip(missing, ratios))
+
+        table = np.stack([self._cache[b] for b in unique.tolist()])
+        # Pick, per frame and channel, the bin of the channel's cycle
+        return table[inverse[:, self._bank], self._channel]
+
+    def apply(
+        self,
+        frames: np.ndarray,
+        temperatures: np.ndarray,
+        out: t.Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """Compensate ``(n, 64)`` frames using their ``(n, 4)`` TEMP readings."""
+        frames = np.asarray(frames)
+        single = frames.ndim == 1
+        frames = np.atleast_2d(frames)
+        if out is None:
+            out = np.empty(frames.shape, dtype=np.float32)
+        np.multiply(frames, self.factors(temperatures), out=out)
+        return out[0] if single else out
+
+
+class WavelengthIndex:
+    """Order of the 64 readout channels by wavelength, computed once.
+
+    ``order`` lists the readout channels by increasing wavelength (stable,
+    so duplicates keep readout order) and ``wavelengths`` is the unique
+    sorted wavelengths. ``inverse[k]`` is the position in ``wavelengths``
+    of readout channel ``k``, so channels sharing a wavelength can be
+    merged.
+    """
+
+    def __init__(self, wavelengths: t.Sequence[float]):
+        channel_wavelengths = np.asarray(wavelengths, dtype=np.float64)
+        if channel_wavelengths.shape != (NUM_CHANNELS,):
+            raise ValueError(f"Expected {NUM_CHANNELS} wavelengths")
+        self.channel_wavelengths = channel_wavelengths
+        self.order = np.argsort(channel_wavelengths, kind="stable")
+        self.wavelengths, self.inverse, self.counts = np.unique(
+            channel_wavelengths, return_inverse=True, return_counts=True
+        )
+
+    @classmethod
+    def from_estimates(cls) -> "WavelengthIndex":
+        """Index of ``ESTIMATED_WAVELENGTHS``."""
+        return cls(ESTIMATED_WAVELENGTHS)
+
+    @classmethod
+    def from_calibration(cls, calibration) -> "WavelengthIndex":
+        """Index using the calibration's ``sensor_channel_order``.
+
+        The order is assumed to list the readout channels from shortest to
+        longest wavelength; they are given the sorted estimated wavelengths.
+        This reading is a guess, the file format is not documented. Raises
+        ``ValueError`` if the order is not a permutation of the channels,
+        use :meth:`from_estimates` for such calibrations.
+        """
+        order = np.asarray(calibration.sensor_channel_order, dtype=np.int64)
+        if not np.array_equal(np.sort(order), np.arange(NUM_CHANNELS)):
+            raise ValueError(
+                "sensor_channel_order is not a permutation of the "
+                f"{NUM_CHANNELS} channels"
+            )
+        wavelengths = np.empty(NUM_CHANNELS)
+        wavelengths[order] = np.sort(ESTIMATED_WAVELENGTHS)
+        return cls(wavelengths)
+
+    def reorder(self, frames: np.ndarray) -> np.ndarray:
+        """Channels of ``(..., 64)`` frames in wavelength order."""
+        return np.take(frames, self.order, axis=-1)
+
+    def merge_matrix(self) -> np.ndarray:
+        """``(64, len(wavelengths))`` matrix averaging duplicate channels."""
+        matrix = np.zeros((NUM_CHANNELS, len(self.wavelengths)))
+        matrix[np.arange(NUM_CHANNELS), self.inverse] = 1.0 / self.counts[self.inverse]
+        return matrix
+
+    def uniform_grid(self, step: float = GRID_STEP_NM) -> np.ndarray:
+        """Grid from the shortest to the longest wavelength in ``step`` nm."""
+        start, stop = self.wavelengths[0], self.wavelengths[-1]
+        return start + step * np.arange(int(np.floor((stop - start) / step)) + 1)
+
+
+class SpectralResampler:
+    """Resample raw 64 channel frames onto a wavelength grid.
+
+    Reordering, averaging of channels sharing a wavelength and linear
+    interpolation onto ``grid`` are folded into one ``(64, len(grid))``
+    weight matrix when the resampler is created, so a batch of frames is
+    resampled with a single matrix multiply. Grid points outside the
+    measured range take the nearest end value, as with ``np.interp``.
+    """
+
+    def __init__(
+        self,
+        index: t.Optional[WavelengthIndex] = None,
+        grid: t.Optional[t.Sequence[float]] = None,
+    ):
+        self.index = index if index is not None else WavelengthIndex.from_estimates()
+        self.grid = (
+            np.asarray(grid, dtype=np.float64)
+            if grid is not None
+            else self.index.uniform_grid()
+        )
+        self.weights = (
+            self.index.merge_matrix() @ self._interpolation(self.index.wavelengths)
+        ).astype(np.float32)
+
+    def _interpolation(self, wavelengths: np.ndarray) -> np.ndarray:
+        """``(len(wavelengths), len(grid))`` linear interpolation weights."""
+        grid = np.clip(self.grid, wavelengths[0], wavelengths[-1])
+        weights = np.zeros((len(wavelengths), len(grid)))
+        columns = np.arange(len(grid))
+        if len(wavelengths) == 1:
+            weights[0] = 1.0
+            return weights
+        upper = np.clip(np.searchsorted(wavelengths, grid), 1, len(wavelengths) - 1)
+        lower = upper - 1
+        fraction = (grid - wavelengths[lower]) / (wavelengths[upper] - wavelengths[lower])
+        weights[lower, columns] = 1.0 - fraction
+        weights[upper, columns] += fraction
+        return weights
+
+    def process(
+        self, frames: np.ndarray, out: t.Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """Resample ``(n, 64)`` frames (or a single frame) onto ``grid``."""
+        frames = np.asarray(frames)
+        single = frames.ndim == 1
+        frames = np.atleast_2d(frames).astype(np.float32, copy=False)
+        if out is None:
+            out = np.empty((frames.shape[0], len(self.grid)), dtype=np.float32)
+        np.matmul(frames, self.weights, out=out)
+        return out[0] if single else out
@@ -0,0 +1,269 @@
+"""Named configuration profiles, applied with as few writes as possible.
+
+A :class:`Profile` holds the raw values of the acquisition registers
+(:data:`PROFILE_REGISTERS`), the four LED multipliers and the images of
+the SMUX, ASETUP and COMPDAC RAM banks. Profiles are captured from a
+sensor or built by running the usual ``AS7421`` configuration calls
+against an emulated device, and can be stored as JSON.
+
+:meth:`Profile.compile` lays the register values out as contiguous bursts
+once. :meth:`CompiledProfile.plan` diffs them against what the sensor's
+register shadow, RAM cache and LED cache say is on the device and returns
+only the writes needed, with adjacent registers merged into one block
+write. ENABLE is not part of a profile, so applying one does not start or
+stop a measurement.
+"""
+
+import typing as t
+from dataclasses import dataclass, field
+
+from as7421.as7421 import (
+    AS7421,
+    RAM_ADDRESS,
+    RAM_MERGE_GAP,
+    RAM_SIZE,
+    REGISTERS,
+    SMUX_BANKS,
+)
+
+PROFILE_REGISTERS = (
+    "CFG_MISC",
+    "LTF_CCOUNT",
+    "LED_WAIT",
+    "LTF_ITIME",
+    "LTF_WTIME",
+    "CFG_LTF",
+    "CFG_LED",
+    "LTF_ICOUNT",
+    "CFG_AZ",
+)
+PROFILE_BANKS = SMUX_BANKS + ("ASETUP_AB", "ASETUP_CD", "COMPDAC")
+
+_REGISTERS = {register.name: register for register in REGISTERS}
+_BANK_CODES = _REGISTERS["CFG_RAM"].fields["RAM_OFFSET"].adapter.lookup_table
+_CFG_RAM = _REGISTERS["CFG_RAM"].address
+_CFG_LED = _REGISTERS["CFG_LED"].address
+_CFG_LED_MULT = _REGISTERS["CFG_LED_MULT"].address
+_SW_RESET = 0x01
+_LED_OFFSET = 0b00110000
+
+Write = t.Tuple[int, bytes]
+
+
+def _register_size(name: str) -> int:
+    return _REGISTERS[name].bit_width // 8
+
+
+@dataclass
+class Profile:
+    """Register values, LED multipliers and RAM images of one setup."""
+
+    name: str
+    registers: t.Dict[str, int]
+    led_mult: t.Tuple[int, int, int, int]
+    ram: t.Dict[str, t.Tuple[int, ...]] = field(default_factory=dict)
+
+    def __post_init__(self):
+        missing = set(PROFILE_REGISTERS) - set(self.registers)
+        if missing:
+            raise ValueError(f"Profile {self.name!r} lacks {sorted(missing)}")
+        for bank, image in self.ram.items():
+            if bank not in PROFILE_BANKS or len(image) != RAM_SIZE:
+                raise ValueError(f"Invalid RAM image for {bank}")
+        self.registers = dict(self.registers)
+        # Self clearing bits are never part of a profile
+        self.registers["CFG_MISC"] &= ~_SW_RESET
+        self.registers["CFG_LED"] &= ~_LED_OFFSET
+
+    @classmethod
+    def capture(cls, sensor: AS7421, name: str, from_device: bool = True) -> "Profile":
+        """Capture the current setup of ``sensor``.
+
+        With ``from_device`` everything is read back from the sensor, which
+        also refreshes its shadow. Otherwise the shadow and caches are used
+        and ``ValueError`` is raised for anything they do not know.
+        """
+        if from_device:
+            sensor.load_configuration()
+            registers = {
+                name: sensor.device.read_register(name) for name in PROFILE_REGISTERS
+            }
+            led_mult = []
+            for offset in range(4):
+                sensor.device.set("CFG_LED", LED_OFFSET=offset)
+                led_mult.append(sensor.device.read_register("CFG_LED_MULT"))
+            sensor._led_mult = list(led_mult)
+            sensor.device.set("CFG_LED", LED_OFFSET=0)
+            ram = {}
+            for bank in PROFILE_BANKS:
+                sensor.select_ram_bank(bank)
+                image = bytearray(RAM_SIZE)
+                sensor._read_block(RAM_ADDRESS, memoryview(image))
+                sensor._ram_cache[bank] = list(image)
+                ram[bank] = tuple(image)
+        else:
+            on_device = sensor.device._on_device
+            unknown = [name for name in PROFILE_REGISTERS if name not in on_device]
+            if None in sensor._led_mult:
+                unknown.append("CFG_LED_MULT")
+            ram = {}
+            for bank in PROFILE_BANKS:
+                image = sensor._ram_cache.get(bank)
+                if image is None or None in image:
+                    unknown.append(bank)
+                else:
+                    ram[bank] = tuple(image)
+            if unknown:
+                raise ValueError(f"Not known without reading the device: {unknown}")
+            registers = {name: on_device[name] for name in PROFILE_REGISTERS}
+            led_mult = sensor._led_mult
+        return cls(name, registers, tuple(led_mult), ram)
+
+    @classmethod
+    def build(
+        cls,
+        name: str,
+        configure: t.Callable[[AS7421], None],
+        base: t.Optional["Profile"] = None,
+    ) -> "Profile":
+        """Build a profile by running ``configure`` on an emulated sensor.
+
+        The sensor starts from ``base`` if given, otherwise from
+        ``setup_regs``, ``configure_smux``, ``configure_gain`` and
+        ``configure_led`` defaults. For example::
+
+            Profile.build("fast", lambda s: setattr(s, "integration_time_us", 1000))
+        """
+        from as7421.emulator import EmulatedSMBus
+
+        sensor = AS7421(EmulatedSMBus(bus_speed=None, transaction_overhead=0), reset=False)
+        if base is not None:
+            base.compile().apply(sensor)
+        else:
+            sensor.setup_regs()
+            sensor.configure_smux()
+            sensor.configure_gain()
+            sensor.configure_led()
+            for bank in PROFILE_BANKS:
+                if bank not in sensor._ram_cache:
+                    sensor.write_ram_bank(bank, [0] * RAM_SIZE)
+        configure(sensor)
+        return cls.capture(sensor, name, from_device=True)
+
+    def to_dict(self) -> t.Dict[str, t.Any]:
+        return {
+            "name": self.name,
+            "registers": dict(self.registers),
+            "led_mult": list(self.led_mult),
+            "ram": {bank: list(image) for bank, image in self.ram.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: t.Dict[str, t.Any]) -> "Profile":
+        return cls(
+            data["name"],
+            {name: int(value) for name, value in data["registers"].items()},
+            tuple(data["led_mult"]),
+            {bank: tuple(image) for bank, image in data.get("ram", {}).items()},
+        )
+
+    def compile(self) -> "CompiledProfile":
+        return CompiledProfile(self)
+
+
+class CompiledProfile:
+    """A profile laid out as bursts of adjacent registers, ready to apply."""
+
+    def __init__(self, profile: Profile):
+        self.profile = profile
+        # Runs of (address, name, bytes) without gaps between registers
+        self.bursts: t.List[t.List[t.Tuple[int, str, bytes]]] = []
+        end = None
+        for name in sorted(PROFILE_REGISTERS, key=lambda n: _REGISTERS[n].address):
+            address = _REGISTERS[name].address
+            size = _register_size(name)
+            data = profile.registers[name].to_bytes(size, "big")
+            if address != end:
+                self.bursts.append([])
+            self.bursts[-1].append((address, name, data))
+            end = address + size
+        self._cfg_led = profile.registers["CFG_LED"]
+
+    def plan(self, sensor: AS7421) -> t.List[Write]:
+        """Ordered ``(address, data)`` writes turning the sensor's known
+        state into this profile. Anything not known is written."""
+        writes: t.List[Write] = []
+        led_mult = self.profile.led_mult
+        for offset in range(4):
+            if sensor._led_mult[offset] != led_mult[offset]:
+                writes.append((_CFG_LED, bytes([self._cfg_led | offset << 4])))
+                writes.append((_CFG_LED_MULT, bytes([led_mult[offset]])))
+        led_written = bool(writes)
+
+        mapped = sensor._ram_bank
+        for bank, image in self.profile.ram.items():
+            cache = sensor._ram_cache.get(bank, [None] * RAM_SIZE)
+            changed = [idx for idx in range(RAM_SIZE) if cache[idx] != image[idx]]
+            if not changed:
+                continue
+            if bank != mapped:
+                writes.append((_CFG_RAM, bytes([_BANK_CODES[bank]])))
+                mapped = bank
+            runs = []
+            for idx in changed:
+                if runs and idx - runs[-1][1] <= RAM_MERGE_GAP + 1:
+                    runs[-1][1] = idx
+                else:
+                    runs.append([idx, idx])
+            for start, stop in runs:
+                writes.append((RAM_ADDRESS + start, bytes(image[start : stop + 1])))
+
+        on_device = sensor.device._on_device
+        for burst in self.bursts:
+            dirty = [
+                idx
+                for idx, (_, name, data) in enumerate(burst)
+                if on_device.get(name) != self.profile.registers[name]
+                or (name == "CFG_LED" and led_written)
+            ]
+            if dirty:
+                parts = burst[dirty[0] : dirty[-1] + 1]
+                writes.append((parts[0][0], b"".join(data for _, _, data in parts)))
+        return writes
+
+    def apply(self, sensor: AS7421) -> int:
+        """Bring ``sensor`` to this profile, returns the number of writes."""
+        writes = self.plan(sensor)
+        try:
+            for address, data in writes:
+                sensor._write_block(address, data)
+                if address == _CFG_RAM:
+                    sensor._ram_bank = next(
+                        bank for bank, code in _BANK_CODES.items() if code == data[0]
+                    )
+        except BaseException:
+            # Partially applied, forget what may have changed
+            sensor.device.invalidate(*PROFILE_REGISTERS, "CFG_RAM")
+            sensor._ram_bank = None
+            for bank in self.profile.ram:
+                sensor._ram_cache.pop(bank, None)
+            sensor._led_mult = [None] * 4
+            raise
+
+        for burst in self.bursts:
+            sensor.device.prime(
+                burst[0][0], b"".join(data for _, _, data in burst)
+            )
+        if sensor._ram_bank is not None:
+            sensor.device.prime(_CFG_RAM, bytes([_BANK_CODES[sensor._ram_bank]]))
+        for bank, image in self.profile.ram.items():
+            sensor._ram_cache[bank] = list(image)
+        sensor._led_mult = list(self.profile.led_mult)
+        return len(writes)
+
+
+def apply_profile(sensor: AS7421, profile: t.Union[Profile, CompiledProfile]) -> int:
+    """Apply a profile or compiled profile, returns the number of writes."""
+    if isinstance(profile, Profile):
+        profile = profile.compile()
+    return profile.apply(sensor)
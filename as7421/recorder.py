@@ -0,0 +1,346 @@
+"""Append-only binary recording and replay of acquired frames.
+
+A recording is a file header followed by chunks. Each chunk has a fixed
+header holding its kind, frame count, payload size and the first and last
+timestamps, followed by the payload: an array of :data:`frame_dtype`
+records for frame chunks or a JSON configuration snapshot for config
+chunks. Frames refer to the most recent snapshot by id. The chunk headers
+form a sparse time index, so a reader can seek by time without touching
+the frame data. Appending to a recording starts with a session chunk
+holding the new clock offset, as the one in the file header only holds
+for the frames of the first session.
+"""
+
+import json
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+import typing as t
+
+import numpy as np
+
+from as7421.as7421 import AS7421, NUM_CHANNELS
+
+MAGIC = b"AS7421RC"
+VERSION = 1
+FILE_HEADER = struct.Struct("<8sIId")
+CHUNK_MAGIC = b"CHNK"
+CHUNK_HEADER = struct.Struct("<4sc3xIIdd")
+CHUNK_FRAMES = b"F"
+CHUNK_CONFIG = b"C"
+CHUNK_SESSION = b"S"
+SESSION = struct.Struct("<d")
+
+frame_dtype = np.dtype(
+    [
+        ("timestamp", "<f8"),
+        ("channels", "<u2", (NUM_CHANNELS,)),
+        ("temperatures", "<u2", (4,)),
+        ("status", "u1"),
+        ("config", "<u4"),
+    ]
+)
+
+Frame = t.Tuple[float, t.List[int], t.List[int]]
+
+
+class FrameRecorder:
+    """Stream frames to an append-only recording.
+
+    Frames are collected into chunks of ``chunk_frames`` records in the
+    calling thread; full chunks are written by a background thread so the
+    acquisition loop never waits on the disk (unless ``max_pending`` chunks
+    are queued). Appending to an existing recording is supported.
+    """
+
+    def __init__(self, path: str, chunk_frames: int = 256, max_pending: int = 64):
+        self.path = path
+        self.chunk_frames = chunk_frames
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        if exists:
+            with FrameReader(path) as reader:
+                self._next_config = max(reader.configs, default=-1) + 1
+                end = reader.end
+            # Drop a truncated final chunk so appended chunks stay aligned
+            os.truncate(path, end)
+        self._file = open(path, "ab")
+        # Maps perf_counter timestamps to wall clock time
+        now = time.perf_counter()
+        offset = time.time() - now
+        if exists:
+            self._file.write(
+                CHUNK_HEADER.pack(CHUNK_MAGIC, CHUNK_SESSION, 0, SESSION.size, now, now)
+            )
+            self._file.write(SESSION.pack(offset))
+        else:
+            self._file.write(FILE_HEADER.pack(MAGIC, VERSION, 0, offset))
+            self._next_config = 0
+
+        self._chunk = np.zeros(chunk_frames, dtype=frame_dtype)
+        self._count = 0
+        self._config_id: t.Optional[int] = None
+        self._last_config: t.Optional[t.Dict[str, t.Any]] = None
+        self.frames_written = 0
+        self.error: t.Optional[BaseException] = None
+
+        self._queue: queue.Queue = queue.Queue(max_pending)
+        self._thread = threading.Thread(
+            target=self._write_loop, name="as7421-recorder", daemon=True
+        )
+        self._thread.start()
+
+    def _write_loop(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                kind, payload, count, first, last = item
+                self._file.write(
+                    CHUNK_HEADER.pack(CHUNK_MAGIC, kind, count, len(payload), first, last)
+                )
+                self._file.write(payload)
+                self._file.flush()
+            except BaseException as e:
+                self.error = e
+            finally:
+                self._queue.task_done()
+
+    def _submit(self, item):
+        if self.error is not None:
+            raise self.error
+        self._queue.put(item)
+
+    def _flush_frames(self):
+        if not self._count:
+            return
+        chunk = self._chunk[: self._count]
+        self._submit(
+            (
+                CHUNK_FRAMES,
+                chunk.tobytes(),
+                self._count,
+                float(chunk["timestamp"][0]),
+                float(chunk["timestamp"][-1]),
+            )
+        )
+        self.frames_written += self._count
+        self._count = 0
+
+    def record(
+        self,
+        timestamp: float,
+        channels,
+        temperatures,
+        status: int = 0,
+        config: t.Optional[t.Dict[str, t.Any]] = None,
+    ):
+        """Append one frame, with the acquisition settings it was taken with."""
+        if config is not None and config != self._last_config:
+            self._flush_frames()
+            self._config_id = self._next_config
+            self._next_config += 1
+            self._last_config = config
+            payload = json.dumps({"id": self._config_id, **config}).encode()
+            self._submit((CHUNK_CONFIG, payload, 0, timestamp, timestamp))
+
+        row = self._chunk[self._count]
+        row["timestamp"] = timestamp
+        row["channels"] = channels
+        row["temperatures"] = temperatures
+        row["status"] = status
+        row["config"] = 0xFFFFFFFF if self._config_id is None else self._config_id
+        self._count += 1
+        if self._count == self.chunk_frames:
+            self._flush_frames()
+
+    def tee(
+        self, frames: t.Iterable[Frame], sensor: t.Optional[AS7421] = None
+    ) -> t.Generator[Frame, None, None]:
+        """Record a ``do_measurement`` style stream while passing it through.
+
+        With ``sensor`` each frame also stores its STATUS_7 value and the
+        sensor's :meth:`AS7421.config_snapshot`.
+        """
+        for frame in frames:
+            timestamp, channels, temperatures = frame
+            if sensor is not None:
+                self.record(
+                    timestamp,
+                    channels,
+                    temperatures,
+                    sensor.last_status,
+                    sensor.config_snapshot(),
+                )
+            else:
+                self.record(timestamp, channels, temperatures)
+            yield frame
+
+    def flush(self):
+        """Write out the partial chunk and wait for the writer."""
+        self._flush_frames()
+        self._queue.join()
+        if self.error is not None:
+            raise self.error
+
+    def close(self):
+        if self._file.closed:
+            return
+        try:
+            self.flush()
+        finally:
+            self._queue.put(None)
+            self._thread.join()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class FrameReader:
+    """Memory mapped, time indexed access to a recording.
+
+    ``index`` holds one row per frame chunk (first and last timestamp, file
+    offset of the records, frame count and the clock offset of the session
+    that wrote it). Adding the clock offset to a frame timestamp gives wall
+    clock time; ``clock_offset`` is that of the first session. A truncated
+    final chunk, e.g. from a crash, is ignored; ``end`` is the offset just
+    past the last complete chunk.
+    """
+
+    index_dtype = np.dtype(
+        [
+            ("first", "<f8"),
+            ("last", "<f8"),
+            ("offset", "<i8"),
+            ("count", "<i8"),
+            ("clock_offset", "<f8"),
+        ]
+    )
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as file:
+            size = os.fstat(file.fileno()).st_size
+            self._mmap = (
+                mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+            )
+        if size < FILE_HEADER.size:
+            raise ValueError(f"{path} is not an AS7421 recording")
+        magic, version, _, self.clock_offset = FILE_HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not an AS7421 recording")
+
+        self.configs: t.Dict[int, t.Dict[str, t.Any]] = {}
+        clock_offset = self.clock_offset
+        entries = []
+        offset = FILE_HEADER.size
+        while offset + CHUNK_HEADER.size <= size:
+            magic, kind, count, length, first, last = CHUNK_HEADER.unpack_from(
+                self._mmap, offset
+            )
+            payload = offset + CHUNK_HEADER.size
+            if magic != CHUNK_MAGIC or payload + length > size:
+                break
+            if kind == CHUNK_FRAMES:
+                entries.append((first, last, payload, count, clock_offset))
+            elif kind == CHUNK_SESSION:
+                (clock_offset,) = SESSION.unpack_from(self._mmap, payload)
+            elif kind == CHUNK_CONFIG:
+                config = json.loads(bytes(self._mmap[payload : payload + length]))
+                self.configs[config.pop("id")] = config
+            offset = payload + length
+        self.end = offset
+        self.index = np.array(entries, dtype=self.index_dtype)
+
+    def __len__(self) -> int:
+        return int(self.index["count"].sum())
+
+    def __getitem__(self, item: slice) -> np.ndarray:
+        """Frames by position, e.g. ``reader[1000:2000]`` (a copy)."""
+        if not isinstance(item, slice) or item.step not in (None, 1):
+            raise TypeError("FrameReader only supports contiguous slices")
+        start, stop, _ = item.indices(len(self))
+        counts = self.index["count"]
+        starts = np.cumsum(counts) - counts
+        parts = []
+        first = max(int(np.searchsorted(starts, start, side="right")) - 1, 0)
+        for entry, chunk_start in zip(self.index[first:], starts[first:].tolist()):
+            if chunk_start >= stop:
+                break
+            records = np.frombuffer(
+                self._mmap,
+                dtype=frame_dtype,
+                count=int(entry["count"]),
+                offset=int(entry["offset"]),
+            )
+            parts.append(records[max(start - chunk_start, 0) : stop - chunk_start])
+        if not parts:
+            return np.zeros(0, dtype=frame_dtype)
+        return np.concatenate(parts)
+
+    def close(self):
+        """Release the file mapping.
+
+        Records returned by :meth:`chunks` are views of the mapping; while
+        any of them is alive the mapping is left to be released with them.
+        """
+        if isinstance(self._mmap, mmap.mmap):
+            try:
+                self._mmap.close()
+            except BufferError:
+                pass
+        self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def chunks(
+        self, start: t.Optional[float] = None, end: t.Optional[float] = None
+    ) -> t.Iterator[np.ndarray]:
+        """Zero-copy record arrays of the frames within ``[start, end]``."""
+        first = 0
+        if start is not None:
+            first = int(np.searchsorted(self.index["last"], start, side="left"))
+        for entry in self.index[first:]:
+            if end is not None and entry["first"] > end:
+                break
+            records = np.frombuffer(
+                self._mmap,
+                dtype=frame_dtype,
+                count=int(entry["count"]),
+                offset=int(entry["offset"]),
+            )
+            if start is not None and records["timestamp"][0] < start:
+                records = records[records["timestamp"] >= start]
+            if end is not None and records["timestamp"][-1] > end:
+                records = records[records["timestamp"] <= end]
+            yield records
+
+    def read(
+        self, start: t.Optional[float] = None, end: t.Optional[float] = None
+    ) -> np.ndarray:
+        """All frames within ``[start, end]`` as one record array (a copy)."""
+        parts = list(self.chunks(start, end))
+        if not parts:
+            return np.zeros(0, dtype=frame_dtype)
+        return np.concatenate(parts)
+
+    def frames(
+        self, start: t.Optional[float] = None, end: t.Optional[float] = None
+    ) -> t.Generator[Frame, None, None]:
+        """Replay frames with the same shape as :meth:`AS7421.do_measurement`."""
+        for records in self.chunks(start, end):
+            timestamps = records["timestamp"].tolist()
+            channels = records["channels"].tolist()
+            temperatures = records["temperatures"].tolist()
+            yield from zip(timestamps, channels, temperatures)
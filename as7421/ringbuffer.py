@@ -0,0 +1,224 @@
+"""Continuous acquisition into a preallocated ring buffer."""
+
+import threading
+import typing as t
+from dataclasses import dataclass
+
+import numpy as np
+
+from as7421.as7421 import (
+    AS7421,
+    NUM_CHANNELS,
+    ContinuousStats,
+    STATUS_ASAT,
+    STATUS_DLOST,
+    STATUS_DSAT,
+)
+
+
+@dataclass
+class FrameBatch:
+    """Views of consecutive frames in a :class:`FrameRingBuffer`."""
+
+    timestamps: np.ndarray
+    channels: np.ndarray
+    temperatures: np.ndarray
+    status: np.ndarray
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    @property
+    def data_lost(self) -> np.ndarray:
+        return (self.status & STATUS_DLOST) != 0
+
+    @property
+    def digital_saturation(self) -> np.ndarray:
+        return (self.status & STATUS_DSAT) != 0
+
+    @property
+    def analog_saturation(self) -> np.ndarray:
+        return (self.status & STATUS_ASAT) != 0
+
+
+class FrameRingBuffer:
+    """Fixed capacity frame store with overrun accounting.
+
+    Storage is allocated once. The first ``max_batch`` slots are mirrored
+    past the end of the arrays so any batch of up to ``max_batch`` frames is
+    a contiguous view, even when it wraps around. When the writer laps the
+    reader the oldest unread frames are dropped and counted in ``overruns``.
+    A writer that fails calls :meth:`fail` so waiting readers are woken.
+    """
+
+    def __init__(self, capacity: int, max_batch: t.Optional[int] = None):
+        if capacity < 1:
+            raise ValueError("capacity must be positive")
+        max_batch = capacity if max_batch is None else max_batch
+        if not 1 <= max_batch <= capacity:
+            raise ValueError("max_batch must be between 1 and capacity")
+        self.capacity = capacity
+        self.max_batch = max_batch
+        rows = capacity + max_batch
+        self.timestamps = np.zeros(rows, dtype=np.float64)
+        self.channels = np.zeros((rows, NUM_CHANNELS), dtype=np.uint16)
+        self.temperatures = np.zeros((rows, 4), dtype=np.uint16)
+        self.status = np.zeros(rows, dtype=np.uint8)
+        # Row views are created once so writing a frame allocates nothing
+        self._channel_rows = list(self.channels)
+        self._temperature_rows = list(self.temperatures)
+
+        self.written = 0
+        self.consumed = 0
+        self.overruns = 0
+        self.error: t.Optional[BaseException] = None
+        self._cond = threading.Condition()
+
+    def __len__(self) -> int:
+        return self.written - self.consumed
+
+    def write_slot(self) -> t.Tuple[np.ndarray, np.ndarray]:
+        """Channel and temperature rows to fill for the next frame.
+
+        When the buffer is full the oldest unread frame is dropped here, so
+        a reader cannot be handed the slot while it is being written.
+        """
+        with self._cond:
+            if self.written - self.consumed >= self.capacity:
+                self.overruns += 1
+                self.consumed = self.written - self.capacity + 1
+        idx = self.written % self.capacity
+        return self._channel_rows[idx], self._temperature_rows[idx]
+
+    def commit(self, timestamp: float, status: int):
+        """Publish the frame written into :meth:`write_slot`."""
+        idx = self.written % self.capacity
+        self.timestamps[idx] = timestamp
+        self.status[idx] = status
+        if idx < self.max_batch:
+            mirror = idx + self.capacity
+            self.timestamps[mirror] = timestamp
+            self.status[mirror] = status
+            self.channels[mirror] = self.channels[idx]
+            self.temperatures[mirror] = self.temperatures[idx]
+        with self._cond:
+            self.written += 1
+            self._cond.notify_all()
+
+    def fail(self, error: BaseException):
+        """Record that the writer stopped with ``error`` and wake readers."""
+        with self._cond:
+            self.error = error
+            self._cond.notify_all()
+
+    def acquire(self, n: int, timeout: t.Optional[float] = None) -> FrameBatch:
+        """Consume the next ``n`` frames, waiting for them if necessary.
+
+        Returns views into the buffer, not copies. Consumed slots are free for
+        the writer: if ``b`` frames were buffered when the batch was taken,
+        the views stay valid only until the writer has produced another
+        ``capacity - b`` frames, so a batch taken from a full buffer may be
+        overwritten right away. Copy frames that must be kept longer.
+
+        Returns fewer than ``n`` frames if ``timeout`` expires first. Raises
+        the writer's error, see :meth:`fail`, once fewer than ``n`` frames
+        are left.
+        """
+        if not 0 < n <= self.max_batch:
+            raise ValueError(f"batch size must be between 1 and {self.max_batch}")
+        with self._cond:
+            self._cond.wait_for(
+                lambda: len(self) >= n or self.error is not None, timeout
+            )
+            if len(self) < n and self.error is not None:
+                raise self.error
+            n = min(n, len(self))
+            start = self.consumed % self.capacity
+            self.consumed += n
+        end = start + n
+        return FrameBatch(
+            self.timestamps[start:end],
+            self.channels[start:end],
+            self.temperatures[start:end],
+            self.status[start:end],
+        )
+
+
+class RingAcquisition:
+    """Acquire continuously from a sensor into a :class:`FrameRingBuffer`.
+
+    A background thread runs :meth:`AS7421.continuous_measurement`, which
+    re-arms the measurement sequence each time ICOUNT frames have been
+    taken, and writes every frame straight into the ring. ``lost_frames``
+    counts frames the device reported as lost (DLOST), the ring's
+    ``overruns`` those dropped because the reader fell behind. ``stats``
+    holds the dead time between sequences.
+    """
+
+    def __init__(
+        self,
+        sensor: AS7421,
+        capacity: int = 4096,
+        max_batch: t.Optional[int] = None,
+        with_led: bool = True,
+    ):
+        self.sensor = sensor
+        self.buffer = FrameRingBuffer(capacity, max_batch)
+        self.with_led = with_led
+        self.stats = ContinuousStats()
+        self.error: t.Optional[BaseException] = None
+        self._stop = threading.Event()
+        self._thread: t.Optional[threading.Thread] = None
+
+    @property
+    def lost_frames(self) -> int:
+        return self.stats.lost_frames
+
+    @property
+    def overruns(self) -> int:
+        return self.buffer.overruns
+
+    def start(self):
+        if self._thread is not None:
+            raise RuntimeError("Acquisition already running")
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="as7421-ring", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def acquire(self, n: int, timeout: t.Optional[float] = None) -> FrameBatch:
+        if self.error is not None:
+            raise self.error
+        return self.buffer.acquire(n, timeout)
+
+    def _run(self):
+        sensor = self.sensor
+        buffer = self.buffer
+        try:
+            frames = sensor.continuous_measurement(self.with_led, self.stats)
+            try:
+                for timestamp, status in frames:
+                    sensor.read_frame(*buffer.write_slot())
+                    buffer.commit(timestamp, status)
+                    if self._stop.is_set():
+                        break
+            finally:
+                frames.close()
+        except BaseException as e:
+            self.error = e
+            buffer.fail(e)
@@ -0,0 +1,256 @@
+"""Running statistics over a frame stream in constant memory.
+
+:class:`StreamStatistics` keeps per channel and per temperature count,
+mean, variance, minimum, maximum and an exponential moving average,
+updated with Welford's algorithm for single frames and Chan's parallel
+merge for batches. Frames further than ``outlier_sigma`` standard
+deviations from the running mean are flagged. With a window the
+statistics are reset every ``window_frames`` frames or ``window_seconds``
+seconds (tumbling windows) and the closed window's snapshot is handed to
+``on_window``; the EMA carries on across windows.
+"""
+
+import typing as t
+from dataclasses import dataclass
+
+import numpy as np
+
+from as7421.as7421 import NUM_CHANNELS
+
+Frame = t.Tuple[float, t.Sequence[int], t.Sequence[int]]
+
+
+class RunningStats:
+    """Vectorised running moments of ``width`` independent values."""
+
+    def __init__(self, width: int, ema_alpha: float = 0.05):
+        self.width = width
+        self.ema_alpha = ema_alpha
+        self.ema = np.full(width, np.nan)
+        self.reset()
+
+    def reset(self):
+        """Clear the moments, the EMA is kept."""
+        self.count = 0
+        self.mean = np.zeros(self.width)
+        self._m2 = np.zeros(self.width)
+        self.minimum = np.full(self.width, np.inf)
+        self.maximum = np.full(self.width, -np.inf)
+
+    @property
+    def variance(self) -> np.ndarray:
+        """Sample variance, NaN until two values have been seen."""
+        if self.count < 2:
+            return np.full(self.width, np.nan)
+        return self._m2 / (self.count - 1)
+
+    @property
+    def std(self) -> np.ndarray:
+        return np.sqrt(self.variance)
+
+    def update(self, values: np.ndarray):
+        """Add one ``(width,)`` sample."""
+        values = np.asarray(values, dtype=np.float64)
+        self.count += 1
+        delta = values - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (values - self.mean)
+        np.minimum(self.minimum, values, out=self.minimum)
+        np.maximum(self.maximum, values, out=self.maximum)
+        if np.isnan(self.ema[0]):
+            self.ema[:] = values
+        else:
+            self.ema += self.ema_alpha * (values - self.ema)
+
+    def update_batch(self, values: np.ndarray):
+        """Add ``(n, width)`` samples at once."""
+        values = np.asarray(values, dtype=np.float64)
+        n = len(values)
+        if not n:
+            return
+        batch_mean = values.mean(axis=0)
+        batch_m2 = ((values - batch_mean) ** 2).sum(axis=0)
+        total = self.count + n
+        delta = batch_mean - self.mean
+        self.mean += delta * (n / total)
+        self._m2 += batch_m2 + delta**2 * (self.count * n / total)
+        self.count = total
+        np.minimum(self.minimum, values.min(axis=0), out=self.minimum)
+        np.maximum(self.maximum, values.max(axis=0), out=self.maximum)
+
+        # The EMA recursion unrolled: older samples get geometric weights
+        alpha = self.ema_alpha
+        if np.isnan(self.ema[0]):
+            self.ema[:] = values[0]
+            values = values[1:]
+            n -= 1
+        decay = (1.0 - alpha) ** np.arange(n - 1, -1, -1)
+        self.ema = (1.0 - alpha) ** n * self.ema + alpha * (decay @ values)
+
+
+@dataclass
+class StatisticsSnapshot:
+    """Statistics of the frames between ``start`` and ``end``."""
+
+    start: float
+    end: float
+    count: int
+    outliers: np.ndarray
+    channel_mean: np.ndarray
+    channel_std: np.ndarray
+    channel_min: np.ndarray
+    channel_max: np.ndarray
+    channel_ema: np.ndarray
+    temperature_mean: np.ndarray
+    temperature_std: np.ndarray
+    temperature_min: np.ndarray
+    temperature_max: np.ndarray
+    temperature_ema: np.ndarray
+
+    def as_dict(self) -> t.Dict[str, t.Any]:
+        """Plain Python values, e.g. for JSON export."""
+        return {
+            name: value.tolist() if isinstance(value, np.ndarray) else value
+            for name, value in vars(self).items()
+        }
+
+
+class StreamStatistics:
+    """Per channel and temperature statistics of a frame stream.
+
+    Feed frames with :meth:`update` or :meth:`update_batch`, or wrap a
+    ``do_measurement`` style generator with :meth:`tee`. ``outliers``
+    counts, per channel, the frames flagged since the window started.
+    Outliers are only flagged once ``min_count`` frames have been seen.
+    """
+
+    def __init__(
+        self,
+        ema_alpha: float = 0.05,
+        outlier_sigma: float = 5.0,
+        min_count: int = 10,
+        window_frames: t.Optional[int] = None,
+        window_seconds: t.Optional[float] = None,
+        on_window: t.Optional[t.Callable[[StatisticsSnapshot], None]] = None,
+    ):
+        if window_frames is not None and window_frames < 1:
+            raise ValueError("window_frames must be positive")
+        self.outlier_sigma = outlier_sigma
+        self.min_count = min_count
+        self.window_frames = window_frames
+        self.window_seconds = window_seconds
+        self.on_window = on_window
+        self.channels = RunningStats(NUM_CHANNELS, ema_alpha)
+        self.temperatures = RunningStats(4, ema_alpha)
+        self.last_window: t.Optional[StatisticsSnapshot] = None
+        self.total_frames = 0
+        self._reset_window(None)
+
+    def _reset_window(self, start: t.Optional[float]):
+        self.channels.reset()
+        self.temperatures.reset()
+        self.outliers = np.zeros(NUM_CHANNELS, dtype=np.int64)
+        self._start = start
+        self._end = start
+
+    def _close_window(self):
+        self.last_window = self.snapshot()
+        if self.on_window is not None:
+            self.on_window(self.last_window)
+        self._reset_window(None)
+
+    def _room(self, timestamp: float) -> int:
+        """Frames the current window still takes, closing it if it is full."""
+        if self._start is None:
+            self._start = timestamp
+        elif (
+            self.window_seconds is not None
+            and timestamp - self._start >= self.window_seconds
+        ):
+            self._close_window()
+            self._start = timestamp
+        if self.window_frames is None:
+            return -1
+        return self.window_frames - self.channels.count
+
+    def _flag(self, channels: np.ndarray) -> np.ndarray:
+        if self.channels.count < self.min_count:
+            return np.zeros(channels.shape, dtype=bool)
+        with np.errstate(invalid="ignore"):
+            limit = self.outlier_sigma * self.channels.std
+            return np.abs(channels - self.channels.mean) > limit
+
+    def update(
+        self, timestamp: float, channels: t.Sequence[int], temperatures: t.Sequence[int]
+    ) -> np.ndarray:
+        """Add one frame, returns the channels flagged as outliers."""
+        self._room(timestamp)
+        channels = np.asarray(channels, dtype=np.float64)
+        flagged = self._flag(channels)
+        self.outliers += flagged
+        self.channels.update(channels)
+        self.temperatures.update(temperatures)
+        self._end = timestamp
+        self.total_frames += 1
+        if self.window_frames is not None and self.channels.count >= self.window_frames:
+            self._close_window()
+        return flagged
+
+    def update_batch(
+        self, timestamps: np.ndarray, channels: np.ndarray, temperatures: np.ndarray
+    ) -> np.ndarray:
+        """Add ``(n, 64)`` frames at once, returns the ``(n, 64)`` outlier flags.
+
+        Frames are flagged against the statistics from before the batch.
+        A batch spanning window boundaries is split at them.
+        """
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        channels = np.asarray(channels, dtype=np.float64)
+        temperatures = np.asarray(temperatures, dtype=np.float64)
+        flagged = np.zeros(channels.shape, dtype=bool)
+        start = 0
+        while start < len(timestamps):
+            room = self._room(float(timestamps[start]))
+            stop = len(timestamps) if room < 0 else min(start + room, len(timestamps))
+            if self.window_seconds is not None:
+                limit = self._start + self.window_seconds
+                stop = start + max(
+                    int(np.searchsorted(timestamps[start:stop], limit)), 1
+                )
+            part = channels[start:stop]
+            flagged[start:stop] = self._flag(part)
+            self.outliers += flagged[start:stop].sum(axis=0)
+            self.channels.update_batch(part)
+            self.temperatures.update_batch(temperatures[start:stop])
+            self._end = float(timestamps[stop - 1])
+            self.total_frames += stop - start
+            if self.window_frames is not None and self.channels.count >= self.window_frames:
+                self._close_window()
+            start = stop
+        return flagged
+
+    def tee(self, frames: t.Iterable[Frame]) -> t.Generator[Frame, None, None]:
+        """Pass frames through while updating the statistics."""
+        for frame in frames:
+            self.update(*frame)
+            yield frame
+
+    def snapshot(self) -> StatisticsSnapshot:
+        """Statistics of the current window (or the whole run without one)."""
+        start = self._start if self._start is not None else 0.0
+        return StatisticsSnapshot(
+            start=start,
+            end=self._end if self._end is not None else start,
+            count=self.channels.count,
+            outliers=self.outliers.copy(),
+            channel_mean=self.channels.mean.copy(),
+            channel_std=self.channels.std,
+            channel_min=self.channels.minimum.copy(),
+            channel_max=self.channels.maximum.copy(),
+            channel_ema=self.channels.ema.copy(),
+            temperature_mean=self.temperatures.mean.copy(),
+            temperature_std=self.temperatures.std,
+            temperature_min=self.temperatures.minimum.copy(),
+            temperature_max=self.temperatures.maximum.copy(),
+            temperature_ema=self.temperatures.ema.copy(),
+        )
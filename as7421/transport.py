@@ -0,0 +1,119 @@
+"""Bus transports used by :class:`AS7421`.
+
+A transport provides the SMBus methods used by ``i2cdevice`` plus
+``read_into`` and ``read_blocks`` for reading consecutive registers
+straight into a buffer. ``combined_reads`` tells the driver whether
+``read_blocks`` costs a single bus transaction, so it is worth batching
+extra reads into it.
+"""
+
+import ctypes
+import typing as t
+
+import smbus2
+from smbus2 import i2c_msg
+from smbus2.smbus2 import I2C_M_RD
+
+SMBUS_BLOCK_MAX = 32
+
+
+class SMBusTransport:
+    """Transport over SMBus block transfers, limited to 32 bytes each.
+
+    ``bus`` is a bus number or any SMBus-like object, e.g. an emulator.
+    """
+
+    combined_reads = False
+
+    def __init__(self, bus: t.Union[int, t.Any, None] = 1):
+        self.bus = smbus2.SMBus(bus) if bus is None or isinstance(bus, int) else bus
+
+    def read_i2c_block_data(
+        self, i2c_addr: int, register: int, length: int, force=None
+    ) -> t.List[int]:
+        return self.bus.read_i2c_block_data(i2c_addr, register, length)
+
+    def write_i2c_block_data(
+        self, i2c_addr: int, register: int, data: t.Sequence[int], force=None
+    ):
+        self.bus.write_i2c_block_data(i2c_addr, register, data)
+
+    def read_byte_data(self, i2c_addr: int, register: int, force=None) -> int:
+        return self.bus.read_byte_data(i2c_addr, register)
+
+    def write_byte_data(self, i2c_addr: int, register: int, value: int, force=None):
+        self.bus.write_byte_data(i2c_addr, register, value)
+
+    def read_into(self, i2c_addr: int, register: int, buffer: memoryview):
+        """Fill ``buffer`` from consecutive registers starting at ``register``."""
+        for start in range(0, len(buffer), SMBUS_BLOCK_MAX):
+            length = min(SMBUS_BLOCK_MAX, len(buffer) - start)
+            buffer[start : start + length] = bytes(
+                self.bus.read_i2c_block_data(i2c_addr, register + start, length)
+            )
+
+    def read_blocks(
+        self, i2c_addr: int, blocks: t.Sequence[t.Tuple[int, memoryview]]
+    ):
+        """Fill several buffers, each from its own start register, in order."""
+        for register, buffer in blocks:
+            self.read_into(i2c_addr, register, buffer)
+
+    def close(self):
+        self.bus.close()
+
+
+class I2CRdwrTransport(SMBusTransport):
+    """Transport using combined I2C_RDWR transactions.
+
+    Each read is a register address write followed by a read of any length
+    with a repeated start, and ``read_blocks`` issues all of its reads in a
+    single ioctl. ``bus`` needs an ``i2c_rdwr`` method, as on
+    ``smbus2.SMBus``. Data is read directly into the caller's buffer.
+    """
+
+    combined_reads = True
+
+    @staticmethod
+    def _read_messages(i2c_addr: int, register: int, buffer: memoryview):
+        # The read message points into ``buffer`` so the data lands in place
+        target = (ctypes.c_char * len(buffer)).from_buffer(buffer)
+        return (
+            i2c_msg.write(i2c_addr, [register]),
+            i2c_msg(
+                addr=i2c_addr,
+                flags=I2C_M_RD,
+                len=len(buffer),
+                buf=ctypes.cast(target, ctypes.POINTER(ctypes.c_char)),
+            ),
+        )
+
+    def read_into(self, i2c_addr: int, register: int, buffer: memoryview):
+        self.bus.i2c_rdwr(*self._read_messages(i2c_addr, register, buffer))
+
+    def read_blocks(
+        self, i2c_addr: int, blocks: t.Sequence[t.Tuple[int, memoryview]]
+    ):
+        messages = []
+        for register, buffer in blocks:
+            messages.extend(self._read_messages(i2c_addr, register, buffer))
+        self.bus.i2c_rdwr(*messages)
+
+    def read_i2c_block_data(
+        self, i2c_addr: int, register: int, length: int, force=None
+    ) -> t.List[int]:
+        read = i2c_msg.read(i2c_addr, length)
+        self.bus.i2c_rdwr(i2c_msg.write(i2c_addr, [register]), read)
+        return list(read)
+
+    def write_i2c_block_data(
+        self, i2c_addr: int, register: int, data: t.Sequence[int], force=None
+    ):
+        self.bus.i2c_rdwr(i2c_msg.write(i2c_addr, [register, *data]))
+
+    def read_byte_data(self, i2c_addr: int, register: int, force=None) -> int:
+        return self.read_i2c_block_data(i2c_addr, register, 1)[0]
+
+    def write_byte_data(self, i2c_addr: int, register: int, value: int, force=None):
+        self.write_i2c_block_data(i2c_addr, register, [value])
+
@@ -0,0 +1,76 @@
+import pytest
+
+from as7421 import AS7421
+from as7421.emulator import EmulatedSMBus
+
+# Long enough that scheduler jitter does not cost frames
+INTEGRATION_US = 10_000
+WAIT_US = 1_000
+
+
+@pytest.fixture
+def bus():
+    return EmulatedSMBus(bus_speed=400_000)
+
+
+@pytest.fixture
+def sensor(bus):
+    sensor = AS7421(bus)
+    bus.reset_stats()
+    return sensor
+
+
+def configure(sensor: AS7421, num_measurements: int = 5):
+    sensor.setup_regs()
+    sensor.powerup()
+    sensor.configure_smux()
+    sensor.configure_gain()
+    sensor.configure_led()
+    sensor.integration_time_us = INTEGRATION_US
+    sensor.wait_time_us = WAIT_US
+    sensor.num_measurements = num_measurements
+
+
+@pytest.fixture
+def configured(sensor, bus):
+    configure(sensor)
+    bus.reset_stats()
+    return sensor
+
+
+def make_calibration(seed: int = 0) -> bytes:
+    """A synthetic calibration file with plausible values in the used fields."""
+    import numpy as np
+
+    from as7421.calibration import calibration_dtype
+
+    rng = np.random.default_rng(seed)
+    record = np.zeros(1, dtype=calibration_dtype)
+    record["version"] = [1, 2, 3]
+    record["sensor_channel_order"] = rng.permutation(64)
+    record["chip_ident"] = rng.integers(0, 256, 24)
+    record["device_id"] = rng.integers(0, 256, 24)
+    record["dev_cal_matrix"] = rng.random(64 * 401, dtype=np.float32) / 64
+    record["dev_black"] = rng.uniform(100, 200, 384)
+    record["device_white"] = rng.uniform(20_000, 40_000, 384)
+    record["dev_white_ref"] = rng.uniform(0.5, 1.0, 401)
+    record["dev_cal_matrix_temperature"] = 25.0
+    record["dev_temp_coeff"] = rng.normal(0, 1e-3, 46080)
+    # Per channel rows of 36 coefficients: 1 + a small linear drift
+    poly = np.zeros((64, 36))
+    poly[:, 0] = 1.0
+    poly[:, 1] = rng.normal(0, 1e-3, 64)
+    record["dev_temp_coeff_poly"] = poly.ravel()
+    record["dev_temp_coeff_az_poly"] = rng.normal(0, 1e-3, 68)
+    config = record["configuration_data"]
+    config["dev_sen_integration"] = 20_000
+    config["temperature_cal"][0, :2] = [0.01, -5.0]
+    record["checksum"] = int(rng.integers(0, 2**62))
+    return record.tobytes()
+
+
+@pytest.fixture
+def calibration_file(tmp_path):
+    path = tmp_path / "calibration.bin"
+    path.write_bytes(make_calibration())
+    return str(path)
@@ -0,0 +1,82 @@
+import asyncio
+import time
+
+from as7421.aio import AsyncAS7421
+from as7421.emulator import EmulatedSMBus
+from tests.conftest import configure
+
+
+def test_frames(configured):
+    async def run():
+        async with AsyncAS7421(configured) as sensor:
+            return [frame async for frame in sensor.frames()]
+
+    frames = asyncio.run(run())
+    assert len(frames) == 5
+    assert all(len(channels) == 64 for _, channels, _ in frames)
+
+
+def test_two_sensors_share_a_loop():
+    async def acquire(bus):
+        sensor = await AsyncAS7421.open(bus)
+        async with sensor:
+            await sensor._run(configure, sensor.sensor)
+            return [frame async for frame in sensor.frames()]
+
+    async def run():
+        return await asyncio.gather(
+            acquire(EmulatedSMBus(bus_speed=400_000)),
+            acquire(EmulatedSMBus(bus_speed=400_000)),
+        )
+
+    first, second = asyncio.run(run())
+    assert len(first) == len(second) == 5
+
+
+def test_loop_is_not_blocked(configured):
+    ticks = 0
+
+    async def ticker(done):
+        nonlocal ticks
+        while not done.is_set():
+            ticks += 1
+            await asyncio.sleep(0.005)
+
+    async def run():
+        done = asyncio.Event()
+        task = asyncio.create_task(ticker(done))
+        async with AsyncAS7421(configured) as sensor:
+            frames = [frame async for frame in sensor.frames()]
+        done.set()
+        await task
+        return frames
+
+    frames = asyncio.run(run())
+    assert len(frames) == 5
+    # Five frames of about 41 ms, the ticker must have kept running
+    assert ticks > 10
+
+
+def test_close_does_not_block_the_loop(configured):
+    ticks = 0
+
+    async def ticker(done):
+        nonlocal ticks
+        while not done.is_set():
+            ticks += 1
+            await asyncio.sleep(0.005)
+
+    async def run():
+        done = asyncio.Event()
+        sensor = AsyncAS7421(configured)
+        # A bus call still running when the sensor is closed
+        pending = sensor.executor.submit(time.sleep, 0.1)
+        task = asyncio.create_task(ticker(done))
+        await sensor.close()
+        done.set()
+        await task
+        return pending
+
+    pending = asyncio.run(run())
+    assert pending.done()
+    assert ticks > 5
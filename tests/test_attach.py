@@ -0,0 +1,50 @@
+import time
+
+import pytest
+
+from as7421 import AS7421
+from as7421.as7421 import REGISTERS
+from as7421.emulator import EmulatedSMBus
+from tests.conftest import configure
+
+
+def test_attach_adopts_configuration(bus):
+    configure(AS7421(bus))
+    bus.reset_stats()
+    start = time.perf_counter()
+    sensor = AS7421.attach(bus)
+    assert time.perf_counter() - start < 0.05
+    # Identity plus the two configuration blocks, and no reset
+    assert bus.writes == 0
+    assert bus.reads == 3
+    bus.reset_stats()
+    assert sensor.integration_time_us == 10_000
+    assert sensor.num_measurements == 5
+    assert bus.transactions == 0
+
+
+def test_attached_sensor_measures(bus):
+    configure(AS7421(bus))
+    sensor = AS7421.attach(bus)
+    assert len(list(sensor.do_measurement())) == 5
+
+
+@pytest.mark.parametrize("dev_id", [0x00, 0x3F])
+def test_attach_rejects_empty_bus(dev_id):
+    with pytest.raises(RuntimeError):
+        AS7421.attach(EmulatedSMBus(dev_id=dev_id))
+
+
+def test_attach_checks_expected_id():
+    bus = EmulatedSMBus(dev_id=0x22)
+    with pytest.raises(RuntimeError):
+        AS7421.attach(bus, dev_id=0x21)
+    assert AS7421.attach(bus, dev_id=0x22).identify() == (0x22, 0x01)
+
+
+def test_register_map_is_shared():
+    first = AS7421(EmulatedSMBus(), reset=False)
+    second = AS7421(EmulatedSMBus(), reset=False)
+    for register in REGISTERS:
+        assert first.device.registers[register.name] is register
+        assert second.device.registers[register.name] is register
@@ -0,0 +1,50 @@
+import numpy as np
+
+from as7421.as7421 import STATUS_DSAT
+from as7421.autorange import FULL_SCALE, AutoRanger
+
+
+def test_run_settles_in_range(configured):
+    configured.integration_time_us = 1_000
+    ranger = AutoRanger(configured, max_integration_time=0.02)
+    assert ranger.run(max_frames=10)
+    # The ICOUNT in use before is restored
+    assert configured.num_measurements == 5
+    channels = None
+    configured.num_measurements = 1
+    for _, channels, _ in configured.do_measurement():
+        pass
+    levels = np.asarray(channels) / FULL_SCALE
+    assert levels.max() <= ranger.high
+    assert (levels >= ranger.low).all()
+
+
+def test_saturation_lowers_gain(configured):
+    ranger = AutoRanger(configured)
+    channels = np.full(64, 1000)
+    channels[3] = FULL_SCALE
+    assert not ranger.update(channels, STATUS_DSAT)
+    gains = configured.gains
+    assert gains[3] == 4
+    assert gains[4] == 6
+
+
+def test_saturation_at_min_gain_halves_integration(configured):
+    configured.configure_gain(0)
+    ticks = configured.integration_ticks
+    ranger = AutoRanger(configured)
+    channels = np.full(64, FULL_SCALE)
+    ranger.update(channels, STATUS_DSAT)
+    assert configured.integration_ticks == round((ticks + 1) / 2) - 1
+
+
+def test_settled_writes_nothing(configured, bus):
+    configured.integration_time_us = 1_000
+    ranger = AutoRanger(configured, max_integration_time=0.02)
+    assert ranger.run(max_frames=10)
+    configured.num_measurements = 1
+    for _, channels, _ in configured.do_measurement():
+        pass
+    bus.reset_stats()
+    assert ranger.update(np.asarray(channels), configured.last_status)
+    assert bus.writes == 0
@@ -0,0 +1,112 @@
+import os
+
+import numpy as np
+import pytest
+
+from as7421.batch import main, output_dtype, process_recordings
+from as7421.calibration import load_calib_file
+from as7421.processing import CalibrationEngine, TemperatureCompensator
+from as7421.recorder import FrameRecorder, FrameReader
+
+COMPENSATION = {"scale": 0.01, "offset": -5.0, "reference": 25.0}
+
+
+def record(path, count, seed=0):
+    rng = np.random.default_rng(seed)
+    with FrameRecorder(str(path), chunk_frames=16) as recorder:
+        for idx in range(count):
+            recorder.record(
+                float(idx),
+                rng.integers(1000, 30_000, 64),
+                rng.integers(2900, 3100, 4),
+                status=idx % 256,
+            )
+    return str(path)
+
+
+@pytest.fixture
+def recordings(tmp_path):
+    return [record(tmp_path / "a.bin", 50, 1), record(tmp_path / "b.bin", 7, 2)]
+
+
+def expected(recording, calibration_file, compensation=None):
+    calibration = load_calib_file(calibration_file)
+    engine = CalibrationEngine.from_calibration(calibration)
+    with FrameReader(recording) as reader:
+        records = reader[:]
+    frames = records["channels"]
+    if compensation is not None:
+        compensator = TemperatureCompensator.from_calibration(
+            calibration, **compensation
+        )
+        frames = compensator.apply(frames, records["temperatures"])
+    return records, engine.process(frames)
+
+
+def test_process(tmp_path, recordings, calibration_file):
+    out_dir = str(tmp_path / "out")
+    results = list(
+        process_recordings(
+            recordings, calibration_file, out_dir, workers=2, shard_frames=8
+        )
+    )
+    assert [(r, n) for r, _, n in results] == [(recordings[0], 50), (recordings[1], 7)]
+    for recording, output, count in results:
+        assert output == os.path.join(
+            out_dir, os.path.basename(recording)[:-4] + ".spectra.npy"
+        )
+        spectra = np.load(output)
+        assert spectra.dtype == output_dtype(spectra["spectrum"].shape[1])
+        records, reference = expected(recording, calibration_file)
+        np.testing.assert_array_equal(spectra["timestamp"], records["timestamp"])
+        np.testing.assert_array_equal(spectra["status"], records["status"])
+        np.testing.assert_allclose(spectra["spectrum"], reference, rtol=1e-5)
+
+
+def test_temperature_compensation(tmp_path, recordings, calibration_file):
+    out_dir = str(tmp_path / "out")
+    (_, output, _), _ = process_recordings(
+        recordings,
+        calibration_file,
+        out_dir,
+        workers=1,
+        temperature_compensation=COMPENSATION,
+    )
+    _, reference = expected(recordings[0], calibration_file, COMPENSATION)
+    np.testing.assert_allclose(np.load(output)["spectrum"], reference, rtol=1e-5)
+
+
+def test_duplicate_names(tmp_path, calibration_file):
+    (tmp_path / "a").mkdir()
+    (tmp_path / "b").mkdir()
+    recordings = [
+        record(tmp_path / "a" / "run.bin", 5),
+        record(tmp_path / "b" / "run.bin", 5),
+    ]
+    out_dir = tmp_path / "out"
+    with pytest.raises(ValueError, match="run.bin"):
+        list(process_recordings(recordings, calibration_file, str(out_dir)))
+    assert not out_dir.exists()
+
+
+def test_main(tmp_path, recordings, calibration_file, capsys):
+    out_dir = str(tmp_path / "out")
+    main(
+        [
+            *recordings,
+            "-c",
+            calibration_file,
+            "-o",
+            out_dir,
+            "-j",
+            "1",
+            "--temperature-compensation",
+            "0.01",
+            "-5",
+            "25",
+        ]
+    )
+    assert "50 frames" in capsys.readouterr().out
+    _, reference = expected(recordings[0], calibration_file, COMPENSATION)
+    spectra = np.load(os.path.join(out_dir, "a.spectra.npy"))
+    np.testing.assert_allclose(spectra["spectrum"], reference, rtol=1e-5)
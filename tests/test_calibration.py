@@ -0,0 +1,111 @@
+import numpy as np
+
+from as7421.calibration import (
+    CalibrationCache,
+    calibration_dtype,
+    calibration_key,
+    load_calib_data,
+    load_calib_file,
+    parse_calib_file,
+)
+from tests.conftest import make_calibration
+
+
+def _assert_same(mapped, parsed):
+    for name in parsed:
+        if name.startswith("_"):
+            continue
+        expected = parsed[name]
+        value = mapped[name]
+        if hasattr(expected, "items"):
+            _assert_same(value, expected)
+        elif isinstance(expected, list) and expected and hasattr(expected[0], "items"):
+            for idx, item in enumerate(expected):
+                for field in item:
+                    if not field.startswith("_"):
+                        assert value[field][idx] == item[field]
+        elif isinstance(expected, list):
+            np.testing.assert_array_equal(value, expected)
+        else:
+            assert value == expected, name
+
+
+def test_layout_size():
+    assert calibration_dtype.itemsize == len(make_calibration())
+
+
+def test_matches_construct_parser(calibration_file):
+    _assert_same(load_calib_file(calibration_file), parse_calib_file(calibration_file))
+
+
+def test_fields_are_views(calibration_file):
+    data = load_calib_file(calibration_file)
+    matrix = data.dev_cal_matrix
+    assert matrix.dtype == np.dtype("<f4")
+    assert matrix.base is not None
+    assert isinstance(data.checksum, int)
+    assert isinstance(data.chip_ident, bytes)
+
+
+def test_load_from_bytes():
+    blob = make_calibration(1)
+    data = load_calib_data(blob)
+    assert "dev_cal_matrix" in data.keys()
+    assert data.configuration_data.dev_sen_integration == 20_000
+
+
+def test_calibration_key(tmp_path):
+    paths = []
+    for seed in (0, 0, 1):
+        path = tmp_path / f"{len(paths)}.bin"
+        path.write_bytes(make_calibration(seed))
+        paths.append(str(path))
+    keys = [calibration_key(load_calib_file(path)) for path in paths]
+    assert keys[0] == keys[1]
+    assert keys[0] != keys[2]
+
+
+def test_cache(calibration_file):
+    cache = CalibrationCache(max_entries=2)
+    data = cache.load(calibration_file)
+    assert cache.load(calibration_file) is data
+    built = []
+
+    def factory(calibration):
+        built.append(calibration)
+        return object()
+
+    derived = cache.derive(data, "engine", factory)
+    assert cache.derive(load_calib_file(calibration_file), "engine", factory) is derived
+    assert built == [data]
+
+
+def test_cache_eviction(tmp_path):
+    cache = CalibrationCache(max_entries=2)
+    loaded = []
+    for seed in range(3):
+        path = tmp_path / f"{seed}.bin"
+        path.write_bytes(make_calibration(seed))
+        loaded.append(cache.load(str(path)))
+    assert len(cache) == 2
+    # The least recently used calibration was dropped
+    assert cache.load(str(tmp_path / "0.bin")) is not loaded[0]
+    assert cache.load(str(tmp_path / "2.bin")) is loaded[2]
+
+
+def test_cache_detects_changed_content(tmp_path):
+    path = tmp_path / "calibration.bin"
+    blob = bytearray(make_calibration())
+    path.write_bytes(bytes(blob))
+    cache = CalibrationCache()
+    data = cache.load(str(path))
+    engine = cache.derive(data, "engine", lambda calibration: object())
+
+    # Same checksum and ids, different body
+    offset = calibration_dtype.fields["dev_cal_matrix"][1]
+    blob[offset] ^= 0xFF
+    path.write_bytes(bytes(blob))
+    fresh = cache.load(str(path))
+    assert calibration_key(fresh) == calibration_key(data)
+    assert fresh is not data
+    assert cache.derive(fresh, "engine", lambda calibration: object()) is not engine
@@ -0,0 +1,51 @@
+import itertools
+
+import pytest
+
+from as7421.as7421 import ContinuousStats, MeasumentStatus
+
+
+def test_any_set():
+    status = MeasumentStatus(0, False, False, False, False, False, False)
+    assert not status.any_set()
+    status.data_available = True
+    assert status.any_set()
+
+
+def test_runs_past_icount(configured, bus):
+    configured.num_measurements = 3
+    stats = ContinuousStats()
+    measurement = configured.do_continuous_measurement(stats=stats)
+    frames = list(itertools.islice(measurement, 10))
+    measurement.close()
+    assert len(frames) == 10
+    assert all(all(channels) for _, channels, _ in frames)
+    assert stats.frames == 10
+    assert stats.rearms >= 3
+    assert 0.0 <= stats.duty_cycle <= 1.0
+    # Closing the generator stops the sequence
+    assert not bus._running
+
+
+def test_timestamps_increase(configured):
+    configured.num_measurements = 2
+    timestamps = [
+        timestamp
+        for timestamp, _ in itertools.islice(configured.continuous_measurement(), 6)
+    ]
+    assert timestamps == sorted(timestamps)
+    period = configured.frame_period()
+    gaps = [b - a for a, b in zip(timestamps, timestamps[1:])]
+    # Re-arming costs at most a frame, not a whole new sequence setup
+    assert max(gaps) < 2.5 * period
+
+
+def test_stats_gaps():
+    stats = ContinuousStats(rearms=2, elapsed=1.0)
+    stats.add_gap(0.1)
+    stats.add_gap(-0.5)
+    assert stats.dead_time == pytest.approx(0.1)
+    assert stats.max_gap == pytest.approx(0.1)
+    assert stats.last_gap == 0.0
+    assert stats.mean_gap == pytest.approx(0.05)
+    assert stats.duty_cycle == pytest.approx(0.9)
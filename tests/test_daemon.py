@@ -0,0 +1,165 @@
+import os
+import socket
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+from as7421.daemon import FrameServer, FrameSubscriber, send_command
+
+
+@pytest.fixture
+def socket_path(tmp_path):
+    return str(tmp_path / "control.sock")
+
+
+def wait_for(subscriber, frames, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while subscriber.published < frames:
+        assert time.monotonic() < deadline, "server did not publish in time"
+        time.sleep(0.01)
+
+
+def test_subscribers_share_frames(configured):
+    with FrameServer(configured, capacity=64) as server:
+        first = FrameSubscriber(server.name)
+        second = FrameSubscriber(server.name)
+        wait_for(first, 4)
+        a = first.read(timeout=1.0)
+        b = second.read(timeout=1.0)
+        count = min(len(a), len(b))
+        assert count >= 4
+        np.testing.assert_array_equal(a[:count], b[:count])
+        assert np.all(np.diff(a["timestamp"]) > 0)
+        assert np.all(a["channels"] > 0)
+        assert first.overruns == second.overruns == 0
+        first.close()
+        second.close()
+    assert server.stats.frames >= 4
+
+
+def test_from_oldest_and_overruns(configured):
+    with FrameServer(configured, capacity=4) as server:
+        late = FrameSubscriber(server.name)
+        wait_for(late, 9)
+        frames = late.read()
+        # The first frames were overwritten before they were read
+        assert late.overruns >= 4
+        assert 0 < len(frames) <= 4
+        oldest = FrameSubscriber(server.name, from_oldest=True)
+        shared = oldest.acquire()
+        assert 0 < len(shared) <= 4
+        assert shared.first >= server.published - 4
+        assert oldest.valid(shared)
+        # Once the server laps the view it is no longer valid
+        wait_for(oldest, shared.first + 5)
+        assert not oldest.valid(shared)
+        del shared
+        late.close()
+        oldest.close()
+
+
+def test_control(configured, socket_path):
+    with FrameServer(configured, capacity=64, socket_path=socket_path) as server:
+        subscriber = FrameSubscriber(server.name)
+        status = send_command(socket_path, "status")
+        assert status["name"] == server.name
+        assert status["running"]
+        assert status["config"] == 0
+
+        reply = send_command(socket_path, "set", num_measurements=3, led=False)
+        assert reply == {"config": 1}
+        assert subscriber.config == 1
+        assert send_command(socket_path, "status")["settings"] == (
+            configured.config_snapshot()
+        )
+        assert configured.num_measurements == 3
+        assert not server.with_led
+
+        with pytest.raises(RuntimeError, match="Unknown command"):
+            send_command(socket_path, "reboot")
+        with pytest.raises(RuntimeError, match="Unknown settings"):
+            send_command(socket_path, "set", colour="red")
+
+        # Frames taken after the change carry the new configuration
+        for _ in range(100):
+            frames = subscriber.read(timeout=1.0)
+            if len(frames) and frames["config"][-1] == 1:
+                break
+        else:
+            pytest.fail("no frame with the new configuration")
+        subscriber.close()
+
+        send_command(socket_path, "stop")
+        assert server.wait(5.0)
+        assert not send_command(socket_path, "status")["running"]
+    assert not os.path.exists(socket_path)
+
+
+def test_invalid_settings_change_nothing(configured):
+    with FrameServer(configured, capacity=64) as server:
+        integration = configured.integration_time_us
+        for request in (
+            {"integration_time_us": 20_000, "wait_time_us": "soon"},
+            {"integration_time_us": 20_000, "num_measurements": 300},
+            {"integration_time_us": 20_000, "gain": [1, 2]},
+        ):
+            future = server.submit({"command": "set", **request})
+            with pytest.raises(ValueError):
+                future.result(1.0)
+        assert server.config_id == 0
+        assert configured.integration_time_us == integration
+
+
+def test_no_request_is_left_pending(configured):
+    server = FrameServer(configured, capacity=64)
+    server.start()
+    futures = [server.submit({"command": "set", "led": True}) for _ in range(20)]
+    futures.append(server.submit({"command": "stop"}))
+    futures += [server.submit({"command": "set", "led": True}) for _ in range(20)]
+    assert server.wait(5.0)
+    late = server.submit({"command": "set", "led": True})
+    server.close()
+    for future in futures + [late]:
+        # Every request is answered, either run or failed
+        assert future.done()
+    with pytest.raises(RuntimeError, match="not running"):
+        late.result()
+
+
+def test_stale_socket(configured, socket_path):
+    # Left behind by a server that died without cleaning up
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(socket_path)
+    stale.close()
+    assert os.path.exists(socket_path)
+    with FrameServer(configured, socket_path=socket_path) as server:
+        assert send_command(socket_path, "status")["name"] == server.name
+        # A second server must not take over the live socket
+        other = FrameServer(configured, socket_path=socket_path)
+        with pytest.raises(OSError):
+            other.start()
+        other.close()
+        assert send_command(socket_path, "status")["name"] == server.name
+
+
+def test_close_cleans_up(configured, socket_path):
+    server = FrameServer(configured, socket_path=socket_path)
+    server.start()
+    name = server.name
+    # Removed by someone else, the ring must still be unlinked
+    os.unlink(socket_path)
+    server.close()
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name)
+
+
+def test_rejects_foreign_memory():
+    shm = shared_memory.SharedMemory(create=True, size=1024)
+    try:
+        with pytest.raises(ValueError):
+            FrameSubscriber(shm.name)
+    finally:
+        shm.close()
+        shm.unlink()
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from tests.conftest import INTEGRATION_US
+
+
+def led_counts(bus):
+    """Noise free LED contribution per channel, as the emulator computes it."""
+    scale = 1.5 if bus.regs[0x68] & 0b111 else 1.0
+    itime_ms = INTEGRATION_US / 1e3
+    return np.array(
+        [
+            int(bus.led_response[ch] * scale * itime_ms * 2.0 ** (bus._gain(ch) - 6))
+            for ch in range(64)
+        ]
+    )
+
+
+def test_pairs(configured, bus):
+    frames = configured.differential_measurement(4)
+    assert len(frames) == 4
+    assert frames.difference.shape == (4, 64)
+    assert frames.temperatures.shape == (4, 4)
+    assert frames.restarts == 0
+    assert bus.frames == 8
+    assert np.all(np.diff(frames.timestamps) > 0)
+    # Ambient cancels, leaving the LED response (within integer truncation)
+    expected = led_counts(bus)
+    np.testing.assert_allclose(frames.difference, np.tile(expected, (4, 1)), atol=1)
+    assert np.all(frames.difference > 0)
+
+
+def test_one_sequence(configured, bus):
+    configured.differential_measurement(3)
+    # The whole run is started once and stopped once, not per pair
+    assert bus.register_writes[0x60] <= 3
+    assert not bus._running
+
+
+@pytest.mark.parametrize("pairs", [0, 128])
+def test_pairs_range(configured, pairs):
+    with pytest.raises(ValueError):
+        configured.differential_measurement(pairs)
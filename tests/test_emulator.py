@@ -0,0 +1,72 @@
+from as7421 import AS7421
+from as7421.emulator import EmulatedSMBus, benchmark
+
+# A frame is one read from TEMP to the end of channel bank D, split into
+# SMBus blocks of at most 32 bytes
+READOUT_BLOCKS = -(-(0x100 - 0x78) // 32)
+# Readout plus a few STATUS_7 polls per frame
+MAX_TRANSACTIONS_PER_FRAME = READOUT_BLOCKS + 3
+
+
+def test_identify(sensor):
+    assert sensor.identify() == (0x21, 0x01)
+
+
+def test_reset_clears_registers(bus):
+    bus.write_byte_data(bus.address, 0x67, 0x05)
+    AS7421(bus)
+    assert bus.read_byte_data(bus.address, 0x67) == 0
+
+
+def test_setup_regs_transactions(sensor, bus):
+    sensor.setup_regs()
+    assert bus.writes == 8
+    assert bus.transactions <= 10
+    bus.reset_stats()
+    sensor.setup_regs()
+    assert bus.transactions == 0
+
+
+def test_write_ram_data_is_one_block(sensor, bus):
+    sensor.select_ram_bank("ASETUP_AB")
+    bus.reset_stats()
+    sensor.write_ram_data(list(range(1, 33)), 0)
+    assert bus.writes == 1
+    assert bus.bytes_written == 32
+    assert bytes(bus.ram[0x10]) == bytes(range(1, 33))
+
+
+def test_do_measurement(configured, bus):
+    frames = list(configured.do_measurement())
+    assert len(frames) == 5
+    assert bus.frames == 5
+    assert bus.register_writes == {0x60: 2}
+    assert bus.transactions <= MAX_TRANSACTIONS_PER_FRAME * len(frames)
+    assert bus.register_reads[0x78] == 5
+    readout = sum(bus.register_reads.get(r, 0) for r in range(0x78, 0x100))
+    assert readout == 5 * READOUT_BLOCKS
+    for timestamp, channels, temperatures in frames:
+        assert len(channels) == 64
+        assert len(temperatures) == 4
+        assert all(channels)
+
+
+def test_led_raises_counts(configured):
+    dark = [sum(c) for _, c, _ in configured.do_measurement(with_led=False)]
+    lit = [sum(c) for _, c, _ in configured.do_measurement(with_led=True)]
+    assert min(lit) > max(dark)
+
+
+def test_benchmark():
+    result = benchmark(num_measurements=5, integration_ms=10, bus_speed=400_000)
+    assert result["frames"] == 5
+    assert result["fps"] > 0
+    assert result["transactions_per_frame"] <= MAX_TRANSACTIONS_PER_FRAME
+
+
+def test_bus_speed_sets_bus_time():
+    slow = EmulatedSMBus(bus_speed=100_000, transaction_overhead=0)
+    fast = EmulatedSMBus(bus_speed=400_000, transaction_overhead=0)
+    for bus in (slow, fast):
+        bus.read_i2c_block_data(bus.address, 0x80, 32)
+    assert slow.bus_time == 4 * fast.bus_time
@@ -0,0 +1,68 @@
+import pytest
+
+from as7421.emulator import EmulatedMuxBus, EmulatedSMBus
+from as7421.manager import SensorManager
+from tests.conftest import INTEGRATION_US, configure
+
+
+def test_sensors_on_separate_buses():
+    manager = SensorManager()
+    manager.add("a", EmulatedSMBus(bus_speed=400_000))
+    manager.add("b", EmulatedSMBus(bus_speed=400_000))
+    manager.configure(configure)
+    frames = list(manager.frames())
+    assert len(frames) == 5
+    assert [f.index for f in frames] == list(range(5))
+    assert all(set(f.frames) == {"a", "b"} for f in frames)
+    assert manager.dropped == {"a": 0, "b": 0}
+
+
+def test_sensors_behind_a_mux():
+    devices = {0: EmulatedSMBus(bus_speed=400_000), 3: EmulatedSMBus(bus_speed=400_000)}
+    bus = EmulatedMuxBus(devices, bus_speed=400_000)
+    manager = SensorManager()
+    manager.add("a", bus, mux_channel=0)
+    manager.add("b", bus, mux_channel=3)
+    manager.configure(configure)
+    frames = list(manager.frames())
+    assert len(frames) == 5
+    assert devices[0].frames == devices[3].frames == 5
+    for frame in frames:
+        assert frame.frames["a"].channels.all()
+        assert frame.frames["b"].channels.all()
+
+
+def test_frames_are_aligned_on_time():
+    manager = SensorManager()
+    fast = manager.add("fast", EmulatedSMBus(bus_speed=400_000))
+    slow = manager.add("slow", EmulatedSMBus(bus_speed=400_000))
+    manager.configure(configure)
+    slow.integration_time_us = 2 * INTEGRATION_US
+    tolerance = fast.frame_period() / 2
+    frames = list(manager.frames())
+    # Every other fast frame lines up with a slow one, the rest are dropped
+    both = [f for f in frames if set(f.frames) == {"fast", "slow"}]
+    assert len(both) >= 2
+    assert all(f.skew <= tolerance for f in both)
+    assert sum("slow" in f.frames for f in frames) == 5
+    assert manager.dropped["slow"] == 0
+    assert manager.dropped["fast"] + sum("fast" in f.frames for f in frames) == 5
+    assert manager.dropped["fast"] >= 2
+
+
+def test_duplicate_name():
+    manager = SensorManager()
+    manager.add("a", EmulatedSMBus())
+    with pytest.raises(ValueError):
+        manager.add("a", EmulatedSMBus())
+
+
+def test_configure_error_is_raised():
+    manager = SensorManager()
+    manager.add("a", EmulatedSMBus())
+
+    def fail(sensor):
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError, match="boom"):
+        manager.configure(fail)
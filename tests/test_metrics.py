@@ -0,0 +1,97 @@
+import pytest
+
+from as7421 import AS7421
+from as7421.metrics import BUCKET_BOUNDS, Histogram, InstrumentedSMBus
+from as7421.transport import SMBusTransport
+from tests.conftest import configure
+
+
+def test_counts_match_bus(configured, bus):
+    metrics = configured.enable_metrics()
+    frames = sum(1 for _ in configured.do_measurement())
+    snapshot = metrics.snapshot()
+    assert snapshot["transactions"] == bus.transactions
+    assert snapshot["frames"] == frames == 5
+    assert snapshot["polls"] >= frames
+    assert snapshot["readout"]["count"] == frames
+    assert snapshot["time_to_ready"]["count"] == frames
+    # Dead time is measured between consecutive frames
+    assert snapshot["dead_time"]["count"] == frames - 1
+    reads = snapshot["transfers"]["read"]
+    assert sum(entry["bytes"] for entry in reads.values()) == bus.bytes_read
+
+
+def test_register_names(configured):
+    metrics = configured.enable_metrics()
+    configured.integration_ticks = configured.integration_ticks + 1
+    assert "LTF_ITIME" in metrics.snapshot()["transfers"]["write"]
+
+
+def test_disable(configured, bus):
+    transport = configured.device._i2c
+    configured.enable_metrics()
+    assert isinstance(transport.bus, InstrumentedSMBus)
+    configured.disable_metrics()
+    assert configured.metrics is None
+    assert configured.device._i2c is transport
+    assert transport.bus is bus
+    # Disabling twice is harmless
+    configured.disable_metrics()
+
+
+class _CustomTransport:
+    """A transport that keeps its bus to itself."""
+
+    combined_reads = False
+
+    def __init__(self, bus):
+        self._transport = SMBusTransport(bus)
+
+    def read_i2c_block_data(self, i2c_addr, register, length, force=None):
+        return self._transport.read_i2c_block_data(i2c_addr, register, length)
+
+    def write_i2c_block_data(self, i2c_addr, register, data, force=None):
+        self._transport.write_i2c_block_data(i2c_addr, register, data)
+
+    def read_byte_data(self, i2c_addr, register, force=None):
+        return self._transport.read_byte_data(i2c_addr, register)
+
+    def write_byte_data(self, i2c_addr, register, value, force=None):
+        self._transport.write_byte_data(i2c_addr, register, value)
+
+    def read_into(self, i2c_addr, register, buffer):
+        self._transport.read_into(i2c_addr, register, buffer)
+
+    def read_blocks(self, i2c_addr, blocks):
+        self._transport.read_blocks(i2c_addr, blocks)
+
+
+def test_custom_transport(bus):
+    transport = _CustomTransport(bus)
+    sensor = AS7421(transport)
+    configure(sensor)
+    bus.reset_stats()
+    metrics = sensor.enable_metrics()
+    assert sum(1 for _ in sensor.do_measurement()) == 5
+    reads = metrics.snapshot()["transfers"]["read"]
+    assert sum(entry["bytes"] for entry in reads.values()) == bus.bytes_read
+    sensor.disable_metrics()
+    assert sensor.device._i2c is transport
+
+
+def test_histogram():
+    histogram = Histogram()
+    assert histogram.quantile(0.5) == 0.0
+    for _ in range(99):
+        histogram.record(3e-6)
+    histogram.record(1e-3)
+    assert histogram.count == 100
+    assert histogram.minimum == 3e-6
+    assert histogram.maximum == 1e-3
+    assert histogram.mean == pytest.approx((99 * 3e-6 + 1e-3) / 100)
+    # Quantiles report the upper bound of their bucket
+    assert histogram.quantile(0.5) == 4e-6
+    assert histogram.quantile(1.0) == 1e-3
+    snapshot = histogram.snapshot()
+    assert snapshot["buckets"] == {4e-6: 99, BUCKET_BOUNDS[10]: 1}
+    assert sum(snapshot["buckets"].values()) == histogram.count
@@ -0,0 +1,116 @@
+import numpy as np
+import pytest
+
+from as7421.calibration import load_calib_file
+from as7421.processing import (
+    SPECTRUM_POINTS,
+    TEMPERATURE_DEGREE,
+    CalibrationEngine,
+    TemperatureCompensator,
+)
+
+
+@pytest.fixture
+def calibration(calibration_file):
+    return load_calib_file(calibration_file)
+
+
+def _reference(calibration, frames, absolute=False):
+    matrix = np.asarray(calibration.dev_cal_matrix, np.float64).reshape(64, -1)
+    black = np.asarray(calibration.dev_black, np.float64).reshape(-1, 64).mean(0)
+    white = np.asarray(calibration.device_white, np.float64).reshape(-1, 64).mean(0)
+    spectra = ((frames - black) / (white - black)) @ matrix
+    if absolute:
+        spectra *= np.asarray(calibration.dev_white_ref, np.float64)
+    return spectra
+
+
+@pytest.mark.parametrize("absolute", [False, True])
+def test_engine_matches_reference(calibration, absolute):
+    frames = np.random.default_rng(0).integers(0, 50_000, (100, 64)).astype(np.uint16)
+    engine = CalibrationEngine.from_calibration(calibration, absolute)
+    spectra = engine.process(frames)
+    assert spectra.shape == (100, SPECTRUM_POINTS)
+    assert spectra.dtype == np.float32
+    np.testing.assert_allclose(
+        spectra, _reference(calibration, frames, absolute), rtol=1e-4, atol=1e-4
+    )
+
+
+def test_single_frame_and_out(calibration):
+    engine = CalibrationEngine.from_calibration(calibration)
+    frames = np.full((3, 64), 1000, dtype=np.uint16)
+    out = np.empty((3, SPECTRUM_POINTS), dtype=np.float32)
+    assert engine.process(frames, out=out) is out
+    np.testing.assert_allclose(engine.process(frames[0]), out[0], rtol=1e-4, atol=1e-6)
+
+
+def test_dead_channels_are_dropped():
+    matrix = np.ones((64, 4))
+    black = np.zeros(64)
+    white = np.full(64, 10.0)
+    white[5] = 0.0
+    engine = CalibrationEngine(matrix, black, white)
+    frame = np.full(64, 10.0)
+    frame[5] = 1e6
+    np.testing.assert_allclose(engine.process(frame), 63.0)
+
+
+def test_from_folded_shares_tables(calibration):
+    engine = CalibrationEngine.from_calibration(calibration)
+    folded = CalibrationEngine.from_folded(engine.gain, engine.offset)
+    assert folded.gain is engine.gain
+    frames = np.arange(64 * 2, dtype=np.uint16).reshape(2, 64)
+    np.testing.assert_array_equal(folded.process(frames), engine.process(frames))
+
+
+def _compensator(calibration, **kwargs):
+    kwargs.setdefault("scale", 0.01)
+    kwargs.setdefault("offset", -5.0)
+    kwargs.setdefault("reference", 25.0)
+    return TemperatureCompensator.from_calibration(calibration, **kwargs)
+
+
+def test_compensation_needs_explicit_conversion(calibration):
+    with pytest.raises(TypeError):
+        TemperatureCompensator.from_calibration(calibration)
+
+
+def test_compensation_factors(calibration):
+    compensator = _compensator(calibration, bin_width=1e-6)
+    poly = np.asarray(calibration.dev_temp_coeff_poly, np.float64).reshape(64, 36)
+    poly = poly[:, : TEMPERATURE_DEGREE + 1]
+    raw = np.array([[3000, 3100, 3200, 3300], [2500, 2500, 2500, 2500]])
+    factors = compensator.factors(raw)
+    degrees = raw * 0.01 - 5.0
+    powers = np.arange(TEMPERATURE_DEGREE + 1)
+    for frame in range(2):
+        for channel in (0, 17, 40, 63):
+            temperature = degrees[frame, channel // 16]
+            expected = (poly[channel] * 25.0**powers).sum() / (
+                poly[channel] * temperature**powers
+            ).sum()
+            assert factors[frame, channel] == pytest.approx(expected, rel=1e-5)
+
+
+def test_compensation_at_reference_is_identity(calibration):
+    compensator = _compensator(calibration)
+    raw = np.full((2, 4), 3000)
+    np.testing.assert_allclose(compensator.factors(raw), 1.0, rtol=1e-6)
+    frames = np.full((2, 64), 1000, dtype=np.uint16)
+    np.testing.assert_allclose(compensator.apply(frames, raw), 1000, rtol=1e-5)
+
+
+def test_compensation_bins_are_cached(calibration):
+    compensator = _compensator(calibration)
+    compensator.factors(np.full((10, 4), 3000))
+    assert len(compensator._cache) == 1
+    assert compensator.factors(np.empty((0, 4))).shape == (0, 64)
+
+
+def test_compensation_degree(calibration):
+    assert _compensator(calibration).coefficients.shape == (64, TEMPERATURE_DEGREE + 1)
+    assert _compensator(calibration, degree=35).coefficients.shape == (64, 36)
+    assert _compensator(calibration, degree=1).coefficients.shape == (64, 2)
+    with pytest.raises(ValueError):
+        _compensator(calibration, degree=36)
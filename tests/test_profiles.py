@@ -0,0 +1,85 @@
+import json
+
+import pytest
+
+from as7421.profiles import PROFILE_BANKS, Profile, apply_profile
+
+
+def slow(sensor):
+    sensor.integration_time_us = 20_000
+    sensor.num_measurements = 7
+    sensor.configure_gain(9)
+
+
+def fast(sensor):
+    sensor.integration_time_us = 1_000
+
+
+@pytest.fixture
+def profiles():
+    base = Profile.build("slow", slow)
+    return base, Profile.build("fast", fast, base=base)
+
+
+def test_build(profiles):
+    base, derived = profiles
+    assert set(base.ram) == set(PROFILE_BANKS)
+    assert base.registers["LTF_ICOUNT"] == 7
+    # Built on top of the base profile, only the integration time differs
+    assert derived.registers["LTF_ITIME"] != base.registers["LTF_ITIME"]
+    assert {k: v for k, v in derived.registers.items() if k != "LTF_ITIME"} == {
+        k: v for k, v in base.registers.items() if k != "LTF_ITIME"
+    }
+    assert derived.ram == base.ram
+
+
+def test_apply_matches_device(sensor, bus, profiles):
+    base, derived = profiles
+    sensor.setup_regs()
+    assert apply_profile(sensor, base) > 0
+    assert sensor.integration_time_us == 20_000
+    assert sensor.num_measurements == 7
+    assert bus.ram[16] == bytearray([9] * 32)
+    assert Profile.capture(sensor, "back").registers == base.registers
+
+    # The same profile again is already on the device
+    bus.reset_stats()
+    assert apply_profile(sensor, base) == 0
+    assert bus.writes == 0
+
+    # Switching only touches what differs
+    compiled = derived.compile()
+    assert compiled.apply(sensor) == 1
+    assert sensor.integration_time_us == 1_000
+    assert compiled.apply(sensor) == 0
+
+
+def test_capture_from_shadow(configured, profiles):
+    base, _ = profiles
+    apply_profile(configured, base)
+    from_shadow = Profile.capture(configured, "shadow", from_device=False)
+    from_device = Profile.capture(configured, "device")
+    assert from_shadow.registers == from_device.registers
+    assert from_shadow.led_mult == from_device.led_mult
+    assert from_shadow.ram == from_device.ram
+
+
+def test_capture_unknown(sensor):
+    with pytest.raises(ValueError, match="Not known"):
+        Profile.capture(sensor, "empty", from_device=False)
+
+
+def test_dict_round_trip(profiles):
+    base, _ = profiles
+    restored = Profile.from_dict(json.loads(json.dumps(base.to_dict())))
+    assert restored == base
+
+
+def test_validation(profiles):
+    base, _ = profiles
+    registers = dict(base.registers)
+    del registers["CFG_AZ"]
+    with pytest.raises(ValueError, match="CFG_AZ"):
+        Profile("broken", registers, base.led_mult)
+    with pytest.raises(ValueError, match="RAM"):
+        Profile("broken", base.registers, base.led_mult, {"SMUX_A": (0,) * 3})
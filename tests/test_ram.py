@@ -0,0 +1,53 @@
+import pytest
+
+from as7421.as7421 import RAM_MERGE_GAP, RAM_SIZE, SMUX_BANKS
+
+
+def test_unchanged_bytes_are_skipped(sensor, bus):
+    sensor.write_ram_bank("ASETUP_AB", [6] * RAM_SIZE)
+    bus.reset_stats()
+    sensor.write_ram_bank("ASETUP_AB", [6] * RAM_SIZE)
+    assert bus.transactions == 0
+
+
+def test_changed_runs_are_merged(sensor, bus):
+    sensor.write_ram_bank("ASETUP_AB", [6] * RAM_SIZE)
+    image = [6] * RAM_SIZE
+    # Close together: one block; far apart: a second block
+    image[2] = image[2 + RAM_MERGE_GAP + 1] = 7
+    image[30] = 7
+    bus.reset_stats()
+    sensor.write_ram_bank("ASETUP_AB", image)
+    assert bus.writes == 2
+    assert list(bus.ram[0x10]) == image
+
+
+def test_bank_selection_is_cached(sensor, bus):
+    sensor.select_ram_bank("SMUX_A")
+    bus.reset_stats()
+    sensor.select_ram_bank("SMUX_A")
+    assert bus.transactions == 0
+    sensor.select_ram_bank("SMUX_B")
+    assert bus.writes == 1
+
+
+def test_out_of_range(sensor):
+    sensor.select_ram_bank("SMUX_A")
+    with pytest.raises(ValueError):
+        sensor.write_ram_data([0] * 4, RAM_SIZE - 2)
+
+
+def test_configure_smux_uploads_each_bank_once(sensor, bus):
+    sensor.configure_smux()
+    # One bank select and one block per bank
+    assert bus.writes == 2 * len(SMUX_BANKS)
+    assert bus.ram[12][:8] == bytes([0x21] * 4 + [0x43] * 4)
+    assert bus.ram[15][24:32] == bytes([0x21] * 4 + [0x43] * 4)
+
+
+def test_gains(sensor):
+    gains = list(range(64))
+    sensor.configure_gain([g % 12 for g in gains])
+    assert sensor.gains == [g % 12 for g in gains]
+    with pytest.raises(ValueError):
+        sensor.configure_gain([1, 2])
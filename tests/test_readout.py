@@ -0,0 +1,32 @@
+import numpy as np
+
+from as7421.as7421 import NUM_CHANNELS
+
+
+def test_read_frame_matches_registers(configured, bus):
+    list(configured.do_measurement())
+    channels, temperatures = configured.read_frame()
+    expected = np.frombuffer(bytes(bus.regs[0x80:0x100]), "<u2")
+    assert channels.dtype == np.uint16
+    np.testing.assert_array_equal(channels, expected)
+    assert temperatures.tolist() == [bus.temperature + idx for idx in range(4)]
+
+
+def test_read_frame_into_buffers(configured):
+    list(configured.do_measurement())
+    channels = np.zeros(NUM_CHANNELS, dtype=np.uint16)
+    temperatures = np.zeros(4, dtype=np.uint16)
+    result = configured.read_frame(channels, temperatures)
+    assert result[0] is channels and result[1] is temperatures
+    assert channels.all()
+
+
+def test_read_frame_stops_after_enabled_banks(configured, bus):
+    configured.enable_channels("AB")
+    list(configured.do_measurement())
+    bus.reset_stats()
+    channels, _ = configured.read_frame()
+    # TEMP, the gap up to 0x80 and two 32 byte banks
+    assert bus.bytes_read == 0x80 - 0x78 + 64
+    assert channels[:32].all()
+    assert not channels[32:].any()
@@ -0,0 +1,108 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+from as7421.recorder import FrameReader, FrameRecorder
+
+
+def _record(path, frames, start=0, chunk_frames=4, config=None):
+    with FrameRecorder(path, chunk_frames=chunk_frames) as recorder:
+        for idx in range(start, start + frames):
+            recorder.record(float(idx), [idx] * 64, [idx] * 4, idx & 0xFF, config)
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "rec.bin")
+    _record(path, 10)
+    with FrameReader(path) as reader:
+        assert len(reader) == 10
+        assert len(reader.index) == 3
+        records = reader.read()
+        assert records["timestamp"].tolist() == list(range(10))
+        np.testing.assert_array_equal(records["channels"][:, 0], np.arange(10))
+        timestamp, channels, temperatures = next(reader.frames())
+        assert (timestamp, channels[0], temperatures) == (0.0, 0, [0] * 4)
+        assert reader[3:7]["timestamp"].tolist() == [3, 4, 5, 6]
+
+
+def test_records_outlive_close(tmp_path):
+    path = str(tmp_path / "rec.bin")
+    _record(path, 6)
+    with FrameReader(path) as reader:
+        records = next(reader.chunks())
+    assert records["timestamp"].tolist() == [0, 1, 2, 3]
+    reader.close()
+
+
+def test_time_range(tmp_path):
+    path = str(tmp_path / "rec.bin")
+    _record(path, 20)
+    with FrameReader(path) as reader:
+        assert reader.read(5.0, 9.0)["timestamp"].tolist() == [5, 6, 7, 8, 9]
+        assert len(reader.read(100.0)) == 0
+
+
+def test_configs(tmp_path):
+    path = str(tmp_path / "rec.bin")
+    with FrameRecorder(path) as recorder:
+        recorder.record(0.0, [0] * 64, [0] * 4, config={"itime": 1})
+        recorder.record(1.0, [0] * 64, [0] * 4, config={"itime": 1})
+        recorder.record(2.0, [0] * 64, [0] * 4, config={"itime": 2})
+    _record(path, 1, config={"itime": 3})
+    with FrameReader(path) as reader:
+        assert reader.configs == {0: {"itime": 1}, 1: {"itime": 2}, 2: {"itime": 3}}
+        assert reader.read()["config"].tolist() == [0, 0, 1, 2]
+
+
+def test_append(tmp_path):
+    path = str(tmp_path / "rec.bin")
+    _record(path, 6)
+    _record(path, 6, start=6)
+    with FrameReader(path) as reader:
+        assert reader.read()["timestamp"].tolist() == list(range(12))
+
+
+def test_append_records_its_clock_offset(tmp_path, monkeypatch):
+    path = str(tmp_path / "rec.bin")
+    _record(path, 4)
+    wall_clock = time.time
+    monkeypatch.setattr(time, "time", lambda: wall_clock() + 1000.0)
+    _record(path, 4, start=4)
+    with FrameReader(path) as reader:
+        first, second = reader.index["clock_offset"].tolist()
+    assert first == reader.clock_offset
+    assert second - first == pytest.approx(1000.0, abs=1.0)
+
+
+def test_append_after_truncated_chunk(tmp_path):
+    path = str(tmp_path / "rec.bin")
+    _record(path, 8)
+    os.truncate(path, os.path.getsize(path) - 10)
+    _record(path, 8, start=8)
+    with FrameReader(path) as reader:
+        assert len(reader) == 12
+        records = reader.read()
+    assert records["timestamp"].tolist() == list(range(4)) + list(range(8, 16))
+    np.testing.assert_array_equal(records["channels"][:, 63], records["timestamp"])
+
+
+def test_not_a_recording(tmp_path):
+    path = tmp_path / "other.bin"
+    path.write_bytes(b"x" * 64)
+    with pytest.raises(ValueError):
+        FrameReader(str(path))
+    with pytest.raises(ValueError):
+        FrameRecorder(str(path))
+
+
+def test_tee_records_sensor_frames(configured, tmp_path):
+    path = str(tmp_path / "rec.bin")
+    with FrameRecorder(path) as recorder:
+        frames = list(recorder.tee(configured.do_measurement(), configured))
+    with FrameReader(path) as reader:
+        records = reader.read()
+        assert len(reader.configs) == 1
+    assert records["timestamp"].tolist() == [frame[0] for frame in frames]
+    assert records["channels"].tolist() == [frame[1] for frame in frames]
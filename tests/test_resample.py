@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from as7421.calibration import load_calib_file
+from as7421.processing import (
+    ESTIMATED_WAVELENGTHS,
+    SpectralResampler,
+    WavelengthIndex,
+)
+
+
+def reference(index, frame, grid):
+    merged = [frame[index.channel_wavelengths == w].mean() for w in index.wavelengths]
+    return np.interp(grid, index.wavelengths, merged)
+
+
+def test_index():
+    wavelengths = np.linspace(400, 1000, 64)[::-1].copy()
+    wavelengths[10] = wavelengths[11]
+    index = WavelengthIndex(wavelengths)
+    assert len(index.wavelengths) == 63
+    assert index.counts.max() == 2
+    np.testing.assert_array_equal(
+        index.channel_wavelengths[index.order], np.sort(wavelengths)
+    )
+    frame = np.arange(64)
+    np.testing.assert_array_equal(index.reorder(frame), index.order)
+    np.testing.assert_allclose(index.merge_matrix().sum(0), 1.0)
+    with pytest.raises(ValueError):
+        WavelengthIndex(wavelengths[:10])
+
+
+@pytest.mark.parametrize("grid", [None, np.linspace(300, 1100, 57)])
+def test_matches_interp(grid):
+    resampler = SpectralResampler(grid=grid)
+    frames = np.random.default_rng(0).uniform(0, 50_000, (20, 64))
+    spectra = resampler.process(frames)
+    assert spectra.shape == (20, len(resampler.grid))
+    expected = np.array([reference(resampler.index, f, resampler.grid) for f in frames])
+    np.testing.assert_allclose(spectra, expected, rtol=1e-4, atol=1e-2)
+    np.testing.assert_allclose(resampler.process(frames[0]), spectra[0], rtol=1e-5)
+
+
+def test_uniform_grid():
+    index = WavelengthIndex.from_estimates()
+    grid = index.uniform_grid(5.0)
+    assert grid[0] == index.wavelengths[0]
+    assert grid[-1] <= index.wavelengths[-1]
+    np.testing.assert_allclose(np.diff(grid), 5.0)
+
+
+def test_from_calibration(calibration_file):
+    calibration = load_calib_file(calibration_file)
+    order = np.asarray(calibration.sensor_channel_order)
+    index = WavelengthIndex.from_calibration(calibration)
+    # The listed channels come out shortest wavelength first
+    np.testing.assert_array_equal(
+        index.channel_wavelengths[order], np.sort(ESTIMATED_WAVELENGTHS)
+    )
+
+
+def test_from_calibration_rejects_invalid_order(calibration_file):
+    calibration = load_calib_file(calibration_file)
+    calibration.sensor_channel_order = [0] * 64
+    with pytest.raises(ValueError, match="permutation"):
+        WavelengthIndex.from_calibration(calibration)
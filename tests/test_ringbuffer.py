@@ -0,0 +1,86 @@
+import errno
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from as7421.ringbuffer import FrameRingBuffer, RingAcquisition
+
+
+def _write(buffer, value):
+    channels, temperatures = buffer.write_slot()
+    channels[:] = value
+    temperatures[:] = value
+    buffer.commit(float(value), 0)
+
+
+def test_batches_wrap_contiguously():
+    buffer = FrameRingBuffer(8, max_batch=4)
+    for value in range(6):
+        _write(buffer, value)
+    assert buffer.acquire(4).timestamps.tolist() == [0, 1, 2, 3]
+    for value in range(6, 10):
+        _write(buffer, value)
+    batch = buffer.acquire(4)
+    assert batch.timestamps.tolist() == [4, 5, 6, 7]
+    batch = buffer.acquire(2)
+    assert batch.timestamps.tolist() == [8, 9]
+    np.testing.assert_array_equal(batch.channels[:, 0], [8, 9])
+
+
+def test_overruns_drop_oldest():
+    buffer = FrameRingBuffer(4)
+    for value in range(7):
+        _write(buffer, value)
+    assert buffer.overruns == 3
+    assert buffer.acquire(4).timestamps.tolist() == [3, 4, 5, 6]
+
+
+def test_full_buffer_never_hands_out_the_slot_being_written():
+    buffer = FrameRingBuffer(4)
+    for value in range(4):
+        _write(buffer, value)
+    channels, _ = buffer.write_slot()
+    assert buffer.overruns == 1
+    channels[:] = 99
+    batch = buffer.acquire(3)
+    assert batch.timestamps.tolist() == [1, 2, 3]
+    assert not (batch.channels == 99).any()
+    buffer.commit(4.0, 0)
+    assert buffer.acquire(1).timestamps.tolist() == [4]
+
+
+def test_acquire_timeout_returns_short_batch():
+    buffer = FrameRingBuffer(4)
+    _write(buffer, 1)
+    assert len(buffer.acquire(3, timeout=0.01)) == 1
+
+
+def test_acquire_wakes_on_writer_error():
+    buffer = FrameRingBuffer(4)
+    error = OSError(errno.EREMOTEIO, "Remote I/O error")
+    threading.Timer(0.05, buffer.fail, (error,)).start()
+    start = time.perf_counter()
+    with pytest.raises(OSError):
+        buffer.acquire(2)
+    assert time.perf_counter() - start < 1.0
+
+
+def test_ring_acquisition(configured):
+    with RingAcquisition(configured, capacity=16) as ring:
+        batch = ring.acquire(8, timeout=5)
+    assert len(batch) == 8
+    assert batch.channels.all()
+    assert ring.buffer.written >= 8
+
+
+def test_ring_acquisition_reports_bus_failure(configured, bus):
+    with RingAcquisition(configured, capacity=16) as ring:
+        assert len(ring.acquire(2, timeout=5)) == 2
+        # The device drops off the bus while a reader is waiting
+        bus.address = 0x00
+        start = time.perf_counter()
+        with pytest.raises(OSError):
+            ring.acquire(16, timeout=5)
+        assert time.perf_counter() - start < 1.0
@@ -0,0 +1,65 @@
+import pytest
+
+
+def test_cached_reads(sensor, bus):
+    sensor.device.get("CFG_LTF")
+    bus.reset_stats()
+    sensor.device.get("CFG_LTF")
+    assert bus.transactions == 0
+
+
+def test_volatile_registers_always_read(sensor, bus):
+    sensor.device.get("STATUS_7")
+    bus.reset_stats()
+    sensor.device.get("STATUS_7")
+    assert bus.reads == 1
+
+
+def test_redundant_writes_are_skipped(sensor, bus):
+    sensor.device.set("CFG_LTF", LTF_CYCLE="AB")
+    bus.reset_stats()
+    sensor.device.set("CFG_LTF", LTF_CYCLE="AB")
+    assert bus.transactions == 0
+
+
+def test_full_register_set_skips_read(sensor, bus):
+    sensor.device.invalidate()
+    bus.reset_stats()
+    sensor.num_measurements = 7
+    assert bus.reads == 0
+    assert bus.writes == 1
+    assert bus.regs[0x69] == 7
+
+
+def test_deferred_writes_each_register_once(sensor, bus):
+    sensor.device.get("CFG_MISC")
+    bus.reset_stats()
+    with sensor.device.deferred():
+        sensor.device.set("CFG_MISC", LED_WAIT_OFF=1)
+        sensor.device.set("CFG_MISC", WAIT_CYCLE_ON=1)
+        assert bus.writes == 0
+    assert bus.writes == 1
+    assert sensor.device.get("CFG_MISC").WAIT_CYCLE_ON == 1
+
+
+def test_deferred_discards_on_error(sensor, bus):
+    with pytest.raises(RuntimeError):
+        with sensor.device.deferred():
+            sensor.device.set("LTF_ICOUNT", ICOUNT=9)
+            raise RuntimeError
+    assert bus.regs[0x69] == 0
+    assert sensor.num_measurements == 0
+
+
+def test_invalidate_rereads(sensor, bus):
+    sensor.num_measurements = 3
+    bus.regs[0x69] = 4
+    assert sensor.num_measurements == 3
+    sensor.device.invalidate("LTF_ICOUNT")
+    assert sensor.num_measurements == 4
+
+
+def test_reset_invalidates_shadow(sensor, bus):
+    sensor.num_measurements = 3
+    sensor.reset()
+    assert sensor.device._cached == set()
@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+
+from as7421.stats import RunningStats, StreamStatistics
+
+
+def data(n=200, seed=0):
+    rng = np.random.default_rng(seed)
+    timestamps = np.arange(n) * 0.01
+    channels = rng.normal(1000, 10, (n, 64))
+    temperatures = rng.normal(3000, 2, (n, 4))
+    return timestamps, channels, temperatures
+
+
+def ema(values, alpha):
+    result = values[0].copy()
+    for value in values[1:]:
+        result += alpha * (value - result)
+    return result
+
+
+@pytest.mark.parametrize("batch", [False, True])
+def test_running_stats(batch):
+    _, values, _ = data()
+    stats = RunningStats(64, ema_alpha=0.1)
+    if batch:
+        # Uneven batches, including an empty one, merge to the same result
+        for part in np.split(values, [1, 1, 30, 120]):
+            stats.update_batch(part)
+    else:
+        for value in values:
+            stats.update(value)
+    assert stats.count == len(values)
+    np.testing.assert_allclose(stats.mean, values.mean(0))
+    np.testing.assert_allclose(stats.variance, values.var(0, ddof=1))
+    np.testing.assert_array_equal(stats.minimum, values.min(0))
+    np.testing.assert_array_equal(stats.maximum, values.max(0))
+    np.testing.assert_allclose(stats.ema, ema(values, 0.1))
+
+
+def test_reset_keeps_ema():
+    stats = RunningStats(2)
+    stats.update([1.0, 2.0])
+    assert np.isnan(stats.variance).all()
+    stats.reset()
+    assert stats.count == 0
+    np.testing.assert_array_equal(stats.ema, [1.0, 2.0])
+
+
+def test_window_frames():
+    timestamps, channels, temperatures = data(25)
+    windows = []
+    stream = StreamStatistics(window_frames=10, on_window=windows.append)
+    stream.update_batch(timestamps[:15], channels[:15], temperatures[:15])
+    for frame in zip(timestamps[15:], channels[15:], temperatures[15:]):
+        stream.update(*frame)
+    assert [w.count for w in windows] == [10, 10]
+    assert stream.last_window is windows[-1]
+    assert stream.total_frames == 25
+    assert stream.snapshot().count == 5
+    np.testing.assert_allclose(windows[1].channel_mean, channels[10:20].mean(0))
+    assert windows[1].start == timestamps[10]
+    assert windows[1].end == timestamps[19]
+
+
+def test_window_seconds():
+    timestamps, channels, temperatures = data(100)
+    windows = []
+    stream = StreamStatistics(window_seconds=0.25, on_window=windows.append)
+    stream.update_batch(timestamps, channels, temperatures)
+    assert [w.count for w in windows] == [25, 25, 25]
+    assert stream.snapshot().count == 25
+    np.testing.assert_allclose(windows[0].temperature_mean, temperatures[:25].mean(0))
+
+
+def test_outliers():
+    timestamps, channels, temperatures = data(50)
+    stream = StreamStatistics(outlier_sigma=5.0, min_count=10)
+    spike = channels[5].copy()
+    spike[3] = 5000
+    # Too early to flag
+    assert not stream.update(0.0, spike, temperatures[0]).any()
+    stream.update_batch(timestamps[1:40], channels[1:40], temperatures[1:40])
+    flagged = stream.update(0.5, spike, temperatures[0])
+    assert flagged.nonzero()[0].tolist() == [3]
+    assert stream.outliers[3] == 1
+    assert stream.outliers.sum() == 1
+
+
+def test_tee(configured):
+    stream = StreamStatistics()
+    frames = list(stream.tee(configured.do_measurement()))
+    snapshot = stream.snapshot()
+    assert snapshot.count == len(frames) == 5
+    np.testing.assert_allclose(
+        snapshot.channel_mean, np.mean([channels for _, channels, _ in frames], 0)
+    )
+    assert snapshot.as_dict()["count"] == 5
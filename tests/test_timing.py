@@ -0,0 +1,61 @@
+import time
+
+import pytest
+
+from tests.conftest import INTEGRATION_US, WAIT_US
+
+
+def test_frame_period_matches_device(configured, bus):
+    assert configured.frame_period() == pytest.approx(bus.frame_period())
+    configured.enable_channels("A")
+    assert configured.frame_period() == pytest.approx(bus.frame_period())
+
+
+def test_few_polls_per_frame(configured, bus):
+    frames = list(configured.do_measurement())
+    assert len(frames) == 5
+    # The wait sleeps until the frame is due instead of spinning on STATUS_7
+    assert bus.register_reads[0x77] <= 3 * len(frames)
+
+
+def test_frames_arrive_at_the_frame_period(configured):
+    configured.num_measurements = 6
+    timestamps = [frame[0] for frame in configured.do_measurement()]
+    gaps = [b - a for a, b in zip(timestamps, timestamps[1:])]
+    # Four integration cycles and one wait per frame
+    period = (4 * INTEGRATION_US + WAIT_US) / 1e6
+    assert sum(gaps) / len(gaps) == pytest.approx(period, rel=0.1)
+
+
+def test_wait_for_data_timeout(configured):
+    configured.integration_time_us = 200_000
+    configured.start_measurement()
+    start = time.perf_counter()
+    assert configured.wait_for_data(timeout=0.05) is None
+    assert time.perf_counter() - start < 0.5
+    configured.stop_measurement()
+
+
+def test_wait_for_data_after_sequence_end(configured):
+    configured.num_measurements = 1
+    configured.start_measurement()
+    assert configured.wait_for_data() is not None
+    configured.read_frame()
+    assert configured.wait_for_data() is None
+    configured.stop_measurement()
+
+
+def test_wait_for_data_backoff_stops_at_the_timeout(configured):
+    configured.integration_time_us = 200_000
+    configured.start_measurement()
+    # Pretend the frame is overdue so the whole timeout is spent polling
+    configured._next_frame_due = time.perf_counter()
+    timeout = 0.0205
+    deadline = time.perf_counter() + timeout
+    steps = configured._wait_steps(timeout)
+    try:
+        for delay in steps:
+            assert delay <= deadline - time.perf_counter() + 1e-4
+            time.sleep(delay)
+    finally:
+        configured.stop_measurement()
@@ -0,0 +1,39 @@
+import subprocess
+import sys
+
+import pytest
+
+
+def test_integer_round_trip(sensor, bus):
+    sensor.integration_time_us = 12_345
+    assert sensor.integration_ticks == 12_344
+    assert sensor.integration_time_us == 12_345
+    assert int.from_bytes(bus.regs[0x61:0x64], "little") == 12_344
+    sensor.wait_time_us = 2_000
+    assert sensor.wait_ticks == 1_999
+    assert sensor.wait_time_us == 2_000
+
+
+def test_seconds_setter(sensor):
+    sensor.integration_time = 0.005
+    assert sensor.integration_time_us == 5_000
+
+
+def test_quantity_round_trip(sensor):
+    u = pytest.importorskip("astropy.units")
+    sensor.integration_time = 20 << u.ms
+    assert sensor.integration_time_us == 20_000
+    assert sensor.integration_time.to_value(u.ms) == pytest.approx(20.0)
+
+
+def test_astropy_not_imported():
+    code = (
+        "import sys\n"
+        "from as7421 import AS7421\n"
+        "from as7421.emulator import EmulatedSMBus\n"
+        "sensor = AS7421(EmulatedSMBus(bus_speed=None), reset=False)\n"
+        "sensor.integration_time_us = 1000\n"
+        "sensor.wait_time_us = 1000\n"
+        "assert 'astropy' not in sys.modules\n"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
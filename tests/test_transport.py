@@ -0,0 +1,61 @@
+import numpy as np
+
+from as7421 import AS7421
+from as7421.emulator import EmulatedSMBus
+from as7421.transport import I2CRdwrTransport, SMBusTransport
+from tests.conftest import configure
+
+
+def run(transport_bus, bus):
+    sensor = AS7421(transport_bus)
+    configure(sensor)
+    bus.reset_stats()
+    frames = list(sensor.do_measurement())
+    return frames, bus.transactions
+
+
+def test_same_frames_fewer_transactions():
+    smbus = EmulatedSMBus(bus_speed=400_000)
+    rdwr = EmulatedSMBus(bus_speed=400_000)
+    smbus_frames, smbus_transactions = run(smbus, smbus)
+    rdwr_frames, rdwr_transactions = run(I2CRdwrTransport(rdwr), rdwr)
+    assert len(smbus_frames) == len(rdwr_frames) == 5
+    for (_, channels, temps), (_, rdwr_channels, rdwr_temps) in zip(
+        smbus_frames, rdwr_frames
+    ):
+        assert channels == rdwr_channels
+        assert temps == rdwr_temps
+    assert rdwr_transactions < smbus_transactions
+
+
+def test_read_into(bus):
+    bus.regs[0x80:0xC0] = bytes(range(64))
+    for transport in (SMBusTransport(bus), I2CRdwrTransport(bus)):
+        buffer = bytearray(64)
+        bus.reset_stats()
+        transport.read_into(bus.address, 0x80, memoryview(buffer))
+        assert buffer == bytes(range(64))
+    # 64 bytes take two SMBus blocks but a single combined read
+    assert bus.transactions == 1
+
+
+def test_read_blocks_single_transaction(bus):
+    bus.regs[0x80:0x90] = bytes(range(16))
+    transport = I2CRdwrTransport(bus)
+    first, second = bytearray(4), bytearray(8)
+    bus.reset_stats()
+    transport.read_blocks(
+        bus.address, [(0x80, memoryview(first)), (0x88, memoryview(second))]
+    )
+    assert bus.transactions == 1
+    assert first == bytes(range(4))
+    assert second == bytes(range(8, 16))
+
+
+def test_byte_access(bus):
+    transport = I2CRdwrTransport(bus)
+    transport.write_byte_data(bus.address, 0x68, 0x5A)
+    assert transport.read_byte_data(bus.address, 0x68) == 0x5A
+    transport.write_i2c_block_data(bus.address, 0x61, [1, 2, 3])
+    assert transport.read_i2c_block_data(bus.address, 0x61, 3) == [1, 2, 3]
+    assert np.array_equal(bus.regs[0x61:0x64], [1, 2, 3])